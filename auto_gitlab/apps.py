@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class AutoGitlabConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "auto_gitlab"
+
+    def ready(self):
+        from auto_gitlab.warm_up import setup_warm_up
+
+        setup_warm_up()
@@ -0,0 +1,188 @@
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import (
+    Optional,
+    Dict,
+    Tuple,
+    List,
+    Iterable,
+    Iterator,
+    Any,
+    Callable,
+    Hashable,
+    Collection,
+)
+
+from django.utils.module_loading import import_string
+
+from auto_gitlab.deadline import run_with_event_deadline
+
+logger = logging.getLogger(__name__)
+
+_events_batch: ContextVar[Optional["EventsBatch"]] = ContextVar(
+    "auto_gitlab_events_batch", default=None
+)
+
+
+class EventsBatch:
+    """
+    Unit of work of an event or of events handled together. Label changes of the issues
+    are queued and merged in order, so every issue is updated once at the end.
+    GitLab reads (labels given by ids, protected branches) are made once.
+    """
+
+    def __init__(self):
+        # Issue iid -> labels to add and labels to remove, as ordered sets
+        self._labels_changes: Dict[int, Tuple[Dict[str, None], Dict[str, None]]] = {}
+        self._reads: Dict[Hashable, Any] = {}
+
+    def memoize(self, key: Hashable, fetch: Callable[[], Any]) -> Any:
+        """
+        Return the value read before with the same key or read it with ``fetch``.
+        """
+
+        if key not in self._reads:
+            self._reads[key] = fetch()
+        return self._reads[key]
+
+    def add_labels_changes(
+        self, iid: int, labels_to_add: Iterable[str], labels_to_remove: Iterable[str]
+    ) -> None:
+        """
+        Queue the label changes of the issue. A later change of
+        a label overrides the earlier one.
+        """
+
+        added, removed = self._labels_changes.setdefault(iid, ({}, {}))
+        for label in labels_to_remove:
+            added.pop(label, None)
+            removed[label] = None
+        for label in labels_to_add:
+            removed.pop(label, None)
+            added[label] = None
+
+    def is_queued(self, iid: int) -> bool:
+        return iid in self._labels_changes
+
+    def apply_labels_changes(self, iid: int, labels: List[str]) -> List[str]:
+        """
+        Return the issue labels with the queued changes applied,
+        so handlers see the labels the issue will have.
+        """
+
+        if iid not in self._labels_changes:
+            return labels
+        added, removed = self._labels_changes[iid]
+        return [label for label in labels if label not in removed] + [
+            label for label in added if label not in labels
+        ]
+
+    def find_entering_issues(
+        self,
+        search_by_labels: Collection[str],
+        without_labels: Collection[str] = (),
+        found: Collection[int] = (),
+    ) -> List[int]:
+        """
+        Return numbers of the issues which weren't ``found`` by GitLab, but may match
+        the search once their queued changes are applied - they add a searched
+        label or remove an excluded one.
+        """
+
+        return [
+            iid
+            for iid, (added, removed) in self._labels_changes.items()
+            if iid not in found
+            and (
+                any(label in added for label in search_by_labels)
+                or any(label in removed for label in without_labels)
+            )
+        ]
+
+    def pop_labels_changes(
+        self, iids: Optional[Iterable[int]] = None
+    ) -> Dict[int, Tuple[List[str], List[str]]]:
+        """
+        Return and forget the queued label changes of the given issues
+        or, if no issues are given, of all of them.
+        """
+
+        if iids is None:
+            iids = list(self._labels_changes)
+        labels_changes = {}
+        for iid in iids:
+            added, removed = self._labels_changes.pop(iid, ({}, {}))
+            if added or removed:
+                labels_changes[iid] = (list(added), list(removed))
+        return labels_changes
+
+
+def get_events_batch() -> Optional[EventsBatch]:
+    return _events_batch.get()
+
+
+@contextmanager
+def events_batch() -> Iterator[EventsBatch]:
+    batch = EventsBatch()
+    token = _events_batch.set(batch)
+    try:
+        yield batch
+    finally:
+        _events_batch.reset(token)
+
+
+def matches_labels(
+    labels: Collection[str],
+    search_by_labels: Collection[str],
+    without_labels: Collection[str] = (),
+) -> bool:
+    return all(label in labels for label in search_by_labels) and not any(
+        label in labels for label in without_labels
+    )
+
+
+@contextmanager
+def unit_of_work() -> Iterator[EventsBatch]:
+    """
+    Handle the event as a unit of work: GitLab reads are memoized and label changes
+    are queued, then sent as one merged update per issue when the block ends.
+    Inside a batch of events the batch is the unit of work.
+    """
+
+    batch = get_events_batch()
+    if batch is not None:
+        yield batch
+        return
+
+    with events_batch() as batch:
+        try:
+            yield batch
+        finally:
+            # Changes made before a failure are sent, as they would be without queueing
+            labels_changes = batch.pop_labels_changes()
+            if labels_changes:
+                gitlab_manager = import_string(
+                    "auto_gitlab.gitlab_instance.gitlab_manager"
+                )
+                gitlab_manager.apply_labels_changes(labels_changes)
+
+
+def run_events_batch(handlers: List[Tuple[Callable[..., Any], Dict[str, Any]]]) -> None:
+    """
+    Run the event handlers one after another, each within its own event deadline,
+    and send the merged label changes of all of them at the end. A failed handler
+    doesn't stop the next ones.
+    """
+
+    gitlab_manager = import_string("auto_gitlab.gitlab_instance.gitlab_manager")
+
+    with events_batch() as batch:
+        for handler, kwargs in handlers:
+            try:
+                run_with_event_deadline(handler, **kwargs)
+            except Exception:
+                logger.exception("GitLab event handling failed.")
+    labels_changes = batch.pop_labels_changes()
+    if labels_changes:
+        gitlab_manager.apply_labels_changes(labels_changes)
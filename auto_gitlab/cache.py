@@ -0,0 +1,185 @@
+import logging
+import threading
+import time
+from typing import Optional, Callable, Any, TypeVar, Dict, Tuple
+from urllib.parse import quote
+
+from django.core.cache import caches, BaseCache
+
+from auto_gitlab.config.app_config_instance import get_app_config
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CACHE_KEY_PREFIX = "auto_gitlab"
+# Increase when the format of cached values changes
+CACHE_VERSION = 1
+LOCK_TIMEOUT_SECONDS = 30
+LOCK_POLL_INTERVAL_SECONDS = 0.05
+
+_MISSING = object()
+# Returned by conditional fetches when the value didn't change since its ETag
+NOT_MODIFIED = object()
+
+# Negative cache used when the Django cache is disabled - key -> expiration time
+_missing: Dict[str, float] = {}
+_missing_lock = threading.Lock()
+
+
+def get_cache() -> Optional[BaseCache]:
+    """
+    Return the Django cache shared by all processes
+    or None if caching is disabled in the config file.
+    """
+
+    if not get_app_config().cache.enabled:
+        return None
+    return caches[get_app_config().cache.alias]
+
+
+def make_cache_key(*parts: Any) -> str:
+    """
+    Build a cache key of the project from the given parts. Parts are quoted,
+    so branch and label names are safe to use with any cache backend.
+    """
+
+    return ":".join(
+        [CACHE_KEY_PREFIX, str(get_app_config().connection.project_id)]
+        + [quote(str(part), safe="") for part in parts]
+    )
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def get_or_set(
+    key: str,
+    fetch: Callable[[], T],
+    dump: Callable[[T], Any] = _identity,
+    load: Callable[[Any], T] = _identity,
+    timeout: Optional[int] = None,
+) -> T:
+    """
+    Return the value cached under the key. If it's not cached, only one process
+    (the one that acquires the lock) calls ``fetch``, while others wait until the
+    value appears in the cache, so a cold cache results in one GitLab request.
+
+    :param key: Cache key, usually built with ``make_cache_key``.
+    :param fetch: Function that gets the value from GitLab.
+    :param dump: Function that converts the fetched value to a picklable one.
+    :param load: Function that converts the cached value back.
+    :param timeout: Number of seconds the value is cached. Defaults to ``cache.timeout``.
+    """
+
+    cache = get_cache()
+    if cache is None:
+        return fetch()
+    if timeout is None:
+        timeout = get_app_config().cache.timeout
+
+    # Values are wrapped in a tuple, so None can be cached as well
+    cached = cache.get(key, _MISSING, version=CACHE_VERSION)
+    if cached is not _MISSING:
+        return load(cached[0])
+
+    lock_key = key + ":lock"
+    wait_until = time.monotonic() + LOCK_TIMEOUT_SECONDS
+    while not cache.add(lock_key, True, LOCK_TIMEOUT_SECONDS, version=CACHE_VERSION):
+        time.sleep(LOCK_POLL_INTERVAL_SECONDS)
+        cached = cache.get(key, _MISSING, version=CACHE_VERSION)
+        if cached is not _MISSING:
+            return load(cached[0])
+        if time.monotonic() > wait_until:
+            logger.warning(f"Cache lock '{lock_key}' wasn't released in time.")
+            return fetch()
+
+    try:
+        cached = cache.get(key, _MISSING, version=CACHE_VERSION)
+        if cached is not _MISSING:
+            return load(cached[0])
+        value = dump(fetch())
+        cache.set(key, (value,), timeout, version=CACHE_VERSION)
+        return load(value)
+    finally:
+        cache.delete(lock_key, version=CACHE_VERSION)
+
+
+def get_or_revalidate(
+    key: str,
+    fetch: Callable[[Optional[str]], Tuple[Any, Optional[str]]],
+    load: Callable[[Any], T] = _identity,
+    timeout: Optional[int] = None,
+) -> T:
+    """
+    ``get_or_set`` for values fetched with conditional requests. The last value is
+    kept with its ETag for ``cache.etag_timeout`` seconds, so when it expires from
+    the cache, GitLab is asked only if it changed. Unchanged values aren't downloaded
+    again - the kept one is cached for another ``timeout`` seconds.
+
+    :param fetch: Function that gets the value from GitLab, if its ETag isn't the given one.
+        Returns the picklable value (or ``NOT_MODIFIED``) and the ETag of the value.
+    :param load: Function that converts the fetched value.
+    """
+
+    cache = get_cache()
+    if cache is None:
+        return load(fetch(None)[0])
+
+    etag_key = key + ":etag"
+
+    def revalidate() -> Any:
+        etag, value = cache.get(etag_key, (None, None), version=CACHE_VERSION)
+        fetched_value, new_etag = fetch(etag)
+        if fetched_value is NOT_MODIFIED:
+            new_etag = etag
+        else:
+            value = fetched_value
+        if new_etag:
+            cache.set(
+                etag_key,
+                (new_etag, value),
+                get_app_config().cache.etag_timeout,
+                version=CACHE_VERSION,
+            )
+        return value
+
+    return load(get_or_set(key, revalidate, timeout=timeout))
+
+
+def delete(key: str) -> None:
+    cache = get_cache()
+    if cache is not None:
+        cache.delete(key, version=CACHE_VERSION)
+
+
+def mark_missing(key: str) -> None:
+    """
+    Remember for ``cache.negative_timeout`` seconds that GitLab refused to give
+    the object (e.g. a deleted label or an issue the token can't access),
+    so later events don't ask for it again. It's remembered in the shared cache
+    or, if it's disabled, in the process.
+    """
+
+    timeout = get_app_config().cache.negative_timeout
+    if not timeout:
+        return
+    cache = get_cache()
+    if cache is not None:
+        cache.set(key, True, timeout, version=CACHE_VERSION)
+        return
+    with _missing_lock:
+        _missing[key] = time.monotonic() + timeout
+
+
+def is_missing(key: str) -> bool:
+    cache = get_cache()
+    if cache is not None:
+        return bool(cache.get(key, False, version=CACHE_VERSION))
+    with _missing_lock:
+        expires_at = _missing.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            del _missing[key]
+            expires_at = None
+    return expires_at is not None
@@ -1,14 +1,31 @@
 import os
 from dataclasses import dataclass, field
-from typing import Dict, Optional, Union, List
+from typing import Dict, Optional, Union, List, Set
 
 from auto_gitlab.config import exceptions
 from auto_gitlab.config.constants import (
     DEFAULT_API_VERSION,
     DEFAULT_TIMEOUT,
     DEFAULT_SSL_VERIFICATION,
+    DEFAULT_BACKEND,
+    DEFAULT_GRAPHQL_BATCH_SIZE,
+    DEFAULT_WORKERS,
+    DEFAULT_BULK_WORKERS,
+    DEFAULT_EVENT_DEADLINE,
+    DEFAULT_CONCURRENCY,
+    DEFAULT_CACHE_ENABLED,
+    DEFAULT_CACHE_ALIAS,
+    DEFAULT_CACHE_TIMEOUT,
+    DEFAULT_CACHE_NEGATIVE_TIMEOUT,
+    DEFAULT_CACHE_ETAG_TIMEOUT,
+    DEFAULT_OUTBOX_ENABLED,
+    DEFAULT_OUTBOX_RATE,
+    DEFAULT_OUTBOX_RETRY_INTERVAL,
+    DEFAULT_BATCH_MAX_EVENTS,
+    DEFAULT_BATCH_MAX_BODY_SIZE,
     DEFAULT_ISSUES_SOURCE_BRANCH_PATTERN,
     DEFAULT_MERGE_PROTECTED_BRANCH_PATTERN,
+    DEFAULT_MATCH_BUDGET,
     DEFAULT_ISSUE_IDENTIFIERS,
 )
 
@@ -18,6 +35,11 @@ class AppConfig:
         connection_data = config_data.get("connection", {})
         labels_data = config_data.get("labels", {})
         patterns_data = config_data.get("patterns", {})
+        push_data = config_data.get("push", {})
+        cache_data = config_data.get("cache", {})
+        branches_data = config_data.get("branches", {})
+        outbox_data = config_data.get("outbox", {})
+        batch_data = config_data.get("batch", {})
         given_issue_identifiers = patterns_data.pop("issue_identifiers", [])
         secret_token = config_data.get("secret_token", "")
         given_private_token = connection_data.pop("private_token")
@@ -32,9 +54,16 @@ class AppConfig:
         self.connection = ConnectionConfig(**connection_data)
         self.labels = LabelsConfig(**labels_data)
         self.patterns = PatternsConfig(**patterns_data)
+        self.push = PushConfig(**push_data)
+        self.cache = CacheConfig(**cache_data)
+        self.branches = BranchesConfig(**branches_data)
+        self.outbox = OutboxConfig(**outbox_data)
+        self.batch = BatchConfig(**batch_data)
         self.secret_token = self._get_token_value(secret_token, fallback_value="")
+        self.record_file = config_data.get("record_file", None)
 
         self._init_issue_identifiers(given_issue_identifiers)
+        self._init_push_transition()
 
     @staticmethod
     def _get_token_value(token, fallback_value=None):
@@ -71,6 +100,13 @@ class AppConfig:
                         )
                     )
 
+    def _init_push_transition(self):
+        # By default issues referenced in pushed commits are moved from 'To do' to 'In progress'
+        if self.push.from_labels is None:
+            self.push.from_labels = [self.labels.to_do]
+        if self.push.to_label is None:
+            self.push.to_label = self.labels.in_progress
+
 
 @dataclass
 class ConnectionConfig:
@@ -80,6 +116,14 @@ class ConnectionConfig:
     api_version: Optional[str] = DEFAULT_API_VERSION
     timeout: Optional[int] = DEFAULT_TIMEOUT
     ssl_verify: Optional[bool] = DEFAULT_SSL_VERIFICATION
+    backend: Optional[str] = DEFAULT_BACKEND
+    graphql_batch_size: Optional[int] = DEFAULT_GRAPHQL_BATCH_SIZE
+    workers: Optional[int] = DEFAULT_WORKERS
+    # Threads handling events which may change any issue, apart from the ones above
+    bulk_workers: Optional[int] = DEFAULT_BULK_WORKERS
+    event_deadline: Optional[float] = DEFAULT_EVENT_DEADLINE
+    # GitLab requests sent in parallel while many issues are read or updated
+    concurrency: Optional[int] = DEFAULT_CONCURRENCY
 
 
 @dataclass
@@ -105,3 +149,96 @@ class PatternsConfig:
     issues_source_branch: Optional[str] = DEFAULT_ISSUES_SOURCE_BRANCH_PATTERN
     merge_protected_branches: Optional[str] = DEFAULT_MERGE_PROTECTED_BRANCH_PATTERN
     issue_identifiers: Optional[List[IssueIdentifier]] = field(default_factory=list)
+    # Seconds of matching the patterns per event
+    match_budget: Optional[float] = DEFAULT_MATCH_BUDGET
+
+
+@dataclass
+class PushConfig:
+    from_labels: Optional[List[Union[str, int]]] = None
+    to_label: Optional[Union[str, int]] = None
+
+
+@dataclass
+class CacheConfig:
+    enabled: Optional[bool] = DEFAULT_CACHE_ENABLED
+    alias: Optional[str] = DEFAULT_CACHE_ALIAS
+    timeout: Optional[int] = DEFAULT_CACHE_TIMEOUT
+    # Seconds issues and labels GitLab refused to give are skipped
+    negative_timeout: Optional[int] = DEFAULT_CACHE_NEGATIVE_TIMEOUT
+    # Seconds the last values are kept with their ETags for conditional requests
+    etag_timeout: Optional[int] = DEFAULT_CACHE_ETAG_TIMEOUT
+
+
+@dataclass
+class OutboxConfig:
+    enabled: Optional[bool] = DEFAULT_OUTBOX_ENABLED
+    # Label writes per second sent while the outbox is drained
+    rate: Optional[float] = DEFAULT_OUTBOX_RATE
+    # Seconds between draining attempts while GitLab is unreachable (doubled every time)
+    retry_interval: Optional[float] = DEFAULT_OUTBOX_RETRY_INTERVAL
+
+
+@dataclass
+class BatchConfig:
+    # Maximal number of events sent in one batch request
+    max_events: Optional[int] = DEFAULT_BATCH_MAX_EVENTS
+    # Maximal number of bytes of a batch request body
+    max_body_size: Optional[int] = DEFAULT_BATCH_MAX_BODY_SIZE
+
+
+@dataclass
+class BranchesConfig:
+    # Branch name -> names of the branches it is merged into, e.g. {"develop": ["staging"]}
+    promotion: Optional[Dict[str, Union[str, List[str]]]] = field(default_factory=dict)
+    _downstream_branches: Dict[str, Set[str]] = field(
+        init=False, repr=False, default_factory=dict
+    )
+
+    def __post_init__(self):
+        self.promotion = {
+            branch: [targets] if isinstance(targets, str) else list(targets)
+            for branch, targets in self.promotion.items()
+        }
+        for branch in self.promotion:
+            self._downstream_branches[branch] = self._find_downstream_branches(branch)
+
+    def _find_downstream_branches(self, branch: str) -> Set[str]:
+        downstream_branches = set()
+        branches_to_visit = list(self.promotion.get(branch, []))
+        while branches_to_visit:
+            next_branch = branches_to_visit.pop()
+            if next_branch not in downstream_branches:
+                downstream_branches.add(next_branch)
+                branches_to_visit.extend(self.promotion.get(next_branch, []))
+        return downstream_branches
+
+    def is_promotion(self, source_branch: str, target_branch: str) -> bool:
+        """
+        Check if the target branch can be reached from the source branch
+        in the promotion graph, directly or through other branches.
+        """
+
+        return target_branch in self._downstream_branches.get(source_branch, ())
+
+    def get_promoted_branches(
+        self, source_branch: str, target_branch: str
+    ) -> List[str]:
+        """
+        Return the branches the changes of the source branch reach when it's merged
+        into the target branch: the branches between them in the promotion graph,
+        from the nearest one, and the target branch. Empty if it isn't a promotion.
+        """
+
+        if not self.is_promotion(source_branch, target_branch):
+            return []
+        branches = [
+            branch
+            for branch in self._downstream_branches[source_branch]
+            if target_branch in self._downstream_branches.get(branch, ())
+        ]
+        # Branches nearer to the source have more branches downstream
+        branches.sort(
+            key=lambda branch: (-len(self._downstream_branches.get(branch, ())), branch)
+        )
+        return branches + [target_branch]
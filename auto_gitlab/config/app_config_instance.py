@@ -1,14 +1,21 @@
-from auto_gitlab.config.app_config import AppConfig
-from auto_gitlab.config.parser import read_config_file
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from auto_gitlab.config.app_config import AppConfig
 
 _configs = {}
 _app_config = None
 
 
-def get_app_config() -> AppConfig:
+def get_app_config() -> "AppConfig":
     global _configs
     global _app_config
     if not _configs:
+        # The config file is read on first use, so the parser (yaml, cerberus)
+        # is not loaded by modules that only import this one
+        from auto_gitlab.config.app_config import AppConfig
+        from auto_gitlab.config.parser import read_config_file
+
         _configs = read_config_file(".gitlab-config.yml")
         _app_config = AppConfig(_configs)
     return _app_config
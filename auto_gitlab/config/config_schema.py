@@ -37,6 +37,12 @@ schema = {
             "api_version": {"type": "string"},
             "timeout": {"type": "integer"},
             "ssl_verify": {"type": "boolean"},
+            "backend": {"type": "string", "allowed": ["rest", "graphql"]},
+            "graphql_batch_size": {"type": "integer", "min": 1},
+            "workers": {"type": "integer", "min": 0},
+            "bulk_workers": {"type": "integer", "min": 1},
+            "event_deadline": {"type": "number", "min": 0},
+            "concurrency": {"type": "integer", "min": 1},
         },
     },
     "labels": {
@@ -53,11 +59,13 @@ schema = {
         },
     },
     "secret_token": token_format,
+    "record_file": {"type": "string"},
     "patterns": {
         "type": "dict",
         "schema": {
             "issues_source_branch": {"type": "string"},
             "merge_protected_branches": {"type": "string"},
+            "match_budget": {"type": "number", "min": 0},
             "issue_identifiers": {
                 "type": "list",
                 "schema": {
@@ -71,4 +79,49 @@ schema = {
             },
         },
     },
+    "push": {
+        "type": "dict",
+        "schema": {
+            "from_labels": {"type": "list", "schema": string_or_integer},
+            "to_label": string_or_integer,
+        },
+    },
+    "branches": {
+        "type": "dict",
+        "schema": {
+            "promotion": {
+                "type": "dict",
+                "keysrules": {"type": "string"},
+                "valuesrules": {
+                    "type": ["string", "list"],
+                    "schema": {"type": "string"},
+                },
+            },
+        },
+    },
+    "cache": {
+        "type": "dict",
+        "schema": {
+            "enabled": {"type": "boolean"},
+            "alias": {"type": "string"},
+            "timeout": {"type": "integer", "min": 0},
+            "negative_timeout": {"type": "integer", "min": 0},
+            "etag_timeout": {"type": "integer", "min": 0},
+        },
+    },
+    "outbox": {
+        "type": "dict",
+        "schema": {
+            "enabled": {"type": "boolean"},
+            "rate": {"type": "number", "min": 0},
+            "retry_interval": {"type": "number", "min": 0},
+        },
+    },
+    "batch": {
+        "type": "dict",
+        "schema": {
+            "max_events": {"type": "integer", "min": 1},
+            "max_body_size": {"type": "integer", "min": 1},
+        },
+    },
 }
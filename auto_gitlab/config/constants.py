@@ -1,8 +1,25 @@
 DEFAULT_API_VERSION = "4"
 DEFAULT_TIMEOUT = 10
 DEFAULT_SSL_VERIFICATION = True
+DEFAULT_BACKEND = "rest"
+DEFAULT_GRAPHQL_BATCH_SIZE = 25
+DEFAULT_WORKERS = 0
+DEFAULT_BULK_WORKERS = 1
+DEFAULT_EVENT_DEADLINE = 0
+DEFAULT_CONCURRENCY = 4
+DEFAULT_CACHE_ENABLED = False
+DEFAULT_CACHE_ALIAS = "default"
+DEFAULT_CACHE_TIMEOUT = 300
+DEFAULT_CACHE_NEGATIVE_TIMEOUT = 60
+DEFAULT_CACHE_ETAG_TIMEOUT = 86400
+DEFAULT_OUTBOX_ENABLED = False
+DEFAULT_OUTBOX_RATE = 5
+DEFAULT_OUTBOX_RETRY_INTERVAL = 10
+DEFAULT_BATCH_MAX_EVENTS = 1000
+DEFAULT_BATCH_MAX_BODY_SIZE = 10 * 1024 * 1024
 DEFAULT_ISSUES_SOURCE_BRANCH_PATTERN = r"(\d+)"
 DEFAULT_MERGE_PROTECTED_BRANCH_PATTERN = r"merge/(.+?)_to"
+DEFAULT_MATCH_BUDGET = 0.1
 DEFAULT_ISSUE_IDENTIFIERS = {
     "bug": {
         "name": "bug",
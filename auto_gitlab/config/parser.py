@@ -13,6 +13,7 @@ from auto_gitlab.config.exceptions import (
     GitlabConfigFileNotFoundError,
     GitlabConfigFileEmptyError,
 )
+from auto_gitlab.patterns import check_pattern
 
 
 def validate_config_file(file_content: Dict[str, any]):
@@ -22,6 +23,29 @@ def validate_config_file(file_content: Dict[str, any]):
             raise exceptions.IncorrectConfigFormatError(v.errors)
     except DocumentError:
         raise GitlabConfigFileEmptyError("Your '.gitlab-config.yml' file is empty.")
+    validate_patterns(file_content.get("patterns") or {})
+
+
+def validate_patterns(patterns: Dict[str, any]):
+    """
+    Reject patterns which are invalid or whose matching time may grow exponentially,
+    as they are matched against titles and branch names sent to the webhook.
+    """
+
+    errors = {}
+    for name in ("issues_source_branch", "merge_protected_branches"):
+        if name in patterns:
+            reason = check_pattern(patterns[name])
+            if reason:
+                errors[name] = [reason]
+    for index, identifier in enumerate(patterns.get("issue_identifiers") or []):
+        reason = check_pattern(identifier["pattern"])
+        if reason:
+            errors.setdefault("issue_identifiers", []).append(
+                {index: [{"pattern": [reason]}]}
+            )
+    if errors:
+        raise exceptions.IncorrectConfigFormatError({"patterns": [errors]})
 
 
 def read_config_file(file_name: str) -> Dict[str, any]:
@@ -0,0 +1,118 @@
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Iterator, List, Callable, Any
+
+from auto_gitlab.config.app_config_instance import get_app_config
+from auto_gitlab.patterns import match_budget
+
+logger = logging.getLogger(__name__)
+
+# Monotonic time until which the current event may talk to GitLab
+_deadline: ContextVar[Optional[float]] = ContextVar(
+    "auto_gitlab_deadline", default=None
+)
+# Names of the steps of the current event which couldn't be finished in time
+_unfinished_steps: ContextVar[Optional[List[str]]] = ContextVar(
+    "auto_gitlab_unfinished_steps", default=None
+)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Limit the time of GitLab requests made inside the block, including retries.
+    A nested deadline can't extend the outer one. None or 0 means no limit.
+    """
+
+    deadline_time = _deadline.get()
+    if seconds:
+        new_deadline_time = time.monotonic() + seconds
+        if deadline_time is None or new_deadline_time < deadline_time:
+            deadline_time = new_deadline_time
+    token = _deadline.set(deadline_time)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_seconds() -> Optional[float]:
+    """
+    Return the number of seconds left until the deadline or None if there is no deadline.
+    """
+
+    deadline_time = _deadline.get()
+    if deadline_time is None:
+        return None
+    return deadline_time - time.monotonic()
+
+
+def is_deadline_exceeded() -> bool:
+    remaining = remaining_seconds()
+    return remaining is not None and remaining <= 0
+
+
+def get_request_timeout(timeout: Optional[float]) -> Optional[float]:
+    """
+    Shrink the timeout of a GitLab request to the time left until the deadline.
+
+    :raises DeadlineExceeded: If the deadline has already passed.
+    """
+
+    remaining = remaining_seconds()
+    if remaining is None:
+        return timeout
+    if remaining <= 0:
+        raise DeadlineExceeded("The deadline of the GitLab event has passed.")
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+def report_unfinished_step(step: str) -> None:
+    """
+    Remember the step which was stopped by the deadline. Steps of the event
+    are logged together when the event handler finishes.
+    """
+
+    unfinished_steps = _unfinished_steps.get()
+    if unfinished_steps is None:
+        logger.error(f"'{step}' wasn't finished before the deadline.")
+    else:
+        unfinished_steps.append(step)
+
+
+def run_with_event_deadline(
+    handler: Callable[..., Any], *args: Any, **kwargs: Any
+) -> Any:
+    """
+    Run the event handler with ``connection.event_deadline`` seconds for all its
+    GitLab requests and ``patterns.match_budget`` seconds for matching patterns,
+    and report the steps which couldn't be finished in time. The handler is
+    a unit of work - its label changes are sent together when it ends,
+    without the deadline, so only the unfinished steps are lost.
+    """
+
+    # Imported here, as the batch module runs handlers with this function
+    from auto_gitlab.batch import unit_of_work
+
+    unfinished_steps = []
+    token = _unfinished_steps.set(unfinished_steps)
+    try:
+        # Changes are sent outside the deadline, so the ones computed in time are kept
+        with unit_of_work(), deadline(
+            get_app_config().connection.event_deadline
+        ), match_budget(get_app_config().patterns.match_budget):
+            return handler(*args, **kwargs)
+    finally:
+        _unfinished_steps.reset(token)
+        if unfinished_steps:
+            logger.error(
+                f"GitLab event handling exceeded the deadline of "
+                f"{get_app_config().connection.event_deadline} seconds. "
+                f"Unfinished steps: {', '.join(unfinished_steps)}."
+            )
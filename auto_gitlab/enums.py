@@ -9,6 +9,7 @@ class GitlabEvent(Enum):
 
 class MergeRequestAction(Enum):
     CREATED = "open"
+    UPDATED = "update"
     MERGED = "merge"
 
 
@@ -16,3 +17,8 @@ class IssueAction(Enum):
     CREATED = "open"
     UPDATED = "update"
     CLOSED = "close"
+
+
+class GitlabBackend(Enum):
+    REST = "rest"
+    GRAPHQL = "graphql"
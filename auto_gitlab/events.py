@@ -0,0 +1,389 @@
+import logging
+from abc import ABC, abstractmethod
+from enum import Enum
+from typing import (
+    Optional,
+    List,
+    Dict,
+    Any,
+    Hashable,
+    Tuple,
+    Callable,
+    Union,
+    Type,
+)
+
+from auto_gitlab.enums import GitlabEvent, MergeRequestAction, IssueAction
+from auto_gitlab.executor import get_issues_keys, BULK_KEY
+from auto_gitlab.utils import (
+    handle_merge_request_created,
+    handle_merge_request_updated,
+    handle_merge_request_merged,
+    handle_issue_created,
+    handle_issue_updated,
+    handle_issue_closed,
+    handle_push,
+    extract_issues_numbers_from_commits,
+    extract_issues_numbers_from_description,
+    extract_issues_numbers_from_branch,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidGitlabEvent(Exception):
+    pass
+
+
+class Event(ABC):
+    """
+    Fields of a GitLab webhook payload used by the handlers. Only the fields
+    declared in ``__slots__`` are taken from the payload, the rest of it isn't kept.
+    """
+
+    __slots__ = ("action",)
+
+    def __init__(self, action: Optional[str] = None):
+        self.action = action
+
+    @classmethod
+    def get_action(cls, data: Dict[str, Any]) -> Optional[str]:
+        """
+        Return the action of the payload, without parsing the rest of it.
+        """
+
+        object_attributes = data.get("object_attributes", None)
+        if not object_attributes:
+            raise InvalidGitlabEvent("No 'object_attributes' in sent data.")
+        return object_attributes.get("action", None)
+
+    @classmethod
+    @abstractmethod
+    def from_payload(cls, data: Dict[str, Any]) -> "Event":
+        """
+        Create the event from the fields of the payload used by the handlers.
+        """
+
+    @abstractmethod
+    def get_keys(self) -> Optional[List[Hashable]]:
+        """
+        Return keys of the issues the event may change. Events changing the same issue
+        are handled in order. ``BULK_KEY`` means that the event may change issues found
+        by labels as well and None that it may change any issue.
+        """
+
+    def __repr__(self) -> str:
+        fields = ", ".join(
+            f"{name}={getattr(self, name)!r}"
+            for cls in reversed(type(self).__mro__)
+            for name in getattr(cls, "__slots__", ())
+        )
+        return f"{type(self).__name__}({fields})"
+
+
+class MergeRequestEvent(Event):
+    __slots__ = (
+        "description",
+        "source_branch",
+        "target_branch",
+        "state",
+        "previous_description",
+        "project_path",
+    )
+
+    def __init__(
+        self,
+        action: Optional[str],
+        description: str,
+        source_branch: str,
+        target_branch: str,
+        state: Optional[str] = None,
+        previous_description: Optional[str] = None,
+        project_path: Optional[str] = None,
+    ):
+        super().__init__(action)
+        self.description = description
+        self.source_branch = source_branch
+        self.target_branch = target_branch
+        self.state = state
+        # Set only if the description was changed by the update
+        self.previous_description = previous_description
+        # Path of the project, so its issues referenced with it have keys
+        self.project_path = project_path
+
+    @classmethod
+    def from_payload(cls, data: Dict[str, Any]) -> "MergeRequestEvent":
+        object_attributes = data["object_attributes"]
+        description_changes = (data.get("changes") or {}).get("description")
+        return cls(
+            action=object_attributes.get("action", None),
+            description=object_attributes.get("description") or "",
+            source_branch=object_attributes.get("source_branch") or "",
+            target_branch=object_attributes.get("target_branch") or "",
+            state=object_attributes.get("state", None),
+            previous_description=(
+                None
+                if description_changes is None
+                else description_changes.get("previous") or ""
+            ),
+            project_path=(data.get("project") or {}).get("path_with_namespace"),
+        )
+
+    def get_keys(self) -> Optional[List[Hashable]]:
+        branch_issues_numbers = extract_issues_numbers_from_branch(self.source_branch)
+        if self.action == MergeRequestAction.UPDATED.value:
+            # Only issues added to or removed from the description are moved
+            if self.previous_description is None:
+                return []
+            return get_issues_keys(
+                set(
+                    extract_issues_numbers_from_description(
+                        self.previous_description, self.project_path
+                    )
+                    or branch_issues_numbers
+                ).symmetric_difference(
+                    extract_issues_numbers_from_description(
+                        self.description, self.project_path
+                    )
+                    or branch_issues_numbers
+                )
+            )
+        keys = get_issues_keys(
+            extract_issues_numbers_from_description(self.description, self.project_path)
+            or branch_issues_numbers
+        )
+        if self.action == MergeRequestAction.MERGED.value:
+            # Merge of protected branches moves issues found by labels
+            keys.append(BULK_KEY)
+        return keys
+
+
+class IssueEvent(Event):
+    __slots__ = ("iid", "title", "labels_ids", "label_names", "changes")
+
+    def __init__(
+        self,
+        action: Optional[str],
+        iid: Optional[int],
+        title: str,
+        labels_ids: List[int],
+        label_names: List[str],
+        changes: Dict[str, Any],
+    ):
+        super().__init__(action)
+        self.iid = iid
+        self.title = title
+        self.labels_ids = labels_ids
+        self.label_names = label_names
+        self.changes = changes
+
+    @classmethod
+    def from_payload(cls, data: Dict[str, Any]) -> "IssueEvent":
+        object_attributes = data["object_attributes"]
+        labels = object_attributes.get("labels") or []
+        return cls(
+            action=object_attributes.get("action", None),
+            iid=object_attributes.get("iid", None),
+            title=object_attributes.get("title") or "",
+            labels_ids=[label.get("id") for label in labels],
+            label_names=[label.get("title") for label in labels],
+            changes=data.get("changes") or {},
+        )
+
+    def get_keys(self) -> Optional[List[Hashable]]:
+        return get_issues_keys([self.iid])
+
+
+class PushEvent(Event):
+    __slots__ = ("commits",)
+
+    def __init__(self, commits: List[Dict[str, Any]]):
+        super().__init__()
+        self.commits = commits
+
+    @classmethod
+    def get_action(cls, data: Dict[str, Any]) -> Optional[str]:
+        # Push events don't have 'object_attributes'
+        return None
+
+    @classmethod
+    def from_payload(cls, data: Dict[str, Any]) -> "PushEvent":
+        return cls(
+            commits=[
+                {"id": commit.get("id"), "message": commit.get("message") or ""}
+                for commit in data.get("commits") or []
+            ]
+        )
+
+    def get_keys(self) -> Optional[List[Hashable]]:
+        return get_issues_keys(extract_issues_numbers_from_commits(self.commits))
+
+
+EVENT_CLASSES: Dict[str, Type[Event]] = {
+    GitlabEvent.MERGE_REQUEST.value: MergeRequestEvent,
+    GitlabEvent.ISSUE.value: IssueEvent,
+    GitlabEvent.PUSH_EVENT.value: PushEvent,
+}
+
+EventHandler = Callable[[Event], None]
+
+# (event type, action) -> handlers of the event, called in order of registration
+_event_handlers: Dict[Tuple[str, Optional[str]], List[EventHandler]] = {}
+
+
+def _value(item: Union[Enum, str, None]) -> Optional[str]:
+    return item.value if isinstance(item, Enum) else item
+
+
+def register_event_handler(
+    event_type: Union[GitlabEvent, str],
+    action: Union[MergeRequestAction, IssueAction, str, None],
+    handler: EventHandler,
+) -> EventHandler:
+    """
+    Call the handler with the typed event (e.g. ``IssueEvent``) for every GitLab event
+    of the type and action. Push events don't have actions - use None for them.
+    Handlers are called after the built-in ones, within the same event deadline.
+    """
+
+    event_type = _value(event_type)
+    if event_type not in EVENT_CLASSES:
+        raise ValueError(
+            f"Unknown GitLab event type: {event_type}. "
+            f"Expected one of: {list(EVENT_CLASSES)}"
+        )
+    _event_handlers.setdefault((event_type, _value(action)), []).append(handler)
+    return handler
+
+
+def event_handler(
+    event_type: Union[GitlabEvent, str],
+    action: Union[MergeRequestAction, IssueAction, str, None] = None,
+) -> Callable[[EventHandler], EventHandler]:
+    """
+    Decorator version of ``register_event_handler``.
+    """
+
+    def decorator(handler: EventHandler) -> EventHandler:
+        return register_event_handler(event_type, action, handler)
+
+    return decorator
+
+
+def unregister_event_handler(
+    event_type: Union[GitlabEvent, str],
+    action: Union[MergeRequestAction, IssueAction, str, None],
+    handler: EventHandler,
+) -> None:
+    key = (_value(event_type), _value(action))
+    handlers = _event_handlers.get(key, [])
+    if handler in handlers:
+        handlers.remove(handler)
+    if not handlers:
+        _event_handlers.pop(key, None)
+
+
+def get_event_handlers(
+    event_type: str, action: Optional[str]
+) -> Optional[List[EventHandler]]:
+    return _event_handlers.get((event_type, action))
+
+
+def run_event_handlers(event: Event, handlers: List[EventHandler]) -> None:
+    for handler in handlers:
+        handler(event)
+
+
+def dispatch_event(
+    event_type: str, data: Dict[str, Any]
+) -> Optional[Tuple[Optional[List[Hashable]], Callable[..., Any], Dict[str, Any]]]:
+    """
+    Return keys of the issues the event may change, the function running its handlers
+    and the function arguments. Events without registered handlers are dropped
+    (None is returned) before the payload is parsed.
+
+    :raises InvalidGitlabEvent: If the event type is unknown or the payload is invalid.
+    """
+
+    event_class = EVENT_CLASSES.get(event_type)
+    if event_class is None:
+        raise InvalidGitlabEvent(
+            f"Invalid gitlab event. Expected: {list(EVENT_CLASSES)}, "
+            f"Given: {event_type}"
+        )
+    handlers = get_event_handlers(event_type, event_class.get_action(data))
+    if not handlers:
+        return None
+
+    event = event_class.from_payload(data)
+    # Handlers registered later are used only by later events
+    return (
+        event.get_keys(),
+        run_event_handlers,
+        {"event": event, "handlers": handlers[:]},
+    )
+
+
+# Built-in handlers
+
+
+@event_handler(GitlabEvent.MERGE_REQUEST, MergeRequestAction.CREATED)
+def on_merge_request_created(event: MergeRequestEvent) -> None:
+    handle_merge_request_created(
+        description=event.description,
+        source_branch=event.source_branch,
+        project_path=event.project_path,
+    )
+
+
+@event_handler(GitlabEvent.MERGE_REQUEST, MergeRequestAction.UPDATED)
+def on_merge_request_updated(event: MergeRequestEvent) -> None:
+    handle_merge_request_updated(
+        description=event.description,
+        previous_description=event.previous_description,
+        source_branch=event.source_branch,
+        state=event.state,
+        project_path=event.project_path,
+    )
+
+
+@event_handler(GitlabEvent.MERGE_REQUEST, MergeRequestAction.MERGED)
+def on_merge_request_merged(event: MergeRequestEvent) -> None:
+    handle_merge_request_merged(
+        description=event.description,
+        source_branch=event.source_branch,
+        target_branch=event.target_branch,
+        project_path=event.project_path,
+    )
+
+
+@event_handler(GitlabEvent.ISSUE, IssueAction.CREATED)
+def on_issue_created(event: IssueEvent) -> None:
+    handle_issue_created(
+        iid=event.iid,
+        title=event.title,
+        labels_ids=event.labels_ids,
+        label_names=event.label_names,
+    )
+
+
+@event_handler(GitlabEvent.ISSUE, IssueAction.UPDATED)
+def on_issue_updated(event: IssueEvent) -> None:
+    handle_issue_updated(
+        iid=event.iid,
+        changes=event.changes,
+        labels_ids=event.labels_ids,
+        label_names=event.label_names,
+    )
+
+
+@event_handler(GitlabEvent.ISSUE, IssueAction.CLOSED)
+def on_issue_closed(event: IssueEvent) -> None:
+    handle_issue_closed(
+        iid=event.iid, labels_ids=event.labels_ids, label_names=event.label_names
+    )
+
+
+@event_handler(GitlabEvent.PUSH_EVENT)
+def on_push(event: PushEvent) -> None:
+    handle_push(commits=event.commits)
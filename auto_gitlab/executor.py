@@ -0,0 +1,280 @@
+import logging
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, wait
+from contextvars import ContextVar
+from typing import Optional, Iterable, Hashable, Callable, Any, Dict, Set, List
+
+from auto_gitlab.config.app_config_instance import get_app_config
+from auto_gitlab.deadline import run_with_event_deadline, remaining_seconds
+
+logger = logging.getLogger(__name__)
+
+# Key of tasks which may change issues found by labels, e.g. merges moving all issues
+# of a protected branch. Such tasks run in the bulk lane.
+BULK_KEY = "auto_gitlab:bulk"
+
+# Called by bulk tasks between pages of issues to let interactive tasks go first
+_yield_point: ContextVar[Optional[Callable[[], None]]] = ContextVar(
+    "auto_gitlab_yield_point", default=None
+)
+
+
+def yield_to_interactive_events() -> None:
+    """
+    Wait until the interactive tasks running at the moment are done, if called
+    by a task of the bulk lane. Does nothing elsewhere.
+    """
+
+    yield_point = _yield_point.get()
+    if yield_point is not None:
+        yield_point()
+
+
+def _run_preemptible(
+    yield_point: Callable[[], None],
+    fn: Callable[..., Any],
+    args: Any,
+    kwargs: Dict[str, Any],
+) -> Any:
+    token = _yield_point.set(yield_point)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _yield_point.reset(token)
+
+
+class OrderedExecutor:
+    """
+    Run tasks in parallel, but tasks sharing a key one after another in the order
+    they were submitted. Keys are usually ``(project id, issue iid)`` pairs, so events
+    touching the same issue never race while other events are processed concurrently.
+
+    A task submitted without keys is a barrier - it waits for all earlier tasks
+    and all later tasks wait for it.
+
+    Tasks with ``BULK_KEY`` among their keys (e.g. sweeps over thousands of issues)
+    wait for all earlier tasks as well, but only later bulk tasks and tasks sharing
+    their other keys wait for them. They run in a separate lane of ``bulk_workers``
+    threads, so the interactive lane (single-issue events users wait to see
+    on the board) is reserved for the other tasks. Bulk tasks are preemptible -
+    between pages of issues they let the running interactive tasks finish first
+    (check ``yield_to_interactive_events``). Barriers run in the bulk lane too.
+
+    Interactive tasks are run in the given pool (``ThreadPoolExecutor`` by default).
+    With ``ProcessPoolExecutor`` the submitted function and its arguments must be
+    picklable. Bulk tasks are always run in threads.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        pool: Optional[Executor] = None,
+        bulk_workers: int = 1,
+    ):
+        self._pool = pool or ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="auto-gitlab"
+        )
+        self._bulk_pool = ThreadPoolExecutor(
+            max_workers=bulk_workers, thread_name_prefix="auto-gitlab-bulk"
+        )
+        self._lock = threading.Lock()
+        self._tails: Dict[Hashable, Future] = {}
+        self._barrier: Optional[Future] = None
+        self._pending: Set[Future] = set()
+        self._bulk_pending: Set[Future] = set()
+        # Interactive tasks started in the pool and not done yet
+        self._running: Set[Future] = set()
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    @property
+    def bulk_pending_count(self) -> int:
+        return len(self._bulk_pending)
+
+    def submit(
+        self,
+        keys: Optional[Iterable[Hashable]],
+        fn: Callable[..., Any],
+        *args: Any,
+        **kwargs: Any,
+    ) -> Future:
+        future = Future()
+        keys = None if keys is None else set(keys)
+        bulk = keys is None or BULK_KEY in keys
+        with self._lock:
+            if keys is None:
+                dependencies = set(self._pending)
+                self._barrier = future
+                self._tails.clear()
+            elif bulk:
+                dependencies = set(self._pending)
+                for key in keys:
+                    self._tails[key] = future
+            else:
+                dependencies = {self._tails[key] for key in keys if key in self._tails}
+                if self._barrier is not None:
+                    dependencies.add(self._barrier)
+                for key in keys:
+                    self._tails[key] = future
+            self._pending.add(future)
+            if bulk:
+                self._bulk_pending.add(future)
+
+        future.add_done_callback(lambda _: self._forget(future, keys))
+
+        remaining = [len(dependencies)]
+        remaining_lock = threading.Lock()
+
+        def on_dependency_done(_: Future) -> None:
+            with remaining_lock:
+                remaining[0] -= 1
+                ready = remaining[0] == 0
+            if ready:
+                self._start(future, bulk, fn, args, kwargs)
+
+        if not dependencies:
+            self._start(future, bulk, fn, args, kwargs)
+        for dependency in dependencies:
+            # Failed tasks don't stop the tasks waiting for them
+            dependency.add_done_callback(on_dependency_done)
+        return future
+
+    def _start(
+        self,
+        future: Future,
+        bulk: bool,
+        fn: Callable[..., Any],
+        args: Any,
+        kwargs: Dict[str, Any],
+    ) -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            if bulk:
+                pool_future = self._bulk_pool.submit(
+                    _run_preemptible, self._yield_to_interactive, fn, args, kwargs
+                )
+            else:
+                with self._lock:
+                    self._running.add(future)
+                pool_future = self._pool.submit(fn, *args, **kwargs)
+        except Exception as e:
+            future.set_exception(e)
+            return
+
+        def copy_result(done: Future) -> None:
+            if done.exception() is not None:
+                future.set_exception(done.exception())
+            else:
+                future.set_result(done.result())
+
+        pool_future.add_done_callback(copy_result)
+
+    def _yield_to_interactive(self) -> None:
+        with self._lock:
+            running = set(self._running)
+        if running:
+            # Running tasks never wait for bulk ones, so they can't wait for this one
+            timeout = remaining_seconds()
+            wait(running, timeout=None if timeout is None else max(timeout, 0))
+
+    def _forget(self, future: Future, keys: Optional[Set[Hashable]]) -> None:
+        with self._lock:
+            self._pending.discard(future)
+            self._bulk_pending.discard(future)
+            self._running.discard(future)
+            if self._barrier is future:
+                self._barrier = None
+            for key in keys or ():
+                if self._tails.get(key) is future:
+                    del self._tails[key]
+
+    def join(self) -> None:
+        """
+        Wait until all submitted tasks (including the ones submitted meanwhile) are done.
+        """
+
+        while True:
+            with self._lock:
+                pending = list(self._pending)
+            if not pending:
+                break
+            for future in pending:
+                try:
+                    future.result()
+                except Exception:
+                    pass
+
+    def shutdown(self, wait: bool = True) -> None:
+        if wait:
+            self.join()
+        self._pool.shutdown(wait=wait)
+        self._bulk_pool.shutdown(wait=wait)
+
+
+_events_executor = None
+_events_executor_lock = threading.Lock()
+
+
+def get_events_executor() -> Optional[OrderedExecutor]:
+    """
+    Return the executor of webhook events or None if events
+    should be handled synchronously (``connection.workers`` is 0).
+    """
+
+    global _events_executor
+    workers = get_app_config().connection.workers
+    if not workers:
+        return None
+    with _events_executor_lock:
+        if _events_executor is None:
+            _events_executor = OrderedExecutor(
+                max_workers=workers,
+                bulk_workers=get_app_config().connection.bulk_workers,
+            )
+    return _events_executor
+
+
+def get_issues_keys(issues_numbers: Iterable[int]) -> List[Hashable]:
+    project_id = get_app_config().connection.project_id
+    return [(project_id, issue_number) for issue_number in issues_numbers]
+
+
+def _log_task_exception(future: Future) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("GitLab event handling failed.", exc_info=future.exception())
+
+
+def run_in_events_executor(
+    keys: Optional[Iterable[Hashable]],
+    fn: Callable[..., Any],
+    *args: Any,
+    **kwargs: Any,
+) -> None:
+    """
+    Run the function at once or, if workers are configured,
+    in the events executor ordered by the given keys.
+    """
+
+    executor = get_events_executor()
+    if executor is None:
+        fn(*args, **kwargs)
+        return
+    executor.submit(keys, fn, *args, **kwargs).add_done_callback(_log_task_exception)
+
+
+def run_event_handler(
+    keys: Optional[Iterable[Hashable]],
+    handler: Callable[..., Any],
+    *args: Any,
+    **kwargs: Any,
+) -> None:
+    """
+    Run the event handler at once or, if workers are configured,
+    in the events executor ordered by the given keys. The event deadline
+    starts when the handler starts.
+    """
+
+    run_in_events_executor(keys, run_with_event_deadline, handler, *args, **kwargs)
@@ -0,0 +1,402 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from typing import Optional, List, Dict, Any, Iterable, Tuple
+from urllib.parse import urlsplit, parse_qs, urlencode
+
+import requests
+from requests.adapters import BaseAdapter
+
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 100
+LABEL_GLOBAL_ID_PREFIX = "gid://gitlab/ProjectLabel/"
+
+
+class FakeGitlab:
+    """
+    In-memory stand-in of a GitLab server with one project. It implements the subset
+    of the REST and GraphQL APIs used by ``GitlabManager`` and is mounted on a
+    ``requests`` session, so no network connection is needed. Every request is
+    recorded in ``calls`` so the number of API calls can be checked. ``latency``
+    (in seconds) is added to every request to simulate a remote server. Requests
+    with a timeout shorter than the latency time out. While ``down`` is set,
+    connections to the server fail. ``max_active_requests`` is the largest number
+    of requests handled at the same time. GET responses have ETags and
+    ``not_modified_responses`` counts the 304 responses to conditional requests.
+    """
+
+    def __init__(
+        self,
+        url: str = "https://gitlab.example.com",
+        project_id: int = 1,
+        project_path: str = "group/project",
+        latency: float = 0.0,
+    ):
+        self.url = url.rstrip("/")
+        self.latency = latency
+        self.down = False
+        self.active_requests = 0
+        self.max_active_requests = 0
+        self.not_modified_responses = 0
+        self.project_id = project_id
+        self.project_path = project_path
+        self.issues: Dict[int, Dict[str, Any]] = {}
+        self.labels: Dict[int, Dict[str, Any]] = {}
+        self.branches: Dict[str, Dict[str, Any]] = {}
+        self.calls: List[Tuple[str, str]] = []
+        self.graphql_operations: List[str] = []
+        self.lock = threading.RLock()
+
+    def add_label(self, name: str) -> int:
+        with self.lock:
+            for label in self.labels.values():
+                if label["name"] == name:
+                    return label["id"]
+            label_id = len(self.labels) + 1
+            self.labels[label_id] = {"id": label_id, "name": name}
+            return label_id
+
+    def add_issue(
+        self,
+        iid: int,
+        labels: Iterable[str] = (),
+        state: str = "opened",
+        title: str = "",
+    ) -> None:
+        with self.lock:
+            for label in labels:
+                self.add_label(label)
+            self.issues[iid] = {
+                "id": 100000 + iid,
+                "iid": iid,
+                "project_id": self.project_id,
+                "title": title,
+                "description": "",
+                "state": state,
+                "labels": list(labels),
+                "updated_at": "2023-01-01T00:00:00.000Z",
+            }
+
+    def add_branch(self, name: str, protected: bool = False) -> None:
+        with self.lock:
+            self.branches[name] = {"name": name, "protected": protected}
+
+    def issue_labels(self, iid: int) -> List[str]:
+        with self.lock:
+            return list(self.issues[iid]["labels"])
+
+    @property
+    def api_calls(self) -> int:
+        return len(self.calls)
+
+    def reset_calls(self) -> None:
+        with self.lock:
+            self.calls = []
+            self.graphql_operations = []
+            self.max_active_requests = 0
+            self.not_modified_responses = 0
+
+    def session(self, session: Optional[requests.Session] = None) -> requests.Session:
+        """
+        Return a session (a new one or the given one) with requests
+        to the fake server url handled by this instance.
+        """
+
+        session = session or requests.Session()
+        session.mount(self.url, FakeGitlabAdapter(self))
+        return session
+
+    def handle(
+        self, method: str, url: str, body: Optional[bytes]
+    ) -> Tuple[int, Any, Dict[str, str]]:
+        parts = urlsplit(url)
+        query = parse_qs(parts.query)
+        data = json.loads(body) if body else {}
+        with self.lock:
+            self.active_requests += 1
+            self.max_active_requests = max(
+                self.max_active_requests, self.active_requests
+            )
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+        finally:
+            with self.lock:
+                self.active_requests -= 1
+        with self.lock:
+            self.calls.append((method, parts.path))
+            if parts.path == "/api/graphql" and method == "POST":
+                self.graphql_operations.append(data.get("operationName"))
+                return 200, self._handle_graphql(data), {}
+            return self._handle_rest(method, parts.path, query, data, url)
+
+    def _handle_rest(
+        self,
+        method: str,
+        path: str,
+        query: Dict[str, List[str]],
+        data: Dict[str, Any],
+        url: str,
+    ) -> Tuple[int, Any, Dict[str, str]]:
+        project_prefix = f"/api/v4/projects/{self.project_id}"
+        if not path.startswith(project_prefix):
+            return 404, {"message": "404 Project Not Found"}, {}
+        path = path[len(project_prefix) :]
+
+        if path == "" and method == "GET":
+            return (
+                200,
+                {
+                    "id": self.project_id,
+                    "path_with_namespace": self.project_path,
+                    "name": self.project_path.split("/")[-1],
+                },
+                {},
+            )
+        if path == "/labels" and method == "GET":
+            return self._paginate(list(self.labels.values()), query, url)
+        match = re.fullmatch(r"/labels/(\d+)", path)
+        if match and method == "GET":
+            label = self.labels.get(int(match.group(1)))
+            if label is None:
+                return 404, {"message": "404 Label Not Found"}, {}
+            return 200, label, {}
+        if path == "/repository/branches" and method == "GET":
+            search = query.get("search", [""])[0]
+            if search.startswith("^"):
+                branches = [
+                    branch
+                    for name, branch in self.branches.items()
+                    if name.startswith(search[1:])
+                ]
+            else:
+                branches = [
+                    branch for name, branch in self.branches.items() if search in name
+                ]
+            return self._paginate(branches, query, url)
+        if path == "/protected_branches" and method == "GET":
+            protected_branches = [
+                {"name": name}
+                for name, branch in self.branches.items()
+                if branch["protected"]
+            ]
+            return self._paginate(protected_branches, query, url)
+        if path == "/issues" and method == "GET":
+            return self._paginate(self._filter_issues(query), query, url)
+        match = re.fullmatch(r"/issues/(\d+)", path)
+        if match:
+            issue = self.issues.get(int(match.group(1)))
+            if issue is None:
+                return 404, {"message": "404 Not found"}, {}
+            if method == "PUT":
+                self._update_issue(issue, data)
+            return 200, issue, {}
+        return 404, {"message": "404 Not Found"}, {}
+
+    def _filter_issues(self, query: Dict[str, List[str]]) -> List[Dict[str, Any]]:
+        iids = {int(iid) for iid in query.get("iids[]", [])}
+        labels = [
+            label for value in query.get("labels", []) for label in value.split(",")
+        ]
+        not_labels = [
+            label
+            for value in query.get("not[labels]", [])
+            for label in value.split(",")
+        ]
+        state = query.get("state", ["all"])[0]
+        return [
+            issue
+            for iid, issue in sorted(self.issues.items())
+            if (not iids or iid in iids)
+            and (state == "all" or issue["state"] == state)
+            and all(label in issue["labels"] for label in labels)
+            and not any(label in issue["labels"] for label in not_labels)
+        ]
+
+    def _update_issue(self, issue: Dict[str, Any], data: Dict[str, Any]) -> None:
+        def split(value: Any) -> List[str]:
+            if isinstance(value, list):
+                return value
+            return [label for label in str(value).split(",") if label]
+
+        if "labels" in data:
+            issue["labels"] = list(dict.fromkeys(split(data["labels"])))
+        for label in split(data.get("remove_labels", [])):
+            if label in issue["labels"]:
+                issue["labels"].remove(label)
+        for label in split(data.get("add_labels", [])):
+            if label not in issue["labels"]:
+                issue["labels"].append(label)
+        for label in issue["labels"]:
+            self.add_label(label)
+        issue["updated_at"] = "2023-01-02T00:00:00.000Z"
+
+    def _paginate(
+        self, items: List[Dict[str, Any]], query: Dict[str, List[str]], url: str
+    ) -> Tuple[int, Any, Dict[str, str]]:
+        page = int(query.get("page", ["1"])[0])
+        per_page = min(int(query.get("per_page", [DEFAULT_PER_PAGE])[0]), MAX_PER_PAGE)
+        start = (page - 1) * per_page
+        headers = {
+            "X-Page": str(page),
+            "X-Per-Page": str(per_page),
+            "X-Total": str(len(items)),
+        }
+        if start + per_page < len(items):
+            next_query = {key: value for key, value in query.items()}
+            next_query["page"] = [str(page + 1)]
+            next_query["per_page"] = [str(per_page)]
+            next_url = url.split("?")[0] + "?" + urlencode(next_query, doseq=True)
+            headers["X-Next-Page"] = str(page + 1)
+            headers["Link"] = f'<{next_url}>; rel="next"'
+        return 200, items[start : start + per_page], headers
+
+    def _label_by_title(self, title: str) -> Optional[Dict[str, str]]:
+        for label in self.labels.values():
+            if label["name"] == title:
+                return {
+                    "id": LABEL_GLOBAL_ID_PREFIX + str(label["id"]),
+                    "title": label["name"],
+                }
+        return None
+
+    def _labels_by_titles(self, variables: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "label" + name[len("title") :]: self._label_by_title(value)
+            for name, value in variables.items()
+            if name.startswith("title")
+        }
+
+    def _handle_graphql(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Operations are recognised by their names and their aliased fields
+        by the names of variables, so the query itself isn't parsed.
+        """
+
+        operation = data.get("operationName")
+        variables = data.get("variables") or {}
+        if variables.get("projectPath") not in (None, self.project_path):
+            return {"data": {"project": None}}
+
+        if operation == "IssuesLabels":
+            query = {"state": ["opened"]}
+            if variables.get("iids") is not None:
+                query["iids[]"] = variables["iids"]
+            if variables.get("labelNames"):
+                query["labels"] = [",".join(variables["labelNames"])]
+            issues = self._filter_issues(query)
+            # Cursors point at the last issue of the page, like GitLab keyset cursors,
+            # so updated issues leaving the search don't shift the next pages
+            if variables.get("after") is not None:
+                after = int(variables["after"])
+                issues = [issue for issue in issues if issue["iid"] > after]
+            page = issues[:MAX_PER_PAGE]
+            project = {
+                "issues": {
+                    "pageInfo": {
+                        "hasNextPage": len(issues) > MAX_PER_PAGE,
+                        "endCursor": str(page[-1]["iid"]) if page else None,
+                    },
+                    "nodes": [
+                        {
+                            "iid": str(issue["iid"]),
+                            "labels": {
+                                "nodes": [{"title": label} for label in issue["labels"]]
+                            },
+                        }
+                        for issue in page
+                    ],
+                }
+            }
+            project.update(self._labels_by_titles(variables))
+            return {"data": {"project": project}}
+
+        if operation == "LabelsIds":
+            return {"data": {"project": self._labels_by_titles(variables)}}
+
+        result = {}
+        if operation == "CreateLabels":
+            for name, value in variables.items():
+                if name.startswith("input"):
+                    self.add_label(value["title"])
+                    result["create" + name[len("input") :]] = {
+                        "label": self._label_by_title(value["title"]),
+                        "errors": [],
+                    }
+            return {"data": result}
+
+        if operation == "UpdateIssuesLabels":
+            for name, value in variables.items():
+                if not name.startswith("input"):
+                    continue
+                issue = self.issues.get(int(value["iid"]))
+                alias = "update" + name[len("input") :]
+                if issue is None:
+                    result[alias] = {"errors": ["Issue not found"]}
+                    continue
+
+                def titles(global_ids: List[str]) -> List[str]:
+                    return [
+                        self.labels[int(global_id[len(LABEL_GLOBAL_ID_PREFIX) :])][
+                            "name"
+                        ]
+                        for global_id in global_ids
+                    ]
+
+                self._update_issue(
+                    issue,
+                    {
+                        "add_labels": titles(value.get("addLabelIds") or []),
+                        "remove_labels": titles(value.get("removeLabelIds") or []),
+                    },
+                )
+                result[alias] = {"errors": []}
+            return {"data": result}
+
+        return {"errors": [{"message": f"Unknown operation {operation}"}]}
+
+
+class FakeGitlabAdapter(BaseAdapter):
+    def __init__(self, fake_gitlab: FakeGitlab):
+        super().__init__()
+        self.fake_gitlab = fake_gitlab
+
+    def send(self, request, timeout=None, **kwargs) -> requests.Response:
+        if isinstance(timeout, tuple):
+            timeout = timeout[1]
+        if self.fake_gitlab.down:
+            raise requests.exceptions.ConnectionError(request=request)
+        if timeout is not None and self.fake_gitlab.latency > timeout:
+            time.sleep(timeout)
+            raise requests.exceptions.ReadTimeout(request=request)
+
+        body = request.body
+        if isinstance(body, str):
+            body = body.encode()
+        status_code, content, headers = self.fake_gitlab.handle(
+            request.method, request.url, body
+        )
+
+        response_content = json.dumps(content).encode()
+        if request.method == "GET" and status_code == 200:
+            etag = f'W/"{hashlib.sha1(response_content).hexdigest()}"'
+            headers = {**headers, "ETag": etag}
+            if request.headers.get("If-None-Match") == etag:
+                with self.fake_gitlab.lock:
+                    self.fake_gitlab.not_modified_responses += 1
+                status_code, response_content = 304, b""
+
+        response = requests.Response()
+        response.status_code = status_code
+        response.headers.update({"Content-Type": "application/json", **headers})
+        response._content = response_content
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        response.reason = "OK" if status_code < 400 else "Error"
+        return response
+
+    def close(self) -> None:
+        pass
@@ -1,7 +1,41 @@
+from typing import Optional, Type
+
 from auto_gitlab.config.app_config_instance import get_app_config
+from auto_gitlab.enums import GitlabBackend
 from auto_gitlab.gitlab_manager import GitlabManager
+from auto_gitlab.graphql_manager import GraphQLGitlabManager
+
+_gitlab_manager: Optional[GitlabManager] = None
+
+
+def get_gitlab_manager_class() -> Type[GitlabManager]:
+    if get_app_config().connection.backend == GitlabBackend.GRAPHQL.value:
+        return GraphQLGitlabManager
+    return GitlabManager
+
+
+def get_gitlab_manager() -> GitlabManager:
+    global _gitlab_manager
+    if _gitlab_manager is None:
+        _gitlab_manager = get_gitlab_manager_class()(
+            url=get_app_config().connection.url,
+            project_id=get_app_config().connection.project_id,
+        )
+    return _gitlab_manager
+
+
+def set_gitlab_manager(gitlab_manager: Optional[GitlabManager]) -> None:
+    """
+    Replace the manager used by event handlers, e.g. with one connected
+    to a fake GitLab server. None makes the default one to be created again.
+    """
+
+    global _gitlab_manager
+    _gitlab_manager = gitlab_manager
+
 
-gitlab_manager = GitlabManager(
-    url=get_app_config().connection.url,
-    project_id=get_app_config().connection.project_id,
-)
+def __getattr__(name: str):
+    # The manager is created on first use, so importing the module doesn't connect to GitLab
+    if name == "gitlab_manager":
+        return get_gitlab_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
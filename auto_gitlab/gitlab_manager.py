@@ -1,26 +1,128 @@
 import logging
-from typing import Optional, List, Dict, Any, Union
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from contextvars import copy_context
+from typing import (
+    Optional,
+    List,
+    Dict,
+    Any,
+    Union,
+    Sequence,
+    Iterator,
+    Tuple,
+    Hashable,
+    Callable,
+    TypeVar,
+    Set,
+)
 
 import gitlab
-from gitlab import GitlabGetError, GitlabAuthenticationError
-from gitlab.v4.objects import ProjectBranch
+import requests
+from gitlab import (
+    GitlabGetError,
+    GitlabAuthenticationError,
+    GitlabError,
+    GitlabHttpError,
+)
+from gitlab.v4.objects import ProjectBranch, Project
 
+from auto_gitlab import outbox
+from auto_gitlab.batch import get_events_batch, matches_labels
+from auto_gitlab.cache import (
+    get_or_revalidate,
+    make_cache_key,
+    mark_missing,
+    is_missing,
+    NOT_MODIFIED,
+)
 from auto_gitlab.config.app_config_instance import get_app_config
+from auto_gitlab.deadline import get_request_timeout, remaining_seconds
+from auto_gitlab.executor import yield_to_interactive_events
 from auto_gitlab.utils import (
     log_authentication_error,
     gitlab_connection_retry,
-    remove_issue_labels,
+    is_retryable_error,
     extract_protected_branch_name_from_source_branch,
+    split_into_chunks,
 )
 
 logger = logging.getLogger(__name__)
 
 
 STOP_MAX_DELAY_MILLISECONDS = 5000
+# The largest page size allowed by GitLab
+MAX_PAGE_SIZE = 100
+# Issues numbers sent in one query, so URLs stay short and every chunk is one page
+ISSUES_CHUNK_SIZE = MAX_PAGE_SIZE
+# Issues updated one after another by one parallel task
+UPDATES_CHUNK_SIZE = 25
+# Requests sent again after 429 responses, as by python-gitlab
+MAX_RATE_LIMIT_RETRIES = 10
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class DeadlineSession(requests.Session):
+    """
+    Session which shrinks timeouts of requests to the time left
+    until the deadline of the handled event.
+    """
+
+    def request(self, method, url, *args, **kwargs) -> requests.Response:
+        kwargs["timeout"] = get_request_timeout(kwargs.get("timeout"))
+        return super().request(method, url, *args, **kwargs)
+
+
+class IssueRecord:
+    """
+    Projection of a GitLab issue with only the fields needed to move it.
+    Used instead of ``ProjectIssue`` when many issues are read.
+    """
+
+    __slots__ = ("iid", "labels", "state", "updated_at")
+
+    def __init__(
+        self, iid: int, labels: List[str], state: str, updated_at: Optional[str]
+    ):
+        self.iid = iid
+        self.labels = labels
+        self.state = state
+        self.updated_at = updated_at
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IssueRecord":
+        return cls(
+            iid=data["iid"],
+            labels=data.get("labels") or [],
+            state=data.get("state"),
+            updated_at=data.get("updated_at"),
+        )
+
+
+def _get_rate_limit_wait_time(response: requests.Response, retry: int) -> float:
+    """
+    Return the number of seconds to wait before a rate limited request is sent again,
+    read from the response headers as by python-gitlab.
+    """
+
+    if "Retry-After" in response.headers:
+        return int(response.headers["Retry-After"])
+    if "RateLimit-Reset" in response.headers:
+        return max(0, int(response.headers["RateLimit-Reset"]) - time.time())
+    return 2**retry * 0.1
 
 
 class GitlabManager:
-    def __init__(self, url: str, project_id: int):
+    """
+    Manages issues of the GitLab project. Requests are sent with the given session
+    or a new ``DeadlineSession``, so they are limited by the event deadline.
+    """
+
+    def __init__(
+        self, url: str, project_id: int, session: Optional[requests.Session] = None
+    ):
         self.url = url
         self.project_id = project_id
         self.gitlab_instance = gitlab.Gitlab(
@@ -29,9 +131,18 @@ class GitlabManager:
             timeout=get_app_config().connection.timeout,
             ssl_verify=get_app_config().connection.ssl_verify,
             api_version=get_app_config().connection.api_version,
+            session=session or DeadlineSession(),
+        )
+        # Proxies and TLS settings of the GitLab url, read from the environment once
+        self._send_settings = self.gitlab_instance.session.merge_environment_settings(
+            self.gitlab_instance.api_url,
+            {},
+            None,
+            self.gitlab_instance.ssl_verify,
+            None,
         )
         try:
-            self.project = self.gitlab_instance.projects.get(id=project_id)
+            self.project = self._get_project()
         except GitlabGetError:
             logger.exception(
                 RuntimeError(
@@ -41,25 +152,191 @@ class GitlabManager:
         except GitlabAuthenticationError:
             log_authentication_error()
 
+    def _raw_request(
+        self,
+        method: str,
+        path: str,
+        query_data: Optional[Dict[str, Any]] = None,
+        post_data: Optional[Dict[str, Any]] = None,
+        extra_headers: Optional[Dict[str, str]] = None,
+    ) -> requests.Response:
+        """
+        Send the request with the session and the authentication of the GitLab
+        connection, without python-gitlab managers and objects. Used by hot operations
+        (label lookups and updates, protected branch checks and pages of issues),
+        which need only plain JSON. Errors are raised as python-gitlab ones,
+        so they are retried the same way. Like python-gitlab, requests rate limited
+        by GitLab (429) are sent again after the time given by GitLab, unless it
+        ends after the event deadline.
+
+        The request is prepared without the session, so the environment (proxies,
+        ``.netrc``) isn't read again for every request - most of the client time.
+        The timeout is shortened to the event deadline, like by ``DeadlineSession``.
+        """
+
+        if not path.startswith(("http://", "https://")):
+            path = self.gitlab_instance.api_url + path
+        request = requests.PreparedRequest()
+        request.prepare(
+            method=method.upper(),
+            url=path,
+            headers={
+                **self.gitlab_instance.headers,
+                "PRIVATE-TOKEN": self.gitlab_instance.private_token,
+                **(extra_headers or {}),
+            },
+            params=query_data,
+            json=post_data,
+        )
+        for retry in range(MAX_RATE_LIMIT_RETRIES + 1):
+            response = self.gitlab_instance.session.send(
+                request,
+                timeout=get_request_timeout(self.gitlab_instance.timeout),
+                **self._send_settings,
+            )
+            if response.status_code != 429 or retry == MAX_RATE_LIMIT_RETRIES:
+                break
+            wait_time = _get_rate_limit_wait_time(response, retry)
+            remaining = remaining_seconds()
+            if remaining is not None and wait_time >= remaining:
+                # Retried by ``gitlab_connection_retry`` or stored in the outbox
+                break
+            time.sleep(wait_time)
+        if response.status_code == 401:
+            raise GitlabAuthenticationError(
+                response_code=response.status_code, error_message=response.text
+            )
+        if not 200 <= response.status_code < 300:
+            raise GitlabHttpError(
+                response_code=response.status_code, error_message=response.text
+            )
+        return response
+
+    def _get_conditionally(
+        self,
+        path: str,
+        etag: Optional[str],
+        query_data: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[Any, Optional[str]]:
+        """
+        GET the path, unless its response didn't change since the given ETag.
+        Return the JSON response (or ``NOT_MODIFIED``) and the ETag of the response.
+        """
+
+        try:
+            response = self._raw_request(
+                "get",
+                path,
+                query_data=query_data,
+                extra_headers={"If-None-Match": etag} if etag else None,
+            )
+        except GitlabHttpError as e:
+            if e.response_code == 304:
+                return NOT_MODIFIED, etag
+            raise
+        return response.json(), response.headers.get("ETag")
+
+    def _get_project(self) -> Project:
+        # Only attributes are cached, objects are bound to this GitLab connection
+        try:
+            return get_or_revalidate(
+                make_cache_key("project"),
+                lambda etag: self._get_conditionally(
+                    f"/projects/{self.project_id}", etag
+                ),
+                load=lambda attributes: Project(
+                    self.gitlab_instance.projects, attributes
+                ),
+            )
+        except GitlabHttpError as e:
+            # Raised as by ``projects.get`` of python-gitlab
+            raise GitlabGetError(
+                response_code=e.response_code, error_message=e.error_message
+            ) from e
+
+    def _search_protected_branch(
+        self, search_name: str, etag: Optional[str]
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        branches, etag = self._get_conditionally(
+            self.project.branches.path,
+            etag,
+            query_data={"search": "^" + search_name, "per_page": MAX_PAGE_SIZE},
+        )
+        if branches is NOT_MODIFIED:
+            return NOT_MODIFIED, etag
+        for branch in branches:
+            if branch.get("protected"):
+                return branch, etag
+        return None, etag
+
     @gitlab_connection_retry(
         stop_max_delay=STOP_MAX_DELAY_MILLISECONDS, wrap_exception=True
     )
-    def find_protected_branch(self, search_name: str) -> Optional[ProjectBranch]:
+    def find_protected_branch_attributes(
+        self, search_name: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Return attributes of the first protected branch which name starts
+        with ``search_name`` or None if there is no such branch.
+        """
+
         found_branch = None
         try:
-            for branch in self.project.branches.list(search="^" + search_name):
-                if branch.protected:
-                    found_branch = branch
-                    break
+            found_branch = self._memoize(
+                ("protected_branch", search_name),
+                lambda: get_or_revalidate(
+                    make_cache_key("protected_branch", search_name),
+                    lambda etag: self._search_protected_branch(search_name, etag),
+                ),
+            )
         except GitlabAuthenticationError:
             log_authentication_error()
 
         return found_branch
 
+    def find_protected_branch(self, search_name: str) -> Optional[ProjectBranch]:
+        attributes = self.find_protected_branch_attributes(search_name)
+        if attributes is None:
+            return None
+        return ProjectBranch(self.project.branches, attributes)
+
+    @staticmethod
+    def _memoize(key: Hashable, fetch: Callable[[], Any]) -> Any:
+        """
+        Read the value once per event (or batch of events) - check ``unit_of_work``.
+        """
+
+        batch = get_events_batch()
+        return fetch() if batch is None else batch.memoize(key, fetch)
+
+    def _fetch_label_dict(
+        self, label_id: int, etag: Optional[str]
+    ) -> Tuple[Any, Optional[str]]:
+        missing_key = make_cache_key("missing", "label", label_id)
+        if is_missing(missing_key):
+            raise GitlabGetError(
+                response_code=404,
+                error_message=f"Label {label_id} wasn't found recently.",
+            )
+        try:
+            return self._get_conditionally(
+                f"{self.project.labels.path}/{label_id}", etag
+            )
+        except GitlabError as e:
+            if e.response_code == 404:
+                mark_missing(missing_key)
+            raise
+
     def _get_label_dict(self, label: Optional[Union[str, int]]) -> Dict[str, Any]:
         result = {"name": ""}
         if isinstance(label, int):
-            result = self.project.labels.get(id=label).asdict()
+            result = self._memoize(
+                ("label", label),
+                lambda: get_or_revalidate(
+                    make_cache_key("label", label),
+                    lambda etag: self._fetch_label_dict(label, etag),
+                ),
+            )
         elif label is not None:
             result["name"] = str(label)
         return result
@@ -67,40 +344,473 @@ class GitlabManager:
     @gitlab_connection_retry(
         stop_max_delay=STOP_MAX_DELAY_MILLISECONDS, wrap_exception=True
     )
+    def warm_up(self, labels: Sequence[Union[str, int]]) -> None:
+        """
+        Load the given labels and all protected branches into the cache,
+        so the first events don't wait for them.
+        """
+
+        try:
+            for label in labels:
+                self._get_label_dict(label)
+            for protected_branch in self.project.protectedbranches.list(iterator=True):
+                # Wildcard rules (e.g. "release/*") aren't branch names
+                if "*" not in protected_branch.name:
+                    self.find_protected_branch_attributes(protected_branch.name)
+        except GitlabAuthenticationError:
+            log_authentication_error()
+
+    @gitlab_connection_retry(
+        stop_max_delay=STOP_MAX_DELAY_MILLISECONDS,
+        wrap_exception=True,
+        defer=outbox.defer_add_label_to_issue,
+    )
     def add_label_to_issue(self, label: Union[str, int], issue_iid: int) -> None:
         try:
-            label = self._get_label_dict(label)
-            issue = self.project.issues.get(id=issue_iid)
-            if label not in issue.labels:
-                issue.labels.append(label["name"])
-                issue.save()
+            # GitLab adds the label to the current ones, so the issue isn't fetched
+            self._send_labels_changes(
+                issue_iid, [self._get_label_dict(label)["name"]], []
+            )
         except GitlabAuthenticationError:
             log_authentication_error()
 
     @gitlab_connection_retry(
-        stop_max_delay=STOP_MAX_DELAY_MILLISECONDS, wrap_exception=True
+        stop_max_delay=STOP_MAX_DELAY_MILLISECONDS,
+        wrap_exception=True,
+        defer=outbox.defer_update_issue_labels,
+    )
+    def update_issue_labels(
+        self,
+        issue_iid: int,
+        labels_to_add: Sequence[Union[str, int]] = (),
+        labels_to_remove: Sequence[Union[str, int]] = (),
+    ) -> None:
+        """
+        Add and remove labels of the issue with a single request.
+        The issue is not fetched - GitLab applies the changes to its current labels.
+
+        :param issue_iid: Number of the issue that will be updated.
+        :param labels_to_add: Labels (names or ids) that will be added to the issue.
+        :param labels_to_remove: Labels (names or ids) that will be removed from the issue.
+        """
+
+        try:
+            self._send_labels_changes(
+                issue_iid,
+                labels_to_add=[
+                    self._get_label_dict(label)["name"] for label in labels_to_add
+                ],
+                labels_to_remove=[
+                    self._get_label_dict(label)["name"] for label in labels_to_remove
+                ],
+            )
+        except GitlabAuthenticationError:
+            log_authentication_error()
+
+    def _update_labels(
+        self, iid: int, labels_to_add: Sequence[str], labels_to_remove: Sequence[str]
+    ) -> None:
+        """
+        Update the issue labels. Issues which GitLab didn't find (e.g. removed ones
+        or ones the token can't see) are skipped for ``cache.negative_timeout`` seconds.
+        """
+
+        new_data = {}
+        if labels_to_add:
+            new_data["add_labels"] = ",".join(labels_to_add)
+        if labels_to_remove:
+            new_data["remove_labels"] = ",".join(labels_to_remove)
+        missing_key = make_cache_key("missing", "issue", iid)
+        if not new_data or is_missing(missing_key):
+            return
+        try:
+            self._raw_request(
+                "put", f"{self.project.issues.path}/{iid}", post_data=new_data
+            )
+        except GitlabError as e:
+            if is_retryable_error(e) or isinstance(e, GitlabAuthenticationError):
+                raise
+            # Other refusals (e.g. 403 or 400) may depend on the labels or the token
+            if e.response_code == 404:
+                mark_missing(missing_key)
+            logger.warning(f"GitLab issue #{iid} couldn't be updated: {e!r}")
+
+    def _send_labels_changes(
+        self, iid: int, labels_to_add: Sequence[str], labels_to_remove: Sequence[str]
+    ) -> None:
+        """
+        Update the issue labels at once or, when events are handled in a batch,
+        queue the changes until the end of the batch.
+        """
+
+        batch = get_events_batch()
+        if batch is not None:
+            batch.add_labels_changes(iid, labels_to_add, labels_to_remove)
+        else:
+            self._update_labels(iid, labels_to_add, labels_to_remove)
+
+    def _send_queued_labels_changes(self, iids: List[int]) -> None:
+        """
+        Send the label changes of the issues queued by the unit of work.
+        Bulk sweeps send them page by page, so the queue doesn't grow
+        with the number of issues.
+        """
+
+        batch = get_events_batch()
+        if batch is None:
+            return
+        labels_changes = batch.pop_labels_changes(iids)
+        if labels_changes:
+            self.apply_labels_changes(labels_changes)
+
+    def _map_chunks(
+        self, step: str, fn: Callable[[List[T]], R], chunks: List[List[T]]
+    ) -> Iterator[R]:
+        """
+        Call ``fn`` with every chunk, running ``connection.concurrency`` chunks
+        in parallel, and yield the results in order of the chunks. A failed chunk
+        doesn't stop the others - it's logged and its error is raised at the end.
+        """
+
+        concurrency = get_app_config().connection.concurrency or 1
+        if len(chunks) <= 1 or concurrency <= 1:
+            for chunk in chunks:
+                yield fn(chunk)
+            return
+
+        error = None
+        pool = ThreadPoolExecutor(
+            max_workers=min(concurrency, len(chunks)),
+            thread_name_prefix="auto-gitlab-chunk",
+        )
+        try:
+            # The context is copied, so the event deadline applies to the requests
+            futures = [pool.submit(copy_context().run, fn, chunk) for chunk in chunks]
+            for index, future in enumerate(futures):
+                try:
+                    result = future.result()
+                except (GitlabError, requests.RequestException) as e:
+                    logger.error(
+                        f"{step} failed for chunk {index + 1} of {len(chunks)}: {e!r}"
+                    )
+                    error = error or e
+                else:
+                    yield result
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        if error is not None:
+            raise error
+
+    def _update_labels_chunk(
+        self, labels_changes: List[Tuple[int, Tuple[List[str], List[str]]]]
+    ) -> None:
+        for iid, (labels_to_add, labels_to_remove) in labels_changes:
+            self._update_labels(iid, labels_to_add, labels_to_remove)
+
+    @gitlab_connection_retry(
+        stop_max_delay=STOP_MAX_DELAY_MILLISECONDS,
+        wrap_exception=True,
+        defer=outbox.defer_apply_labels_changes,
+    )
+    def apply_labels_changes(
+        self, labels_changes: Dict[int, Tuple[List[str], List[str]]]
+    ) -> None:
+        """
+        Apply the label changes - pairs of labels names to add and to remove - to the issues.
+        Chunks of ``UPDATES_CHUNK_SIZE`` issues are updated in parallel.
+
+        :param labels_changes: Label changes by the numbers of the issues.
+        """
+
+        try:
+            for _ in self._map_chunks(
+                "Updating issues",
+                self._update_labels_chunk,
+                list(
+                    split_into_chunks(list(labels_changes.items()), UPDATES_CHUNK_SIZE)
+                ),
+            ):
+                pass
+        except GitlabAuthenticationError:
+            log_authentication_error()
+
+    def _fetch_page(
+        self, path: str, query_data: Optional[Dict[str, Any]] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        response = self._raw_request("get", path, query_data=query_data)
+        return response.json(), response.links.get("next", {}).get("url")
+
+    def _iter_pages(
+        self, path: str, query_data: Dict[str, Any]
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Yield raw pages of the list, ``MAX_PAGE_SIZE`` items each. Pages are followed
+        by the ``Link`` header and, while a page is processed, the next one is fetched
+        in the background. GitLab doesn't support keyset pagination of issues,
+        so the links are offset-based for them. Tasks of the bulk lane let interactive
+        ones go first before every next page is fetched.
+        """
+
+        page, next_url = self._fetch_page(
+            path, query_data={**query_data, "per_page": MAX_PAGE_SIZE}
+        )
+        if next_url is None:
+            yield page
+            return
+
+        pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="auto-gitlab-page")
+        try:
+            while True:
+                next_page: Optional[Future] = None
+                if next_url is not None:
+                    yield_to_interactive_events()
+                    # The context is copied, so the event deadline applies to the request
+                    next_page = pool.submit(
+                        copy_context().run, self._fetch_page, next_url
+                    )
+                yield page
+                if next_page is None:
+                    return
+                page, next_url = next_page.result()
+        finally:
+            pool.shutdown(wait=True)
+
+    def _iter_opened_issues(
+        self,
+        issues_numbers: Optional[List[int]] = None,
+        search_by_labels: Optional[List[str]] = None,
+        without_labels: Optional[List[str]] = None,
+    ) -> Iterator[IssueRecord]:
+        """
+        Stream the opened issues given by numbers or labels page by page. Raw pages
+        are turned into ``IssueRecord`` objects, so only two pages are kept in memory.
+        Issues with any of ``without_labels`` are skipped by GitLab. Label changes
+        queued in the events batch are applied to the records.
+
+        GitLab doesn't know the queued changes, so issues searched by labels are
+        checked again after they are applied, and queued issues which may match
+        the search only after them are fetched by numbers.
+        """
+
+        batch = get_events_batch()
+        if search_by_labels is None or batch is None:
+            yield from self._iter_opened_issues_page_by_page(
+                issues_numbers, search_by_labels, without_labels
+            )
+            return
+
+        found = set()
+        for issue in self._iter_opened_issues_page_by_page(
+            issues_numbers, search_by_labels, without_labels
+        ):
+            if batch.is_queued(issue.iid):
+                found.add(issue.iid)
+            if matches_labels(issue.labels, search_by_labels, without_labels or ()):
+                yield issue
+        entering = batch.find_entering_issues(
+            search_by_labels, without_labels or (), found
+        )
+        if issues_numbers is not None:
+            entering = [iid for iid in entering if iid in issues_numbers]
+        if entering:
+            for issue in self._iter_opened_issues_page_by_page(issues_numbers=entering):
+                if matches_labels(issue.labels, search_by_labels, without_labels or ()):
+                    yield issue
+
+    def _iter_opened_issues_page_by_page(
+        self,
+        issues_numbers: Optional[List[int]] = None,
+        search_by_labels: Optional[List[str]] = None,
+        without_labels: Optional[List[str]] = None,
+    ) -> Iterator[IssueRecord]:
+        batch = get_events_batch()
+
+        query_data = {"state": "opened"}
+        if issues_numbers is not None:
+            query_data["iids[]"] = [
+                iid
+                for iid in issues_numbers
+                if not is_missing(make_cache_key("missing", "issue", iid))
+            ]
+            if not query_data["iids[]"]:
+                # No iids would mean all issues
+                return
+            if len(query_data["iids[]"]) > ISSUES_CHUNK_SIZE:
+                # Long lists of iids are read in parallel chunks
+                for issues in self._map_chunks(
+                    "Reading issues",
+                    lambda chunk: list(
+                        self._iter_opened_issues_page_by_page(
+                            chunk, search_by_labels, without_labels
+                        )
+                    ),
+                    list(split_into_chunks(query_data["iids[]"], ISSUES_CHUNK_SIZE)),
+                ):
+                    yield from issues
+                return
+        if search_by_labels is not None:
+            query_data["labels"] = ",".join(search_by_labels)
+        if without_labels:
+            query_data["not[labels]"] = ",".join(without_labels)
+        for page in self._iter_pages(self.project.issues.path, query_data):
+            for data in page:
+                issue = IssueRecord.from_dict(data)
+                if batch is not None:
+                    issue.labels = batch.apply_labels_changes(issue.iid, issue.labels)
+                yield issue
+
+    def _iter_leaving_issues_pages(
+        self, search_by_labels: List[str], without_labels: Optional[List[str]]
+    ) -> Iterator[List[IssueRecord]]:
+        """
+        Yield pages of the opened issues found by labels, which leave the search once
+        they are moved. Offsets of the moved issues would shift, so the same page is read
+        again after the previous one was moved, until GitLab finds no more issues.
+        Issues found again (e.g. GitLab refused to update them) are skipped and, if no
+        other issues are left in the page, the next page is read. Only one page
+        is kept in memory, whatever the number of issues.
+        """
+
+        batch = get_events_batch()
+        query_data = {
+            "state": "opened",
+            "labels": ",".join(search_by_labels),
+            "per_page": MAX_PAGE_SIZE,
+        }
+        if without_labels:
+            query_data["not[labels]"] = ",".join(without_labels)
+
+        page_number = 1
+        previous_iids: Set[int] = set()
+        # Issues which stay in the search - usually none
+        staying_iids: Set[int] = set()
+        found_queued_iids: Set[int] = set()
+        while True:
+            data, _ = self._fetch_page(
+                self.project.issues.path, {**query_data, "page": page_number}
+            )
+            if not data:
+                break
+            page = []
+            for item in data:
+                issue = IssueRecord.from_dict(item)
+                if issue.iid in previous_iids or issue.iid in staying_iids:
+                    staying_iids.add(issue.iid)
+                    continue
+                if batch is not None:
+                    if batch.is_queued(issue.iid):
+                        found_queued_iids.add(issue.iid)
+                    issue.labels = batch.apply_labels_changes(issue.iid, issue.labels)
+                    if not matches_labels(
+                        issue.labels, search_by_labels, without_labels or ()
+                    ):
+                        staying_iids.add(issue.iid)
+                        continue
+                page.append(issue)
+            previous_iids = {issue.iid for issue in page}
+            if page:
+                yield page
+            else:
+                page_number += 1
+            yield_to_interactive_events()
+
+        if batch is not None:
+            # Queued issues which match the search only after their changes
+            entering = batch.find_entering_issues(
+                search_by_labels, without_labels or (), found_queued_iids
+            )
+            if entering:
+                yield [
+                    issue
+                    for issue in self._iter_opened_issues_page_by_page(
+                        issues_numbers=entering
+                    )
+                    if matches_labels(
+                        issue.labels, search_by_labels, without_labels or ()
+                    )
+                ]
+
+    def _iter_moved_issues_pages(
+        self,
+        search_by_labels: List[str],
+        labels_to_remove: List[str],
+        labels_to_add: List[str],
+    ) -> Iterator[List[IssueRecord]]:
+        """
+        Yield pages of the opened issues with ``search_by_labels`` which are moved
+        by the labels changes. The changes of every page must be sent before
+        the next page is read.
+        """
+
+        # Issues that already have the label need no changes
+        without_labels = (
+            None if labels_to_remove or len(labels_to_add) != 1 else labels_to_add
+        )
+        if without_labels or set(search_by_labels).intersection(labels_to_remove):
+            # Moved issues leave the searched list
+            return self._iter_leaving_issues_pages(search_by_labels, without_labels)
+        return split_into_chunks(
+            self._iter_opened_issues(search_by_labels=search_by_labels),
+            MAX_PAGE_SIZE,
+        )
+
+    def _move_issue(
+        self,
+        issue: IssueRecord,
+        labels_to_remove: Sequence[str],
+        labels_to_add: Sequence[str],
+    ) -> None:
+        """
+        Send only the label changes the issue needs. Nothing is sent if it has
+        none of ``labels_to_remove`` and already has all ``labels_to_add``.
+        """
+
+        issue_labels_to_add = [
+            label for label in labels_to_add if label not in issue.labels
+        ]
+        issue_labels_to_remove = [
+            label
+            for label in labels_to_remove
+            if label in issue.labels and label not in labels_to_add
+        ]
+        if issue_labels_to_add or issue_labels_to_remove:
+            self._send_labels_changes(
+                issue.iid, issue_labels_to_add, issue_labels_to_remove
+            )
+
+    @gitlab_connection_retry(
+        stop_max_delay=STOP_MAX_DELAY_MILLISECONDS,
+        wrap_exception=True,
+        defer=outbox.defer_move_issues,
     )
     def move_issues(
         self,
         search_by_labels: List[str],
         labels_to_remove: List[str],
         label_to_add: str,
+        other_labels_to_add: Optional[List[str]] = None,
     ) -> None:
+        """
+        Remove ``labels_to_remove`` from and add ``label_to_add`` with
+        ``other_labels_to_add`` to the opened issues with ``search_by_labels``.
+        """
+
+        labels_to_add = [*(other_labels_to_add or []), label_to_add]
         try:
-            for issue in self.project.issues.list(
-                labels=search_by_labels, state="opened", get_all=True, iterator=True
-            ):
-                initial_issue_labels = issue.labels
-                issue.labels = remove_issue_labels(issue.labels, labels_to_remove)
-                if label_to_add not in issue.labels:
-                    issue.labels.append(label_to_add)
-                if initial_issue_labels != issue.labels:
-                    issue.save()
+            pages = self._iter_moved_issues_pages(
+                search_by_labels, labels_to_remove, labels_to_add
+            )
+            for page in pages:
+                for issue in page:
+                    self._move_issue(issue, labels_to_remove, labels_to_add)
+                self._send_queued_labels_changes([issue.iid for issue in page])
         except GitlabAuthenticationError:
             log_authentication_error()
 
     @gitlab_connection_retry(
-        stop_max_delay=STOP_MAX_DELAY_MILLISECONDS, wrap_exception=True
+        stop_max_delay=STOP_MAX_DELAY_MILLISECONDS,
+        wrap_exception=True,
+        defer=outbox.defer_move_issues_to_cr,
     )
     def move_issues_to_cr(self, issues_numbers: List[int]) -> None:
         """
@@ -116,19 +826,19 @@ class GitlabManager:
             )
             cr_label = self._get_label_dict(get_app_config().labels.in_review)
 
-            for issue in self.project.issues.list(
-                iids=issues_numbers, state="opened", iterator=True
-            ):
-                issue.labels = remove_issue_labels(
-                    issue.labels, [todo_label["name"], in_progress_label["name"]]
+            for issue in self._iter_opened_issues(issues_numbers=issues_numbers):
+                self._move_issue(
+                    issue,
+                    labels_to_remove=[todo_label["name"], in_progress_label["name"]],
+                    labels_to_add=[cr_label["name"]],
                 )
-                issue.labels.append(cr_label["name"])
-                issue.save()
         except GitlabAuthenticationError:
             log_authentication_error()
 
     @gitlab_connection_retry(
-        stop_max_delay=STOP_MAX_DELAY_MILLISECONDS, wrap_exception=True
+        stop_max_delay=STOP_MAX_DELAY_MILLISECONDS,
+        wrap_exception=True,
+        defer=outbox.defer_move_issues_to_merged,
     )
     def move_issues_to_merged(
         self, issues_numbers: List[int], target_branch: str
@@ -145,44 +855,75 @@ class GitlabManager:
             cr_label = self._get_label_dict(get_app_config().labels.in_review)
             merged_label = self._get_label_dict(get_app_config().labels.merged)
 
-            for issue in self.project.issues.list(
-                iids=issues_numbers, state="opened", iterator=True
-            ):
-                issue.labels = remove_issue_labels(issue.labels, [cr_label["name"]])
-                issue.labels.append(merged_label["name"])
+            for issue in self._iter_opened_issues(issues_numbers=issues_numbers):
+                self._move_issue(
+                    issue,
+                    labels_to_remove=[cr_label["name"]],
+                    # Add a label with target branch name to mark on which branch the changes related to the issue are.
+                    # If it doesn't exist, gitlab will create the label
+                    labels_to_add=[merged_label["name"], target_branch + " branch"],
+                )
+        except GitlabAuthenticationError:
+            log_authentication_error()
+
+    @gitlab_connection_retry(
+        stop_max_delay=STOP_MAX_DELAY_MILLISECONDS,
+        wrap_exception=True,
+        defer=outbox.defer_transition_issues,
+    )
+    def transition_issues(
+        self,
+        issues_numbers: List[int],
+        from_labels: List[Union[str, int]],
+        to_label: Union[str, int],
+    ) -> None:
+        """
+        Replace ``from_labels`` with ``to_label`` in the given issues.
+        Only issues that have at least one of ``from_labels`` are updated,
+        each of them with a single request.
+
+        :param issues_numbers: Numbers of issues that will be moved.
+        :param from_labels: Labels (names or ids) the issues are moved from.
+        :param to_label: Label (name or id) the issues are moved to.
+        """
+
+        try:
+            from_labels_names = [
+                self._get_label_dict(label)["name"] for label in from_labels
+            ]
+            to_label_name = self._get_label_dict(to_label)["name"]
 
-                # Add a label with target branch name to mark on which branch the changes related to the issue are.
-                # If it doesn't exist, gitlab will create the label
-                issue.labels.append(target_branch + " branch")
-                issue.save()
+            for issue in self._iter_opened_issues(issues_numbers=issues_numbers):
+                if set(from_labels_names).intersection(issue.labels):
+                    self._move_issue(issue, from_labels_names, [to_label_name])
         except GitlabAuthenticationError:
             log_authentication_error()
 
     def _is_merge_of_protected_branches(
         self, source_branch_name: str, target_branch_name: str
     ) -> bool:
-        source_branch = self.find_protected_branch(source_branch_name)
-        target_branch = self.find_protected_branch(target_branch_name)
+        source_branch = self.find_protected_branch_attributes(source_branch_name)
+        target_branch = self.find_protected_branch_attributes(target_branch_name)
 
-        if source_branch and source_branch.protected:
+        if source_branch and source_branch["protected"]:
             # If True, both branches are directly protected
-            return target_branch and target_branch.protected
+            return target_branch and target_branch["protected"]
         else:
             extracted_branch_name = extract_protected_branch_name_from_source_branch(
                 source_branch_name
             )
             if not extracted_branch_name:
                 return False
-            source_branch = self.find_protected_branch(extracted_branch_name)
+            source_branch = self.find_protected_branch_attributes(extracted_branch_name)
 
             # If True, it is a merge of the source branch created from
             # the protected branch (because our convention is "merge/*_to_*")
             # and the protected branch.
             return (
                 source_branch
-                and source_branch.protected
+                and source_branch["protected"]
                 and target_branch
-                and target_branch.protected
+                and target_branch["protected"]
             )
 
     @gitlab_connection_retry(
@@ -192,23 +933,34 @@ class GitlabManager:
         self, source_branch: str, target_branch: str
     ) -> None:
         """
-        Check if two protected branches are merged or the source branch
+        Check if the source branch is promoted to the target branch according to
+        ``branches.promotion``, two protected branches are merged or the source branch
         was created from the protected branch. If so, add the target branch
         label to the issues that have the source branch label. If not, do nothing.
         """
 
-        if not self._is_merge_of_protected_branches(source_branch, target_branch):
-            return
-
-        source_branch = (
+        promoted_branch = (
             extract_protected_branch_name_from_source_branch(source_branch)
             or source_branch
         )
+        # Promotions from the config don't need to ask GitLab about protected branches
+        promoted_branches = get_app_config().branches.get_promoted_branches(
+            promoted_branch, target_branch
+        )
+        if not promoted_branches:
+            if not self._is_merge_of_protected_branches(source_branch, target_branch):
+                return
+            promoted_branches = [target_branch]
+        source_branch = promoted_branch
 
-        # Issues that was related to changes on source_branch
-        # are now also related to changes on target_branch
+        # Issues that was related to changes on source_branch are now also related
+        # to changes on target_branch and on the branches between them, which are
+        # all added in one sweep
         self.move_issues(
             search_by_labels=[source_branch + " branch"],
             labels_to_remove=[],
             label_to_add=target_branch + " branch",
+            other_labels_to_add=[
+                branch + " branch" for branch in promoted_branches[:-1]
+            ],
         )
@@ -0,0 +1,525 @@
+import logging
+from typing import Optional, List, Dict, Any, Union, Tuple, Iterator
+
+from gitlab import GitlabAuthenticationError, GitlabError, GitlabHttpError
+
+from auto_gitlab import outbox
+from auto_gitlab.batch import get_events_batch, matches_labels
+from auto_gitlab.config.app_config_instance import get_app_config
+from auto_gitlab.executor import yield_to_interactive_events
+from auto_gitlab.gitlab_manager import GitlabManager, STOP_MAX_DELAY_MILLISECONDS
+from auto_gitlab.utils import (
+    log_authentication_error,
+    gitlab_connection_retry,
+    split_into_chunks,
+)
+
+logger = logging.getLogger(__name__)
+
+
+ISSUES_PAGE_SIZE = 100
+
+ISSUES_LABELS_QUERY = """
+query IssuesLabels(
+  $projectPath: ID!, $iids: [String!], $labelNames: [String], $after: String{variables}
+) {{
+  project(fullPath: $projectPath) {{
+    issues(
+      iids: $iids, labelName: $labelNames, state: opened, first: {page_size}, after: $after
+    ) {{
+      pageInfo {{ hasNextPage endCursor }}
+      nodes {{ iid labels {{ nodes {{ title }} }} }}
+    }}{fields}
+  }}
+}}
+"""
+LABELS_IDS_QUERY = """
+query LabelsIds($projectPath: ID!{variables}) {{
+  project(fullPath: $projectPath) {{{fields}
+  }}
+}}
+"""
+LABEL_FIELD = "\n    label{index}: label(title: $title{index}) {{ id title }}"
+LABEL_VARIABLE = ", $title{index}: String!"
+
+CREATE_LABELS_MUTATION = "mutation CreateLabels({variables}) {{{fields}\n}}"
+CREATE_LABEL_FIELD = "\n  create{index}: labelCreate(input: $input{index}) {{ label {{ id title }} errors }}"
+CREATE_LABEL_VARIABLE = "$input{index}: LabelCreateInput!"
+
+UPDATE_ISSUES_LABELS_MUTATION = (
+    "mutation UpdateIssuesLabels({variables}) {{{fields}\n}}"
+)
+UPDATE_ISSUE_FIELD = "\n  update{index}: updateIssue(input: $input{index}) {{ errors }}"
+UPDATE_ISSUE_VARIABLE = "$input{index}: UpdateIssueInput!"
+
+
+class GitlabGraphQLError(GitlabError):
+    pass
+
+
+class GraphQLGitlabManager(GitlabManager):
+    """
+    GitlabManager that moves many issues at once using GitLab GraphQL API.
+    Labels of the affected issues are read with one query per 100 issues and
+    label changes are sent as aliased mutations, ``graphql_batch_size`` per request.
+    """
+
+    def _execute_graphql(
+        self, operation_name: str, query: str, variables: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        response = self.gitlab_instance.session.post(
+            f"{self.gitlab_instance.url}/api/graphql",
+            json={
+                "operationName": operation_name,
+                "query": query,
+                "variables": variables,
+            },
+            headers={"Authorization": f"Bearer {self.gitlab_instance.private_token}"},
+            timeout=self.gitlab_instance.timeout,
+            verify=self.gitlab_instance.ssl_verify,
+        )
+        if response.status_code == 401:
+            raise GitlabAuthenticationError(
+                response_code=response.status_code, error_message=response.text
+            )
+        if not 200 <= response.status_code < 300:
+            raise GitlabHttpError(
+                response_code=response.status_code, error_message=response.text
+            )
+
+        result = response.json()
+        if result.get("errors"):
+            raise GitlabGraphQLError(error_message=str(result["errors"]))
+        return result["data"]
+
+    def _iter_issues_labels(
+        self,
+        label_titles: List[str],
+        labels_ids: Dict[str, Optional[str]],
+        issues_numbers: Optional[List[int]] = None,
+        search_by_labels: Optional[List[str]] = None,
+    ) -> Iterator[Dict[int, List[str]]]:
+        """
+        Stream labels of the opened issues page by page and resolve global ids of
+        the given labels into ``labels_ids`` (None for missing labels) with the first
+        page. Long lists of issues numbers are read in parallel chunks of
+        ``ISSUES_PAGE_SIZE``. Label changes queued in the events batch are applied
+        to the issues labels.
+        """
+
+        if issues_numbers is not None and len(issues_numbers) > ISSUES_PAGE_SIZE:
+            chunks = list(split_into_chunks(issues_numbers, ISSUES_PAGE_SIZE))
+            pages = self._map_chunks(
+                "Reading issues",
+                lambda chunk: {
+                    iid: issue_labels
+                    for page in self._iter_issues_labels_page_by_page(
+                        # Labels are resolved with the first chunk
+                        label_titles if chunk is chunks[0] else [],
+                        labels_ids,
+                        chunk,
+                        search_by_labels,
+                    )
+                    for iid, issue_labels in page.items()
+                },
+                chunks,
+            )
+        else:
+            pages = self._iter_issues_labels_page_by_page(
+                label_titles, labels_ids, issues_numbers, search_by_labels
+            )
+
+        batch = get_events_batch()
+        for issues_labels in pages:
+            if batch is not None:
+                for iid, issue_labels in issues_labels.items():
+                    issues_labels[iid] = batch.apply_labels_changes(iid, issue_labels)
+            yield issues_labels
+
+    def _iter_issues_labels_page_by_page(
+        self,
+        label_titles: List[str],
+        labels_ids: Dict[str, Optional[str]],
+        issues_numbers: Optional[List[int]] = None,
+        search_by_labels: Optional[List[str]] = None,
+    ) -> Iterator[Dict[int, List[str]]]:
+        after = None
+        while True:
+            variables = {
+                "projectPath": self.project.path_with_namespace,
+                "iids": (
+                    [str(number) for number in issues_numbers]
+                    if issues_numbers is not None
+                    else None
+                ),
+                "labelNames": search_by_labels,
+                "after": after,
+            }
+            # Labels are resolved together with the first page of issues
+            titles = label_titles if after is None else []
+            for index, title in enumerate(titles):
+                variables[f"title{index}"] = title
+            query = ISSUES_LABELS_QUERY.format(
+                variables="".join(
+                    LABEL_VARIABLE.format(index=index) for index in range(len(titles))
+                ),
+                fields="".join(
+                    LABEL_FIELD.format(index=index) for index in range(len(titles))
+                ),
+                page_size=ISSUES_PAGE_SIZE,
+            )
+            project = self._execute_graphql("IssuesLabels", query, variables)["project"]
+            if project is None:
+                return
+
+            for index, title in enumerate(titles):
+                label = project.get(f"label{index}")
+                labels_ids[title] = label["id"] if label else None
+            yield {
+                int(issue["iid"]): [
+                    label["title"] for label in issue["labels"]["nodes"]
+                ]
+                for issue in project["issues"]["nodes"]
+            }
+
+            page_info = project["issues"]["pageInfo"]
+            if not page_info["hasNextPage"]:
+                return
+            after = page_info["endCursor"]
+            yield_to_interactive_events()
+
+    def _fetch_labels_ids(self, titles: List[str]) -> Dict[str, Optional[str]]:
+        """
+        Fetch global ids of the labels, None for missing ones, with one query.
+        """
+
+        variables = {"projectPath": self.project.path_with_namespace}
+        for index, title in enumerate(titles):
+            variables[f"title{index}"] = title
+        query = LABELS_IDS_QUERY.format(
+            variables="".join(
+                LABEL_VARIABLE.format(index=index) for index in range(len(titles))
+            ),
+            fields="".join(
+                LABEL_FIELD.format(index=index) for index in range(len(titles))
+            ),
+        )
+        project = self._execute_graphql("LabelsIds", query, variables)["project"] or {}
+        labels_ids = {}
+        for index, title in enumerate(titles):
+            label = project.get(f"label{index}")
+            labels_ids[title] = label["id"] if label else None
+        return labels_ids
+
+    def _create_labels(
+        self, titles: List[str], labels_ids: Dict[str, Optional[str]]
+    ) -> None:
+        batch_size = get_app_config().connection.graphql_batch_size
+        for titles_chunk in split_into_chunks(titles, batch_size):
+            variables = {
+                f"input{index}": {
+                    "projectPath": self.project.path_with_namespace,
+                    "title": title,
+                }
+                for index, title in enumerate(titles_chunk)
+            }
+            mutation = CREATE_LABELS_MUTATION.format(
+                variables=", ".join(
+                    CREATE_LABEL_VARIABLE.format(index=index)
+                    for index in range(len(titles_chunk))
+                ),
+                fields="".join(
+                    CREATE_LABEL_FIELD.format(index=index)
+                    for index in range(len(titles_chunk))
+                ),
+            )
+            result = self._execute_graphql("CreateLabels", mutation, variables)
+            for index, title in enumerate(titles_chunk):
+                created = result.get(f"create{index}") or {}
+                if created.get("label"):
+                    labels_ids[title] = created["label"]["id"]
+                else:
+                    logger.error(
+                        f"GitLab label '{title}' couldn't be created: {created.get('errors')}"
+                    )
+
+    def _update_issues_labels(
+        self,
+        changes: Dict[int, Tuple[List[str], List[str]]],
+        labels_ids: Dict[str, Optional[str]],
+    ) -> None:
+        """
+        Apply the label changes - pairs of labels titles to add and to remove - to the issues.
+        Ids of labels which aren't in ``labels_ids`` are fetched and missing labels
+        are created first, as GitLab GraphQL API identifies labels by ids.
+        """
+
+        titles = list(
+            {
+                title: None
+                for labels_to_add, labels_to_remove in changes.values()
+                for title in labels_to_add + labels_to_remove
+            }
+        )
+        unresolved_labels = [title for title in titles if title not in labels_ids]
+        if unresolved_labels:
+            labels_ids.update(self._fetch_labels_ids(unresolved_labels))
+        missing_labels = list(
+            {
+                title: None
+                for labels_to_add, _ in changes.values()
+                for title in labels_to_add
+                if labels_ids.get(title) is None
+            }
+        )
+        if missing_labels:
+            self._create_labels(missing_labels, labels_ids)
+
+        batch_size = get_app_config().connection.graphql_batch_size
+        for _ in self._map_chunks(
+            "Updating issues",
+            lambda changes_chunk: self._send_update_issues_mutation(
+                changes_chunk, labels_ids
+            ),
+            list(split_into_chunks(list(changes.items()), batch_size)),
+        ):
+            pass
+
+    def _send_update_issues_mutation(
+        self,
+        changes_chunk: List[Tuple[int, Tuple[List[str], List[str]]]],
+        labels_ids: Dict[str, Optional[str]],
+    ) -> None:
+        variables = {
+            f"input{index}": {
+                "projectPath": self.project.path_with_namespace,
+                "iid": str(iid),
+                "addLabelIds": [
+                    labels_ids[title]
+                    for title in labels_to_add
+                    if labels_ids.get(title)
+                ],
+                "removeLabelIds": [
+                    labels_ids[title]
+                    for title in labels_to_remove
+                    if labels_ids.get(title)
+                ],
+            }
+            for index, (iid, (labels_to_add, labels_to_remove)) in enumerate(
+                changes_chunk
+            )
+        }
+        mutation = UPDATE_ISSUES_LABELS_MUTATION.format(
+            variables=", ".join(
+                UPDATE_ISSUE_VARIABLE.format(index=index)
+                for index in range(len(changes_chunk))
+            ),
+            fields="".join(
+                UPDATE_ISSUE_FIELD.format(index=index)
+                for index in range(len(changes_chunk))
+            ),
+        )
+        result = self._execute_graphql("UpdateIssuesLabels", mutation, variables)
+        for index, (iid, _) in enumerate(changes_chunk):
+            errors = (result.get(f"update{index}") or {}).get("errors")
+            if errors:
+                logger.error(f"GitLab issue #{iid} couldn't be updated: {errors}")
+
+    def _iter_matching_issues_labels(
+        self,
+        pages: Iterator[Dict[int, List[str]]],
+        search_by_labels: List[str],
+        labels_ids: Dict[str, Optional[str]],
+        issues_numbers: Optional[List[int]] = None,
+    ) -> Iterator[Dict[int, List[str]]]:
+        """
+        GitLab doesn't know the changes queued in the events batch, so issues found
+        by labels are checked again after they are applied, and queued issues which
+        may match the search only after them are read by numbers at the end.
+        """
+
+        batch = get_events_batch()
+        found = set()
+        for issues_labels in pages:
+            found.update(iid for iid in issues_labels if batch.is_queued(iid))
+            yield {
+                iid: issue_labels
+                for iid, issue_labels in issues_labels.items()
+                if matches_labels(issue_labels, search_by_labels)
+            }
+        entering = batch.find_entering_issues(search_by_labels, found=found)
+        if issues_numbers is not None:
+            entering = [iid for iid in entering if iid in issues_numbers]
+        if entering:
+            for issues_labels in self._iter_issues_labels([], labels_ids, entering):
+                yield {
+                    iid: issue_labels
+                    for iid, issue_labels in issues_labels.items()
+                    if matches_labels(issue_labels, search_by_labels)
+                }
+
+    @staticmethod
+    def _get_labels_changes(
+        issues_labels: Dict[int, List[str]],
+        labels_to_remove: List[str],
+        labels_to_add: List[str],
+        required_labels: Optional[List[str]] = None,
+    ) -> Dict[int, Tuple[List[str], List[str]]]:
+        changes = {}
+        for iid, issue_labels in issues_labels.items():
+            if required_labels and not set(required_labels).intersection(issue_labels):
+                continue
+            issue_labels_to_add = [
+                label for label in labels_to_add if label not in issue_labels
+            ]
+            issue_labels_to_remove = [
+                label
+                for label in labels_to_remove
+                if label in issue_labels and label not in labels_to_add
+            ]
+            if issue_labels_to_add or issue_labels_to_remove:
+                changes[iid] = (issue_labels_to_add, issue_labels_to_remove)
+        return changes
+
+    def _move_issues_labels(
+        self,
+        labels_to_remove: List[str],
+        labels_to_add: List[str],
+        issues_numbers: Optional[List[int]] = None,
+        search_by_labels: Optional[List[str]] = None,
+        required_labels: Optional[List[str]] = None,
+    ) -> None:
+        """
+        Remove ``labels_to_remove`` from and add ``labels_to_add`` to the opened issues
+        given by numbers or by labels. If ``required_labels`` are given, only issues
+        with at least one of them are changed. Issues that wouldn't change are skipped.
+        Changes are sent page by page, so only one page of issues is kept in memory.
+        """
+
+        batch = get_events_batch()
+        labels_ids = {}
+        pages = self._iter_issues_labels(
+            label_titles=list(dict.fromkeys(labels_to_remove + labels_to_add)),
+            labels_ids=labels_ids,
+            issues_numbers=issues_numbers,
+            search_by_labels=search_by_labels,
+        )
+        if search_by_labels is not None and batch is not None:
+            pages = self._iter_matching_issues_labels(
+                pages, search_by_labels, labels_ids, issues_numbers
+            )
+
+        for issues_labels in pages:
+            changes = self._get_labels_changes(
+                issues_labels, labels_to_remove, labels_to_add, required_labels
+            )
+            if batch is None:
+                if changes:
+                    self._update_issues_labels(changes, labels_ids)
+                continue
+            for iid, (issue_labels_to_add, issue_labels_to_remove) in changes.items():
+                batch.add_labels_changes(
+                    iid, issue_labels_to_add, issue_labels_to_remove
+                )
+            if search_by_labels is not None:
+                self._send_queued_labels_changes(list(issues_labels))
+
+    @gitlab_connection_retry(
+        stop_max_delay=STOP_MAX_DELAY_MILLISECONDS,
+        wrap_exception=True,
+        defer=outbox.defer_apply_labels_changes,
+    )
+    def apply_labels_changes(
+        self, labels_changes: Dict[int, Tuple[List[str], List[str]]]
+    ) -> None:
+        try:
+            self._update_issues_labels(labels_changes, labels_ids={})
+        except GitlabAuthenticationError:
+            log_authentication_error()
+
+    @gitlab_connection_retry(
+        stop_max_delay=STOP_MAX_DELAY_MILLISECONDS,
+        wrap_exception=True,
+        defer=outbox.defer_move_issues,
+    )
+    def move_issues(
+        self,
+        search_by_labels: List[str],
+        labels_to_remove: List[str],
+        label_to_add: str,
+        other_labels_to_add: Optional[List[str]] = None,
+    ) -> None:
+        try:
+            self._move_issues_labels(
+                labels_to_remove=labels_to_remove,
+                labels_to_add=[*(other_labels_to_add or []), label_to_add],
+                search_by_labels=search_by_labels,
+            )
+        except GitlabAuthenticationError:
+            log_authentication_error()
+
+    @gitlab_connection_retry(
+        stop_max_delay=STOP_MAX_DELAY_MILLISECONDS,
+        wrap_exception=True,
+        defer=outbox.defer_move_issues_to_cr,
+    )
+    def move_issues_to_cr(self, issues_numbers: List[int]) -> None:
+        try:
+            self._move_issues_labels(
+                labels_to_remove=[
+                    self._get_label_dict(get_app_config().labels.to_do)["name"],
+                    self._get_label_dict(get_app_config().labels.in_progress)["name"],
+                ],
+                labels_to_add=[
+                    self._get_label_dict(get_app_config().labels.in_review)["name"]
+                ],
+                issues_numbers=issues_numbers,
+            )
+        except GitlabAuthenticationError:
+            log_authentication_error()
+
+    @gitlab_connection_retry(
+        stop_max_delay=STOP_MAX_DELAY_MILLISECONDS,
+        wrap_exception=True,
+        defer=outbox.defer_move_issues_to_merged,
+    )
+    def move_issues_to_merged(
+        self, issues_numbers: List[int], target_branch: str
+    ) -> None:
+        try:
+            self._move_issues_labels(
+                labels_to_remove=[
+                    self._get_label_dict(get_app_config().labels.in_review)["name"]
+                ],
+                labels_to_add=[
+                    self._get_label_dict(get_app_config().labels.merged)["name"],
+                    target_branch + " branch",
+                ],
+                issues_numbers=issues_numbers,
+            )
+        except GitlabAuthenticationError:
+            log_authentication_error()
+
+    @gitlab_connection_retry(
+        stop_max_delay=STOP_MAX_DELAY_MILLISECONDS,
+        wrap_exception=True,
+        defer=outbox.defer_transition_issues,
+    )
+    def transition_issues(
+        self,
+        issues_numbers: List[int],
+        from_labels: List[Union[str, int]],
+        to_label: Union[str, int],
+    ) -> None:
+        try:
+            from_labels_names = [
+                self._get_label_dict(label)["name"] for label in from_labels
+            ]
+            self._move_issues_labels(
+                labels_to_remove=from_labels_names,
+                labels_to_add=[self._get_label_dict(to_label)["name"]],
+                issues_numbers=issues_numbers,
+                required_labels=from_labels_names,
+            )
+        except GitlabAuthenticationError:
+            log_authentication_error()
@@ -0,0 +1,108 @@
+import logging
+import threading
+import time
+from typing import Optional, Dict, Any
+
+import requests
+
+from auto_gitlab.config.app_config_instance import get_app_config
+from auto_gitlab.executor import get_events_executor
+from auto_gitlab.outbox import get_pending_count
+from auto_gitlab.patterns import get_patterns_stats
+from auto_gitlab.warm_up import get_warmed_up_at
+
+logger = logging.getLogger(__name__)
+
+# GitLab is asked at most once in this time, other probes get the last result
+HEALTH_CHECK_INTERVAL_SECONDS = 30
+
+_last_check: Optional[Dict[str, Any]] = None
+# Whether a probe is checking GitLab now, the lock isn't held during the check
+_checking = False
+_last_check_lock = threading.Lock()
+
+
+def _check_gitlab_connection() -> Dict[str, Any]:
+    from gitlab import GitlabError
+
+    from auto_gitlab.gitlab_instance import get_gitlab_manager
+
+    error = None
+    try:
+        gitlab_manager = get_gitlab_manager()
+        gitlab_manager.gitlab_instance.http_get(
+            f"/projects/{get_app_config().connection.project_id}"
+        )
+    except (GitlabError, requests.RequestException) as e:
+        error = e.__class__.__name__
+        logger.warning(f"GitLab health check failed: {e!r}")
+    return {"connected": error is None, "error": error, "checked_at": time.time()}
+
+
+def get_gitlab_connection() -> Dict[str, Any]:
+    """
+    Return the result of the last GitLab connection check.
+    A new check is made only if the last one is older than ``HEALTH_CHECK_INTERVAL_SECONDS``
+    and no other probe is checking GitLab, otherwise the last result is returned.
+    """
+
+    global _last_check, _checking
+    with _last_check_lock:
+        last_check = _last_check
+        check = not _checking and (
+            last_check is None
+            or time.time() - last_check["checked_at"] >= HEALTH_CHECK_INTERVAL_SECONDS
+        )
+        if check:
+            _checking = True
+
+    if check:
+        try:
+            last_check = _check_gitlab_connection()
+            with _last_check_lock:
+                _last_check = last_check
+        finally:
+            with _last_check_lock:
+                _checking = False
+    elif last_check is None:
+        # The first check is still running, there is no result to share yet
+        last_check = _check_gitlab_connection()
+    gitlab_connection = dict(last_check)
+    gitlab_connection["age"] = time.time() - gitlab_connection["checked_at"]
+    return gitlab_connection
+
+
+def get_health() -> Dict[str, Any]:
+    """
+    Return the state of the GitLab connection, of the data loaded
+    by the warm-up, of the events queue and the outbox and counters of patterns matching.
+    """
+
+    app_config = get_app_config()
+    warmed_up_at = get_warmed_up_at()
+    warm_up_age = None if warmed_up_at is None else time.time() - warmed_up_at
+    executor = get_events_executor()
+    return {
+        "gitlab": get_gitlab_connection(),
+        "cache": {
+            "enabled": app_config.cache.enabled,
+            "warmed_up_at": warmed_up_at,
+            "age": warm_up_age,
+            "fresh": (
+                app_config.cache.enabled
+                and warm_up_age is not None
+                and warm_up_age < app_config.cache.timeout
+            ),
+        },
+        "queue": {
+            "workers": app_config.connection.workers,
+            "bulk_workers": app_config.connection.bulk_workers,
+            "pending": 0 if executor is None else executor.pending_count,
+            "bulk_pending": 0 if executor is None else executor.bulk_pending_count,
+        },
+        "outbox": {
+            "enabled": app_config.outbox.enabled,
+            "pending": get_pending_count(),
+        },
+        "patterns": get_patterns_stats(),
+    }
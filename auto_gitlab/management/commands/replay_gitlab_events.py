@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand
+
+from auto_gitlab.recording import read_deliveries
+from auto_gitlab.replay import create_fake_gitlab, replay
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay GitLab webhook deliveries recorded to the 'record_file' against "
+        "the webhook view with a local fake GitLab server and report the throughput, "
+        "latency and number of GitLab API calls per event."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", help="Gzip compressed JSONL file with deliveries.")
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=0.0,
+            help="Events sent per second. 0 (default) sends them as fast as possible.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=1,
+            help="Number of events sent at the same time.",
+        )
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.0,
+            help="Milliseconds added to every request to the fake GitLab server.",
+        )
+        parser.add_argument(
+            "--limit", type=int, default=None, help="Replay only first N deliveries."
+        )
+        parser.add_argument(
+            "--use-cache",
+            action="store_true",
+            help="Use the cache from the config file. Don't use it with a production cache.",
+        )
+
+    def handle(self, *args, **options):
+        deliveries = []
+        for delivery in read_deliveries(options["file"]):
+            if options["limit"] is not None and len(deliveries) >= options["limit"]:
+                break
+            deliveries.append(delivery)
+
+        fake_gitlab = create_fake_gitlab(deliveries, latency=options["latency"] / 1000)
+        report = replay(
+            deliveries,
+            fake_gitlab,
+            rate=options["rate"],
+            concurrency=options["concurrency"],
+            use_cache=options["use_cache"],
+        )
+
+        self.stdout.write(f"Events: {report.events} (errors: {report.errors})")
+        self.stdout.write(f"Duration: {report.duration:.2f} s")
+        self.stdout.write(f"Throughput: {report.throughput:.1f} events/s")
+        self.stdout.write(
+            "Latency: "
+            + ", ".join(
+                f"p{percentile}={report.latency_percentile(percentile) * 1000:.1f} ms"
+                for percentile in (50, 90, 99)
+            )
+            + f", max={max(report.latencies, default=0) * 1000:.1f} ms"
+        )
+        self.stdout.write(
+            f"GitLab API calls: {report.api_calls} "
+            f"({report.api_calls_per_event:.2f} per event)"
+        )
@@ -0,0 +1,41 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="OutboxEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("project_id", models.BigIntegerField()),
+                ("issue_iid", models.BigIntegerField(blank=True, null=True)),
+                ("labels_to_add", models.TextField(default="[]")),
+                ("labels_to_remove", models.TextField(default="[]")),
+                ("required_labels", models.TextField(default="[]")),
+                ("search_by_labels", models.TextField(default="[]")),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "ordering": ["id"],
+                "indexes": [
+                    models.Index(
+                        fields=["project_id", "id"],
+                        name="auto_gitlab_project_04abe1_idx",
+                    )
+                ],
+            },
+        ),
+    ]
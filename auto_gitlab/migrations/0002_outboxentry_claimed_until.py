@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auto_gitlab", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="outboxentry",
+            name="claimed_until",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
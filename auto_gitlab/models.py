@@ -0,0 +1,34 @@
+from django.db import models
+
+
+class OutboxEntry(models.Model):
+    """
+    Label changes that couldn't be sent to GitLab, kept until GitLab is reachable
+    again. An entry changes labels of one issue or, without ``issue_iid``, of all
+    opened issues having ``search_by_labels``. Labels are JSON lists of names or ids.
+    """
+
+    project_id = models.BigIntegerField()
+    issue_iid = models.BigIntegerField(null=True, blank=True)
+    labels_to_add = models.TextField(default="[]")
+    labels_to_remove = models.TextField(default="[]")
+    # The change is applied only if the issue has at least one of these labels
+    required_labels = models.TextField(default="[]")
+    search_by_labels = models.TextField(default="[]")
+    created_at = models.DateTimeField(auto_now_add=True)
+    # The entry is being sent by a process until then
+    claimed_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [models.Index(fields=["project_id", "id"])]
+
+    def __str__(self):
+        target = (
+            f"#{self.issue_iid}"
+            if self.issue_iid is not None
+            else f"issues with {self.search_by_labels}"
+        )
+        return (
+            f"Labels change of {target}: +{self.labels_to_add} -{self.labels_to_remove}"
+        )
@@ -0,0 +1,399 @@
+import json
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional, List, Union, Sequence, Iterable, Dict, Tuple, Any
+
+from auto_gitlab.batch import events_batch
+from auto_gitlab.config.app_config_instance import get_app_config
+
+logger = logging.getLogger(__name__)
+
+# Maximal number of entries applied in one pass, which takes 20 s at the default rate
+DRAIN_BATCH_SIZE = 100
+# Entries claimed by a process are left to it for that long, then another process
+# may take them over, e.g. when the process died
+CLAIM_SECONDS = 600
+MIN_RETRY_INTERVAL_SECONDS = 1
+MAX_RETRY_INTERVAL_SECONDS = 300
+# The database is asked if there are pending entries at most once in this time
+PENDING_CHECK_INTERVAL_SECONDS = 1
+
+# True while the outbox is drained, so its writes aren't deferred again
+_draining: ContextVar[bool] = ContextVar("auto_gitlab_outbox_draining", default=False)
+
+_pending: Optional[bool] = None
+_pending_checked_at = 0.0
+_drainer: Optional[threading.Thread] = None
+_drainer_lock = threading.Lock()
+
+
+def is_outbox_enabled() -> bool:
+    return bool(get_app_config().outbox.enabled)
+
+
+def _dumps(labels: Iterable[Union[str, int]]) -> str:
+    return json.dumps(list(labels))
+
+
+def _set_pending(pending: bool) -> None:
+    global _pending, _pending_checked_at
+    _pending = pending
+    _pending_checked_at = time.monotonic()
+
+
+def has_pending_writes() -> bool:
+    """
+    Check if there are label changes waiting in the outbox. New changes must
+    wait for them as well, so changes of every issue are applied in order.
+    """
+
+    if not is_outbox_enabled() or _draining.get():
+        return False
+    if (
+        _pending is None
+        or time.monotonic() - _pending_checked_at >= PENDING_CHECK_INTERVAL_SECONDS
+    ):
+        from auto_gitlab.models import OutboxEntry
+
+        _set_pending(
+            OutboxEntry.objects.filter(
+                project_id=get_app_config().connection.project_id
+            ).exists()
+        )
+        if _pending:
+            # E.g. entries left by a previous run of the application
+            start_drainer()
+    return _pending
+
+
+def get_pending_count() -> Optional[int]:
+    if not is_outbox_enabled():
+        return None
+    from auto_gitlab.models import OutboxEntry
+
+    return OutboxEntry.objects.filter(
+        project_id=get_app_config().connection.project_id
+    ).count()
+
+
+def defer_labels_changes(
+    issues_numbers: Iterable[int],
+    labels_to_add: Sequence[Union[str, int]] = (),
+    labels_to_remove: Sequence[Union[str, int]] = (),
+    required_labels: Sequence[Union[str, int]] = (),
+    search_by_labels: Sequence[Union[str, int]] = (),
+) -> bool:
+    """
+    Store the label changes of the issues (or, with ``search_by_labels``, of the issues
+    found by labels) in the outbox, so they are sent when GitLab is reachable again.
+
+    :return: Whether the changes were stored - False if the outbox is disabled.
+    """
+
+    if not is_outbox_enabled() or _draining.get():
+        return False
+    from auto_gitlab.models import OutboxEntry
+
+    project_id = get_app_config().connection.project_id
+    OutboxEntry.objects.bulk_create(
+        [
+            OutboxEntry(
+                project_id=project_id,
+                issue_iid=iid,
+                labels_to_add=_dumps(labels_to_add),
+                labels_to_remove=_dumps(labels_to_remove),
+                required_labels=_dumps(required_labels),
+                search_by_labels=_dumps(search_by_labels),
+            )
+            for iid in issues_numbers
+        ]
+    )
+    _set_pending(True)
+    start_drainer()
+    return True
+
+
+# Deferred versions of GitlabManager methods. They get the same arguments
+# and store the intended label changes instead of sending them.
+
+
+def defer_add_label_to_issue(
+    gitlab_manager: Any, label: Union[str, int], issue_iid: int
+) -> bool:
+    return defer_labels_changes([issue_iid], labels_to_add=[label])
+
+
+def defer_update_issue_labels(
+    gitlab_manager: Any,
+    issue_iid: int,
+    labels_to_add: Sequence[Union[str, int]] = (),
+    labels_to_remove: Sequence[Union[str, int]] = (),
+) -> bool:
+    return defer_labels_changes([issue_iid], labels_to_add, labels_to_remove)
+
+
+def defer_apply_labels_changes(
+    gitlab_manager: Any, labels_changes: Dict[int, Tuple[List[str], List[str]]]
+) -> bool:
+    return all(
+        [
+            defer_labels_changes([iid], labels_to_add, labels_to_remove)
+            for iid, (labels_to_add, labels_to_remove) in labels_changes.items()
+        ]
+    )
+
+
+def defer_move_issues(
+    gitlab_manager: Any,
+    search_by_labels: List[str],
+    labels_to_remove: List[str],
+    label_to_add: str,
+    other_labels_to_add: Optional[List[str]] = None,
+) -> bool:
+    return defer_labels_changes(
+        [None],
+        labels_to_add=[*(other_labels_to_add or []), label_to_add],
+        labels_to_remove=labels_to_remove,
+        search_by_labels=search_by_labels,
+    )
+
+
+def defer_move_issues_to_cr(gitlab_manager: Any, issues_numbers: List[int]) -> bool:
+    labels = get_app_config().labels
+    return defer_labels_changes(
+        issues_numbers,
+        labels_to_add=[labels.in_review],
+        labels_to_remove=[labels.to_do, labels.in_progress],
+    )
+
+
+def defer_move_issues_to_merged(
+    gitlab_manager: Any, issues_numbers: List[int], target_branch: str
+) -> bool:
+    labels = get_app_config().labels
+    return defer_labels_changes(
+        issues_numbers,
+        labels_to_add=[labels.merged, target_branch + " branch"],
+        labels_to_remove=[labels.in_review],
+    )
+
+
+def defer_transition_issues(
+    gitlab_manager: Any,
+    issues_numbers: List[int],
+    from_labels: List[Union[str, int]],
+    to_label: Union[str, int],
+) -> bool:
+    return defer_labels_changes(
+        issues_numbers,
+        labels_to_add=[to_label],
+        labels_to_remove=from_labels,
+        required_labels=from_labels,
+    )
+
+
+class _Throttle:
+    def __init__(self, rate: Optional[float]):
+        self.interval = 1 / rate if rate else 0.0
+        self.next_time = time.monotonic()
+
+    def wait(self) -> None:
+        delay = self.next_time - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_time = max(self.next_time, time.monotonic()) + self.interval
+
+
+def _send_labels_changes(
+    gitlab_manager: Any,
+    labels_changes: Dict[int, Tuple[List[str], List[str]]],
+    throttle: _Throttle,
+) -> None:
+    for iid, (labels_to_add, labels_to_remove) in labels_changes.items():
+        throttle.wait()
+        gitlab_manager._update_labels(iid, labels_to_add, labels_to_remove)
+
+
+def _claim_entries(limit: int) -> Optional[List[Any]]:
+    """
+    Claim the oldest entries of the outbox for ``CLAIM_SECONDS`` in a short
+    transaction. Entries are applied in order, so they are claimed only if
+    the oldest one isn't claimed by another process.
+
+    :return: Claimed entries or None if another process claimed the oldest ones.
+    """
+
+    from datetime import timedelta
+
+    from django.db import transaction
+    from django.db.models import Q
+    from django.utils import timezone
+
+    from auto_gitlab.models import OutboxEntry
+
+    now = timezone.now()
+    unclaimed = Q(claimed_until__isnull=True) | Q(claimed_until__lte=now)
+    with transaction.atomic():
+        entries = list(
+            OutboxEntry.objects.filter(
+                project_id=get_app_config().connection.project_id
+            ).order_by("id")[:limit]
+        )
+        if not entries:
+            return []
+        claimed_until = now + timedelta(seconds=CLAIM_SECONDS)
+        # The update is atomic, so only one process claims the oldest entry
+        if not OutboxEntry.objects.filter(unclaimed, id=entries[0].id).update(
+            claimed_until=claimed_until
+        ):
+            return None
+        OutboxEntry.objects.filter(
+            unclaimed, id__in=[entry.id for entry in entries[1:]]
+        ).update(claimed_until=claimed_until)
+    return entries
+
+
+def _apply_entries(entries: List[Any], gitlab_manager: Any) -> None:
+    from gitlab import GitlabError
+
+    from auto_gitlab.utils import is_retryable_error
+
+    throttle = _Throttle(get_app_config().outbox.rate)
+    token = _draining.set(True)
+    try:
+        with events_batch() as batch:
+            for entry in entries:
+                try:
+                    labels_to_add, labels_to_remove, required_labels = [
+                        [
+                            gitlab_manager._get_label_dict(label)["name"]
+                            for label in labels
+                        ]
+                        for labels in (
+                            json.loads(entry.labels_to_add),
+                            json.loads(entry.labels_to_remove),
+                            json.loads(entry.required_labels),
+                        )
+                    ]
+                except GitlabError as e:
+                    if is_retryable_error(e):
+                        raise
+                    logger.error(f"Outbox entry '{entry}' was skipped: {e!r}")
+                    continue
+
+                if entry.issue_iid is None:
+                    # Queued changes are taken into account by the search, and
+                    # the changes of every page are sent before the next one is read
+                    for page in gitlab_manager._iter_moved_issues_pages(
+                        json.loads(entry.search_by_labels),
+                        labels_to_remove,
+                        labels_to_add,
+                    ):
+                        for issue in page:
+                            gitlab_manager._move_issue(
+                                issue, labels_to_remove, labels_to_add
+                            )
+                        _send_labels_changes(
+                            gitlab_manager,
+                            batch.pop_labels_changes([issue.iid for issue in page]),
+                            throttle,
+                        )
+                elif required_labels:
+                    for issue in gitlab_manager._iter_opened_issues(
+                        issues_numbers=[entry.issue_iid]
+                    ):
+                        if set(required_labels).intersection(issue.labels):
+                            gitlab_manager._move_issue(
+                                issue, labels_to_remove, labels_to_add
+                            )
+                else:
+                    batch.add_labels_changes(
+                        entry.issue_iid, labels_to_add, labels_to_remove
+                    )
+            _send_labels_changes(gitlab_manager, batch.pop_labels_changes(), throttle)
+    finally:
+        _draining.reset(token)
+
+
+def drain_outbox(limit: int = DRAIN_BATCH_SIZE) -> Optional[int]:
+    """
+    Apply the oldest entries of the outbox and delete them. Changes of every issue
+    are merged, so it's updated once, and writes are limited to ``outbox.rate``
+    per second. Entries stay in the outbox if GitLab can't be reached.
+
+    The entries are claimed for ``CLAIM_SECONDS`` in a short database transaction,
+    so other processes skip them, and GitLab is called after it's committed.
+    Entries claimed by a process which died are taken over when the claim expires.
+
+    :return: Number of applied entries or None if another process drains the outbox.
+    """
+
+    from auto_gitlab.gitlab_instance import get_gitlab_manager
+    from auto_gitlab.models import OutboxEntry
+
+    entries = _claim_entries(limit)
+    if not entries:
+        return None if entries is None else 0
+
+    entries_ids = [entry.id for entry in entries]
+    try:
+        _apply_entries(entries, get_gitlab_manager())
+    except BaseException:
+        # Released, so the next attempt doesn't wait for the claim to expire
+        OutboxEntry.objects.filter(id__in=entries_ids).update(claimed_until=None)
+        raise
+    OutboxEntry.objects.filter(id__in=entries_ids).delete()
+    logger.info(f"{len(entries)} outbox entries were sent to GitLab.")
+    return len(entries)
+
+
+def _drain_until_empty() -> None:
+    global _drainer
+    from django.db import close_old_connections
+
+    # A zero interval would query the database in a loop
+    retry_interval = max(
+        get_app_config().outbox.retry_interval or 0, MIN_RETRY_INTERVAL_SECONDS
+    )
+    interval = retry_interval
+    while True:
+        close_old_connections()
+        try:
+            drained = drain_outbox()
+        except Exception as e:
+            # Waiting longer every time, so a recovering GitLab isn't flooded
+            logger.warning(
+                f"GitLab outbox couldn't be drained, next attempt in {interval} s: {e!r}"
+            )
+            time.sleep(interval)
+            interval = min(interval * 2, MAX_RETRY_INTERVAL_SECONDS)
+            continue
+
+        interval = retry_interval
+        if drained is None:
+            # Another process drains the outbox
+            time.sleep(interval)
+        elif drained == 0:
+            with _drainer_lock:
+                _set_pending(False)
+                _drainer = None
+            close_old_connections()
+            return
+
+
+def start_drainer() -> None:
+    """
+    Start the thread sending the outbox entries to GitLab, unless it's running.
+    The thread stops when the outbox is empty.
+    """
+
+    global _drainer
+    with _drainer_lock:
+        if _drainer is not None:
+            return
+        _drainer = threading.Thread(
+            target=_drain_until_empty, name="auto-gitlab-outbox", daemon=True
+        )
+        _drainer.start()
@@ -0,0 +1,377 @@
+import logging
+import re
+import string
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Iterator, List, Dict, Any, FrozenSet, Tuple
+
+try:
+    from re import _parser as sre_parse, _compiler as sre_compile
+    from re import _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_compile
+    import sre_constants
+
+logger = logging.getLogger(__name__)
+
+# Longer texts are cut before they are matched. GitLab titles and branch names are shorter.
+MAX_MATCHED_TEXT_LENGTH = 1024
+# Matches taking longer are logged and counted as slow
+SLOW_MATCH_SECONDS = 0.01
+
+# Characters used to check if two parts of a pattern can match the same character
+PROBE_CHARACTERS = string.printable + "\u00e9\u00a0\u0416\u4e00"
+# Counted repeats are checked with at most that many copies of the repeated part
+MAX_EXPANDED_REPEATS = 3
+# Enough transitions to find two ways of matching in any state
+MAX_FOUND_TRANSITIONS = 10_000
+SINGLE_CHARACTER_OPS = (
+    sre_constants.LITERAL,
+    sre_constants.NOT_LITERAL,
+    sre_constants.IN,
+    sre_constants.ANY,
+)
+UNBOUNDED_REPEATS = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT)
+# Possessive repeats and atomic groups (Python 3.11+) never backtrack
+NON_BACKTRACKING = tuple(
+    op
+    for op in (
+        getattr(sre_constants, "POSSESSIVE_REPEAT", None),
+        getattr(sre_constants, "ATOMIC_GROUP", None),
+    )
+    if op is not None
+)
+
+# Seconds of matching left for the handled event
+_match_budget: ContextVar[Optional[List[float]]] = ContextVar(
+    "auto_gitlab_match_budget", default=None
+)
+
+_stats = {"matches": 0, "slow_matches": 0, "skipped_matches": 0}
+_stats_lock = threading.Lock()
+
+
+def _matched_characters(item: Any) -> FrozenSet[str]:
+    # Patterns are matched against titles with re.IGNORECASE as well
+    compiled = sre_compile.compile(
+        sre_parse.SubPattern(sre_parse.State(), [item]), re.IGNORECASE
+    )
+    return frozenset(
+        character for character in PROBE_CHARACTERS if compiled.fullmatch(character)
+    )
+
+
+class _Automaton:
+    """
+    Nondeterministic automaton with the structure of the backtracking matcher: every
+    way of matching a text by the pattern is a distinct path, e.g. ``(a+)+`` has two
+    ``a`` transitions after an ``a`` - one for each repeat.
+    """
+
+    def __init__(self):
+        self.states_count = 1
+        # Transitions of every state: (characters, next state), None for empty ones
+        self.transitions: Dict[int, List[Tuple[Optional[FrozenSet[str]], int]]] = {}
+        # Parts matched apart from the rest, like lookarounds, checked on their own
+        self.separate_parts: List[Any] = []
+
+    def new_state(self) -> int:
+        self.states_count += 1
+        return self.states_count - 1
+
+    def add(self, state: int, characters: Optional[FrozenSet[str]], next_state: int):
+        self.transitions.setdefault(state, []).append((characters, next_state))
+
+    def build(self, items: Any, state: int) -> int:
+        """
+        Add the transitions of the pattern parts starting from the state
+        and return the state reached after them.
+        """
+
+        for op, av in items:
+            state = self._build_item(op, av, state)
+        return state
+
+    def _characters(self, items: Any) -> FrozenSet[str]:
+        automaton = _Automaton()
+        automaton.build(items, 0)
+        return frozenset().union(
+            *(
+                characters
+                for transitions in automaton.transitions.values()
+                for characters, _ in transitions
+                if characters is not None
+            )
+        )
+
+    def _build_item(self, op: Any, av: Any, state: int) -> int:
+        if op in SINGLE_CHARACTER_OPS:
+            next_state = self.new_state()
+            self.add(state, _matched_characters((op, av)), next_state)
+            return next_state
+        if op == sre_constants.SUBPATTERN:
+            return self.build(av[-1], state)
+        if op == sre_constants.BRANCH:
+            return self._build_branches(av[1], state)
+        if op == sre_constants.GROUPREF_EXISTS:
+            return self._build_branches([av[1], av[2] or []], state)
+        if op in UNBOUNDED_REPEATS:
+            return self._build_repeat(*av, state)
+        if op in NON_BACKTRACKING:
+            # Its text is matched in one way only, so it's walked as one character.
+            # Backtracking inside it is checked on its own.
+            items = av if op == getattr(sre_constants, "ATOMIC_GROUP", None) else av[2]
+            self.separate_parts.append(items)
+            next_state = self.new_state()
+            self.add(state, self._characters(items), next_state)
+            if sre_parse.SubPattern(sre_parse.State(), [(op, av)]).getwidth()[0] == 0:
+                self.add(state, None, next_state)
+            return next_state
+        if op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            self.separate_parts.append(av[1])
+        # Anchors, lookarounds and backreferences don't add ways of matching
+        return state
+
+    def _build_branches(self, branches: List[Any], state: int) -> int:
+        end_state = self.new_state()
+        for branch in branches:
+            branch_state = self.new_state()
+            self.add(state, None, branch_state)
+            self.add(self.build(branch, branch_state), None, end_state)
+        return end_state
+
+    def _build_repeat(
+        self, min_count: int, max_count: int, item: Any, state: int
+    ) -> int:
+        # Longer counted repeats don't add new ways of matching
+        for _ in range(min(min_count, MAX_EXPANDED_REPEATS)):
+            state = self.build(item, state)
+        if max_count == sre_constants.MAXREPEAT:
+            loop_state = self.new_state()
+            self.add(state, None, loop_state)
+            body_state = self.new_state()
+            self.add(loop_state, None, body_state)
+            self.add(self.build(item, body_state), None, loop_state)
+            return loop_state
+        end_state = self.new_state()
+        for _ in range(min(max_count - min_count, MAX_EXPANDED_REPEATS)):
+            self.add(state, None, end_state)
+            state = self.build(item, state)
+        self.add(state, None, end_state)
+        return end_state
+
+    def _character_transitions(self, state: int) -> List[Tuple[FrozenSet[str], int]]:
+        """
+        Transitions on characters reachable by empty transitions, once for each way
+        of reaching them. An empty transition is taken once on the way, like
+        the matcher stops repeats which match an empty text.
+        """
+
+        found = []
+        path = set()
+
+        def visit(current_state: int):
+            transitions = self.transitions.get(current_state, [])
+            for index, (characters, next_state) in enumerate(transitions):
+                if characters is not None:
+                    found.append((characters, next_state))
+                elif (current_state, index) not in path and len(
+                    found
+                ) < MAX_FOUND_TRANSITIONS:
+                    path.add((current_state, index))
+                    visit(next_state)
+                    path.remove((current_state, index))
+
+        visit(state)
+        return found
+
+    def is_exponentially_ambiguous(self) -> bool:
+        """
+        Check if a text can be matched in exponentially many ways - if a state can
+        be reached from itself by two different paths matching the same text.
+        Two copies of the automaton are walked together on the same characters,
+        and such paths make a cycle through a pair of equal and of different states.
+        """
+
+        # Transitions on characters are the states of the walked automaton,
+        # so transitions to one state reached in different ways are different
+        edges = [(frozenset(), 0)]
+        next_edges: List[List[int]] = []
+        edges_of_states: Dict[int, List[int]] = {}
+        index = 0
+        while index < len(edges):
+            state = edges[index][1]
+            if state not in edges_of_states:
+                edges_of_states[state] = []
+                for transition in self._character_transitions(state):
+                    edges_of_states[state].append(len(edges))
+                    edges.append(transition)
+            next_edges.append(edges_of_states[state])
+            index += 1
+
+        graph: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+        pending = [(0, 0)]
+        while pending:
+            pair = pending.pop()
+            if pair in graph:
+                continue
+            graph[pair] = [
+                (first, second)
+                for first in next_edges[pair[0]]
+                for second in next_edges[pair[1]]
+                if edges[first][0] & edges[second][0]
+            ]
+            pending.extend(graph[pair])
+        return any(
+            any(first == second for first, second in component)
+            and any(first != second for first, second in component)
+            for component in _strongly_connected_components(graph)
+        )
+
+
+def _strongly_connected_components(graph: Dict[Any, List[Any]]) -> List[List[Any]]:
+    """
+    Tarjan's algorithm, without recursion. Only components with a cycle are returned.
+    """
+
+    indexes: Dict[Any, int] = {}
+    low_links: Dict[Any, int] = {}
+    stack: List[Any] = []
+    on_stack = set()
+    components = []
+    for root in graph:
+        if root in indexes:
+            continue
+        work = [(root, iter(graph[root]))]
+        indexes[root] = low_links[root] = len(indexes)
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, successors = work[-1]
+            for successor in successors:
+                if successor not in indexes:
+                    indexes[successor] = low_links[successor] = len(indexes)
+                    stack.append(successor)
+                    on_stack.add(successor)
+                    work.append((successor, iter(graph[successor])))
+                    break
+                if successor in on_stack:
+                    low_links[node] = min(low_links[node], indexes[successor])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low_links[parent] = min(low_links[parent], low_links[node])
+                if low_links[node] == indexes[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.remove(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) > 1 or node in graph[node]:
+                        components.append(component)
+    return components
+
+
+def _is_exponentially_ambiguous(items: Any) -> bool:
+    automaton = _Automaton()
+    automaton.build(items, 0)
+    return automaton.is_exponentially_ambiguous() or any(
+        _is_exponentially_ambiguous(part) for part in automaton.separate_parts
+    )
+
+
+def check_pattern(pattern: str) -> Optional[str]:
+    """
+    Return the reason why the pattern can't be used safely on texts sent to
+    the webhook or None if it can be. Patterns which can match a text in exponentially
+    many ways, like nested or overlapping repeats and repeated alternatives matching
+    the same text, are rejected, as their matching time may grow exponentially.
+    """
+
+    try:
+        re.compile(pattern)
+    except re.error as e:
+        return f"invalid regular expression: {e}"
+    if _is_exponentially_ambiguous(sre_parse.parse(pattern)):
+        return (
+            "nested or overlapping repeats (like '(a+)+' or '(a|aa)+') may cause "
+            "catastrophic backtracking"
+        )
+    return None
+
+
+@contextmanager
+def match_budget(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Limit the time spent on matching configured patterns inside the block.
+    Once it's used up, the next matches are skipped. None or 0 means no limit.
+
+    The budget is checked between matches, so it isn't a hard limit - a running match
+    isn't stopped and may exceed it. Such matches are bounded by the rejection of
+    patterns flagged by ``check_pattern`` when the config file is read and by
+    ``MAX_MATCHED_TEXT_LENGTH``.
+    """
+
+    token = _match_budget.set([seconds] if seconds else None)
+    try:
+        yield
+    finally:
+        _match_budget.reset(token)
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def _match(method: str, pattern: str, text: str, flags: int = 0) -> Any:
+    budget = _match_budget.get()
+    if budget is not None and budget[0] <= 0:
+        _count("skipped_matches")
+        logger.warning(
+            f"Pattern '{pattern}' wasn't matched - time of matching for the event is used up."
+        )
+        return None
+
+    started = time.perf_counter()
+    result = getattr(re, method)(pattern, text[:MAX_MATCHED_TEXT_LENGTH], flags)
+    duration = time.perf_counter() - started
+    if budget is not None:
+        budget[0] -= duration
+    _count("matches")
+    if duration >= SLOW_MATCH_SECONDS:
+        _count("slow_matches")
+        logger.warning(
+            f"Pattern '{pattern}' took {duration * 1000:.0f} ms "
+            f"to match a text of {len(text)} characters."
+        )
+    return result
+
+
+def search_pattern(pattern: str, text: str, flags: int = 0) -> Optional[re.Match]:
+    """
+    ``re.search`` for patterns from the config file. The text is cut to
+    ``MAX_MATCHED_TEXT_LENGTH``, matching time is taken from the event's budget
+    and slow matches are reported.
+    """
+
+    return _match("search", pattern, text, flags)
+
+
+def findall_pattern(pattern: str, text: str, flags: int = 0) -> List[Any]:
+    """
+    ``re.findall`` for patterns from the config file, limited like ``search_pattern``.
+    """
+
+    return _match("findall", pattern, text, flags) or []
+
+
+def get_patterns_stats() -> Dict[str, int]:
+    with _stats_lock:
+        return dict(_stats)
@@ -0,0 +1,85 @@
+import gzip
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional, Iterator, Dict, Mapping
+
+from django.conf import settings
+
+from auto_gitlab.config.app_config_instance import get_app_config
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Headers of the delivery that are recorded, apart from the secret token
+RECORDED_HEADERS_PREFIX = "x-gitlab-"
+SECRET_HEADERS = {"x-gitlab-token"}
+
+_record_lock = threading.Lock()
+
+
+@dataclass
+class Delivery:
+    event_type: str
+    body: bytes
+    timestamp: float = 0.0
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+def get_record_file_path() -> Optional[str]:
+    record_file = get_app_config().record_file
+    if not record_file:
+        return None
+    return os.path.join(settings.BASE_DIR, record_file)
+
+
+def record_delivery(
+    file_name: str,
+    event_type: str,
+    body: bytes,
+    headers: Optional[Mapping[str, str]] = None,
+) -> None:
+    """
+    Append the webhook delivery and its GitLab headers (without the secret token)
+    to the gzip compressed JSONL file. Every call appends a complete gzip member
+    with one write, so the file stays readable even if the application is stopped
+    while recording. Processes recording to the same file take turns with ``flock``.
+    """
+
+    record = {"t": round(time.time(), 3), "event": event_type, "body": body.decode()}
+    recorded_headers = {
+        name: value
+        for name, value in (headers or {}).items()
+        if name.lower().startswith(RECORDED_HEADERS_PREFIX)
+        and name.lower() not in SECRET_HEADERS
+    }
+    if recorded_headers:
+        record["headers"] = recorded_headers
+    member = gzip.compress(json.dumps(record, separators=(",", ":")).encode() + b"\n")
+
+    with _record_lock:
+        fd = os.open(file_name, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            os.write(fd, member)
+        finally:
+            # Closing the file releases the lock
+            os.close(fd)
+
+
+def read_deliveries(file_name: str) -> Iterator[Delivery]:
+    with gzip.open(file_name, "rt") as file:
+        for line in file:
+            if line.strip():
+                record = json.loads(line)
+                yield Delivery(
+                    event_type=record["event"],
+                    body=record["body"].encode(),
+                    timestamp=record.get("t", 0.0),
+                    headers=record.get("headers") or {},
+                )
@@ -0,0 +1,168 @@
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Iterable
+
+from django.test import RequestFactory
+
+from auto_gitlab.config.app_config_instance import get_app_config
+from auto_gitlab.enums import GitlabEvent
+from auto_gitlab.executor import get_events_executor
+from auto_gitlab.fake_gitlab import FakeGitlab
+from auto_gitlab.gitlab_manager import DeadlineSession
+from auto_gitlab.gitlab_instance import get_gitlab_manager_class, set_gitlab_manager
+from auto_gitlab.recording import Delivery
+from auto_gitlab.utils import (
+    extract_issues_numbers_from_description,
+    extract_issues_numbers_from_branch,
+    extract_issues_numbers_from_commits,
+)
+from auto_gitlab.views import GitlabWebhookAPIView
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ReplayReport:
+    events: int = 0
+    errors: int = 0
+    duration: float = 0.0
+    latencies: List[float] = field(default_factory=list)
+    api_calls: int = 0
+
+    @property
+    def throughput(self) -> float:
+        return self.events / self.duration if self.duration else 0.0
+
+    @property
+    def api_calls_per_event(self) -> float:
+        return self.api_calls / self.events if self.events else 0.0
+
+    def latency_percentile(self, percentile: float) -> float:
+        if not self.latencies:
+            return 0.0
+        latencies = sorted(self.latencies)
+        index = min(len(latencies) - 1, int(len(latencies) * percentile / 100))
+        return latencies[index]
+
+
+def _referenced_issues_numbers(delivery: Delivery) -> List[int]:
+    data = json.loads(delivery.body)
+    if delivery.event_type == GitlabEvent.PUSH_EVENT.value:
+        return extract_issues_numbers_from_commits(data.get("commits") or [])
+    object_attributes = data.get("object_attributes") or {}
+    if delivery.event_type == GitlabEvent.ISSUE.value:
+        return [object_attributes["iid"]] if object_attributes.get("iid") else []
+    return extract_issues_numbers_from_description(
+        object_attributes.get("description") or ""
+    ) + extract_issues_numbers_from_branch(object_attributes.get("source_branch") or "")
+
+
+def create_fake_gitlab(
+    deliveries: Iterable[Delivery], latency: float = 0.0
+) -> FakeGitlab:
+    """
+    Create a fake GitLab server with the project from the config file and
+    the issues referenced in the deliveries, so handlers do real work.
+    """
+
+    fake_gitlab = FakeGitlab(
+        url=get_app_config().connection.url,
+        project_id=get_app_config().connection.project_id,
+        latency=latency,
+    )
+    todo_label = get_app_config().labels.to_do
+    for delivery in deliveries:
+        for issue_number in _referenced_issues_numbers(delivery):
+            if issue_number not in fake_gitlab.issues:
+                fake_gitlab.add_issue(
+                    issue_number, [todo_label] if isinstance(todo_label, str) else []
+                )
+    return fake_gitlab
+
+
+def replay(
+    deliveries: List[Delivery],
+    fake_gitlab: FakeGitlab,
+    rate: float = 0.0,
+    concurrency: int = 1,
+    use_cache: bool = False,
+) -> ReplayReport:
+    """
+    Send the deliveries to the webhook view with the given rate (events per second,
+    0 means as fast as possible) and concurrency. GitLab is replaced with the fake server.
+    The cache from the config file is used only if ``use_cache`` is True.
+    """
+
+    app_config = get_app_config()
+    record_file, cache_enabled = app_config.record_file, app_config.cache.enabled
+    outbox_enabled = app_config.outbox.enabled
+    # Replayed events must not be recorded again and fake data must not get
+    # to the cache or to the outbox, which would send it to the real GitLab
+    app_config.record_file = None
+    app_config.cache.enabled = cache_enabled and use_cache
+    app_config.outbox.enabled = False
+    set_gitlab_manager(
+        get_gitlab_manager_class()(
+            url=fake_gitlab.url,
+            project_id=fake_gitlab.project_id,
+            session=fake_gitlab.session(DeadlineSession()),
+        )
+    )
+    fake_gitlab.reset_calls()
+
+    view = GitlabWebhookAPIView.as_view()
+    request_factory = RequestFactory()
+    report = ReplayReport(events=len(deliveries))
+    report_lock = threading.Lock()
+
+    def send(delivery: Delivery) -> None:
+        # Recorded headers are sent again, the token is the configured one
+        meta = {
+            "HTTP_" + name.upper().replace("-", "_"): value
+            for name, value in delivery.headers.items()
+        }
+        meta["HTTP_X_GITLAB_EVENT"] = delivery.event_type
+        meta["HTTP_X_GITLAB_TOKEN"] = get_app_config().secret_token
+        request = request_factory.post(
+            "/handle_gitlab_events",
+            data=delivery.body,
+            content_type="application/json",
+            **meta,
+        )
+        started = time.perf_counter()
+        try:
+            status_code = view(request).status_code
+        except Exception:
+            logger.exception("Replayed GitLab event failed.")
+            status_code = 500
+        latency = time.perf_counter() - started
+        with report_lock:
+            report.latencies.append(latency)
+            if status_code != 200:
+                report.errors += 1
+
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for index, delivery in enumerate(deliveries):
+                if rate:
+                    delay = started + index / rate - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                pool.submit(send, delivery)
+        # Events handled in the background are included in the duration
+        executor = get_events_executor()
+        if executor is not None:
+            executor.join()
+    finally:
+        set_gitlab_manager(None)
+        app_config.record_file, app_config.cache.enabled = record_file, cache_enabled
+        app_config.outbox.enabled = outbox_enabled
+
+    report.duration = time.perf_counter() - started
+    report.api_calls = fake_gitlab.api_calls
+    return report
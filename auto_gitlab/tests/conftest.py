@@ -0,0 +1,93 @@
+from typing import Iterator, Type
+from unittest.mock import patch
+
+import pytest
+from django.core.cache import caches
+
+from config.app_config import AppConfig
+from fake_gitlab import FakeGitlab
+from gitlab_manager import GitlabManager, DeadlineSession
+
+fake_config_data = {
+    "connection": {
+        "url": "https://gitlab.example.com",
+        "project_id": 1,
+        "private_token": "some_token",
+    },
+    "labels": {
+        "to_do": "To do",
+        "in_progress": "In Progress",
+        "in_review": "CR",
+        "merged": "merged",
+        "backend": "backend",
+        "frontend": "frontend",
+        "bug": "bug",
+    },
+}
+
+
+@pytest.fixture
+def fake_app_config() -> Iterator[AppConfig]:
+    """
+    App config used by every module that reads it with ``get_app_config``,
+    so no '.gitlab-config.yml' file is needed.
+    """
+
+    app_config = AppConfig(
+        {key: dict(value) for key, value in fake_config_data.items()}
+    )
+    with patch.multiple(
+        "auto_gitlab.config.app_config_instance",
+        _configs=fake_config_data,
+        _app_config=app_config,
+    ):
+        yield app_config
+
+
+@pytest.fixture
+def fake_gitlab(fake_app_config: AppConfig) -> FakeGitlab:
+    return FakeGitlab(
+        url=fake_app_config.connection.url,
+        project_id=fake_app_config.connection.project_id,
+    )
+
+
+@pytest.fixture
+def cache_config(fake_app_config: AppConfig) -> Iterator[AppConfig]:
+    """
+    App config with the cache enabled. The cache is cleared before and after the test.
+    """
+
+    fake_app_config.cache.enabled = True
+    caches[fake_app_config.cache.alias].clear()
+    yield fake_app_config
+    caches[fake_app_config.cache.alias].clear()
+
+
+@pytest.fixture
+def gitlab_manager_class() -> Type[GitlabManager]:
+    """
+    Class of the ``gitlab_manager`` fixture. Override or parametrize it
+    to test another manager.
+    """
+
+    return GitlabManager
+
+
+@pytest.fixture
+def gitlab_manager(
+    fake_gitlab: FakeGitlab, gitlab_manager_class: Type[GitlabManager]
+) -> Iterator[GitlabManager]:
+    """
+    Manager of the fake GitLab, also used by the handlers and views.
+    Calls made while it's created aren't counted.
+    """
+
+    manager = gitlab_manager_class(
+        url=fake_gitlab.url,
+        project_id=fake_gitlab.project_id,
+        session=fake_gitlab.session(DeadlineSession()),
+    )
+    fake_gitlab.reset_calls()
+    with patch("auto_gitlab.gitlab_instance._gitlab_manager", manager):
+        yield manager
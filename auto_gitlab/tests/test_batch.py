@@ -0,0 +1,153 @@
+import json
+from typing import List, Dict, Any, Type
+from unittest.mock import patch
+
+import pytest
+from django.test import RequestFactory
+
+from config.app_config import AppConfig
+from enums import GitlabEvent, IssueAction, MergeRequestAction
+from fake_gitlab import FakeGitlab
+from gitlab_manager import GitlabManager
+from graphql_manager import GraphQLGitlabManager
+from views import GitlabWebhookBatchAPIView
+
+
+@pytest.fixture(params=[GitlabManager, GraphQLGitlabManager])
+def gitlab_manager_class(request) -> Type[GitlabManager]:
+    return request.param
+
+
+def _events() -> List[Dict[str, Any]]:
+    merge_request = {
+        "description": "Closes #1, #2",
+        "source_branch": "1-fixes",
+        "target_branch": "master",
+    }
+    return [
+        {
+            "object_kind": "issue",
+            "object_attributes": {
+                "action": IssueAction.CREATED.value,
+                "iid": 1,
+                "title": "Something doesn't work",
+            },
+        },
+        {
+            "object_kind": "merge_request",
+            "object_attributes": {
+                "action": MergeRequestAction.CREATED.value,
+                **merge_request,
+            },
+        },
+        {"object_kind": "pipeline", "object_attributes": {}},
+        {
+            "object_kind": "merge_request",
+            "object_attributes": {
+                "action": MergeRequestAction.MERGED.value,
+                **merge_request,
+            },
+        },
+    ]
+
+
+def _post_batch(body: str, content_type: str = "application/json"):
+    request = RequestFactory().post(
+        "/handle_gitlab_events/batch", data=body, content_type=content_type
+    )
+    return GitlabWebhookBatchAPIView.as_view()(request)
+
+
+def test_batch(fake_app_config: AppConfig, fake_gitlab: FakeGitlab, gitlab_manager):
+    fake_gitlab.add_issue(1, [])
+    fake_gitlab.add_issue(2, ["In Progress"])
+
+    response = _post_batch(json.dumps(_events()))
+
+    assert response.status_code == 202
+    assert [result["accepted"] for result in response.data["events"]] == [
+        True,
+        True,
+        False,
+        True,
+    ]
+    assert fake_gitlab.issue_labels(1) == ["merged", "master branch"]
+    assert fake_gitlab.issue_labels(2) == ["merged", "master branch"]
+    if isinstance(gitlab_manager, GraphQLGitlabManager):
+        # Merged changes of both issues are sent with one mutation
+        assert fake_gitlab.graphql_operations.count("UpdateIssuesLabels") == 1
+    else:
+        # Every issue is updated once
+        assert [method for method, _ in fake_gitlab.calls].count("PUT") == 2
+
+
+def test_batch_ndjson_of_recorded_deliveries(
+    fake_app_config: AppConfig, fake_gitlab: FakeGitlab, gitlab_manager
+):
+    fake_gitlab.add_issue(1, ["To do"])
+    lines = [
+        json.dumps(
+            {
+                "event": GitlabEvent.PUSH_EVENT.value,
+                "body": json.dumps({"commits": [{"message": "Fix #1"}]}),
+            }
+        ),
+        "{not json",
+        json.dumps(
+            {
+                "event": GitlabEvent.ISSUE.value,
+                "body": {
+                    "object_attributes": {
+                        "action": IssueAction.CLOSED.value,
+                        "iid": 1,
+                        "labels": [{"id": 1, "title": "In Progress"}],
+                    }
+                },
+            }
+        ),
+    ]
+
+    response = _post_batch("\n".join(lines) + "\n", "application/x-ndjson")
+
+    assert [result["accepted"] for result in response.data["events"]] == [
+        True,
+        False,
+        True,
+    ]
+    # Moved to 'In Progress' by the push and the label removed when closed
+    assert fake_gitlab.issue_labels(1) == []
+
+
+def test_batch_invalid(fake_app_config: AppConfig):
+    assert _post_batch("{not json").status_code == 400
+    assert _post_batch(json.dumps({"object_kind": "issue"})).status_code == 400
+
+
+@pytest.mark.parametrize("content_type", ["application/json", "application/x-ndjson"])
+def test_batch_too_many_events(
+    fake_app_config: AppConfig, fake_gitlab: FakeGitlab, content_type: str
+):
+    fake_app_config.batch.max_events = 3
+    events = _events()
+    if content_type == "application/json":
+        body = json.dumps(events)
+    else:
+        body = "\n".join(json.dumps(event) for event in events)
+
+    with patch("auto_gitlab.views.run_in_events_executor") as run_in_events_executor:
+        response = _post_batch(body, content_type)
+
+    assert response.status_code == 413
+    run_in_events_executor.assert_not_called()
+    assert fake_gitlab.calls == []
+
+
+def test_batch_body_too_large(fake_app_config: AppConfig):
+    body = json.dumps(_events())
+    fake_app_config.batch.max_body_size = len(body) - 1
+
+    with patch("auto_gitlab.views.run_in_events_executor") as run_in_events_executor:
+        response = _post_batch(body)
+
+    assert response.status_code == 413
+    run_in_events_executor.assert_not_called()
@@ -0,0 +1,123 @@
+import threading
+import time
+
+from cache import get_or_set, make_cache_key, delete
+from config.app_config import AppConfig
+from fake_gitlab import FakeGitlab
+from gitlab_manager import GitlabManager
+
+
+def _manager(fake_gitlab: FakeGitlab) -> GitlabManager:
+    return GitlabManager(
+        url=fake_gitlab.url,
+        project_id=fake_gitlab.project_id,
+        session=fake_gitlab.session(),
+    )
+
+
+def test_get_or_set_without_cache(fake_app_config: AppConfig):
+    calls = []
+    for _ in range(3):
+        assert get_or_set("key", lambda: calls.append(1) or "value") == "value"
+    assert len(calls) == 3
+
+
+def test_get_or_set(cache_config: AppConfig):
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return None
+
+    for _ in range(3):
+        assert get_or_set(make_cache_key("missing branch"), fetch) is None
+    assert len(calls) == 1
+
+    value = get_or_set(
+        make_cache_key("dumped"),
+        lambda: {"name": "CR"},
+        dump=lambda label: label["name"],
+        load=lambda name: {"name": name, "loaded": True},
+    )
+    assert value == {"name": "CR", "loaded": True}
+
+
+def test_make_cache_key(cache_config: AppConfig):
+    assert make_cache_key("protected_branch", "release 1.0") == (
+        "auto_gitlab:1:protected_branch:release%201.0"
+    )
+
+
+def test_get_or_set_stampede_lock(cache_config: AppConfig):
+    calls = []
+    results = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return "value"
+
+    def worker():
+        results.append(get_or_set(make_cache_key("labels"), fetch))
+
+    workers = [threading.Thread(target=worker) for _ in range(32)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ["value"] * 32
+
+
+def test_managers_share_cached_lookups(cache_config: AppConfig):
+    fake_gitlab = FakeGitlab(url=cache_config.connection.url)
+    label_id = fake_gitlab.add_label("CR")
+    fake_gitlab.add_branch("master", protected=True)
+
+    first_manager = _manager(fake_gitlab)
+    assert first_manager._get_label_dict(label_id)["name"] == "CR"
+    assert first_manager.find_protected_branch("master").name == "master"
+    assert first_manager.find_protected_branch("develop") is None
+    assert fake_gitlab.api_calls == 4
+
+    # Another process (here: another manager) doesn't call GitLab again
+    fake_gitlab.reset_calls()
+    second_manager = _manager(fake_gitlab)
+    assert second_manager.project.path_with_namespace == fake_gitlab.project_path
+    assert second_manager._get_label_dict(label_id)["name"] == "CR"
+    assert second_manager.find_protected_branch("master").protected
+    assert second_manager.find_protected_branch("develop") is None
+    assert fake_gitlab.api_calls == 0
+
+
+def test_expired_lookups_are_revalidated(cache_config: AppConfig):
+    fake_gitlab = FakeGitlab(url=cache_config.connection.url)
+    label_id = fake_gitlab.add_label("CR")
+    fake_gitlab.add_branch("master", protected=True)
+    manager = _manager(fake_gitlab)
+    manager._get_label_dict(label_id)
+    manager.find_protected_branch("master")
+
+    # The values expire, but their ETags are kept longer
+    for key in [
+        make_cache_key("project"),
+        make_cache_key("label", label_id),
+        make_cache_key("protected_branch", "master"),
+    ]:
+        delete(key)
+    fake_gitlab.labels[label_id]["name"] = "Code review"
+    fake_gitlab.reset_calls()
+
+    second_manager = _manager(fake_gitlab)
+    assert second_manager.project.path_with_namespace == fake_gitlab.project_path
+    assert second_manager._get_label_dict(label_id)["name"] == "Code review"
+    assert second_manager.find_protected_branch("master").name == "master"
+    assert fake_gitlab.api_calls == 3
+    # Only the changed label was sent again
+    assert fake_gitlab.not_modified_responses == 2
+
+    # Revalidated values are cached again
+    fake_gitlab.reset_calls()
+    assert _manager(fake_gitlab).find_protected_branch("master").protected
+    assert fake_gitlab.api_calls == 0
@@ -0,0 +1,63 @@
+from unittest.mock import patch
+
+import pytest
+
+from config.app_config import AppConfig
+from deadline import run_with_event_deadline
+from fake_gitlab import FakeGitlab
+from gitlab_manager import GitlabManager
+from graphql_manager import GraphQLGitlabManager
+
+ISSUES_COUNT = 500
+LATENCY = 0.005
+
+
+@pytest.fixture
+def release(fake_gitlab: FakeGitlab) -> FakeGitlab:
+    for iid in range(1, ISSUES_COUNT + 1):
+        fake_gitlab.add_issue(iid, ["In Progress"])
+    fake_gitlab.latency = LATENCY
+    return fake_gitlab
+
+
+def _move_release_issues_to_cr() -> None:
+    from auto_gitlab.gitlab_instance import get_gitlab_manager
+
+    run_with_event_deadline(
+        get_gitlab_manager().move_issues_to_cr, list(range(1, ISSUES_COUNT + 1))
+    )
+
+
+@pytest.mark.parametrize("gitlab_manager_class", [GitlabManager, GraphQLGitlabManager])
+def test_release_merge_request_is_moved_in_parallel(
+    fake_app_config: AppConfig, release: FakeGitlab, gitlab_manager
+):
+    _move_release_issues_to_cr()
+
+    assert all(
+        release.issue_labels(iid) == ["CR"] for iid in range(1, ISSUES_COUNT + 1)
+    )
+    assert 1 < release.max_active_requests <= fake_app_config.connection.concurrency
+
+
+def test_failed_chunk_is_reported(
+    fake_app_config: AppConfig, release: FakeGitlab, gitlab_manager, caplog
+):
+    release.latency = 0
+    handle = release.handle
+    failures = [1]
+
+    def handle_with_failure(method, url, body):
+        if method == "PUT" and url.endswith("/issues/30") and failures:
+            failures.pop()
+            return 500, {"message": "500 Internal Server Error"}, {}
+        return handle(method, url, body)
+
+    with patch.object(release, "handle", handle_with_failure):
+        gitlab_manager.apply_labels_changes(
+            {iid: (["CR"], ["In Progress"]) for iid in range(1, 101)}
+        )
+
+    # Other chunks are updated and the failed one is reported and retried
+    assert "Updating issues failed for chunk 2 of 4" in caplog.text
+    assert all(release.issue_labels(iid) == ["CR"] for iid in range(1, 101))
@@ -1,6 +1,6 @@
 import copy
 import os
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Union
 from unittest.mock import patch
 
 import pytest
@@ -15,6 +15,7 @@ from config.constants import (
     DEFAULT_ISSUE_IDENTIFIERS,
 )
 from config.exceptions import IncorrectConfigFormatError, NoEnvironmentVariableError
+from config import parser
 from config.parser import validate_config_file
 
 
@@ -313,6 +314,34 @@ def test_app_config_issue_identifiers(
         assert identifier.pattern == expected_issue_identifiers[index]["pattern"]
 
 
+@pytest.mark.parametrize(
+    "patterns,is_valid_file",
+    [
+        pytest.param({"issues_source_branch": r"(\d+)-"}, True),
+        pytest.param({"issues_source_branch": r"(\d+,)+"}, True),
+        pytest.param({"issues_source_branch": r"(\d+"}, False),
+        pytest.param({"merge_protected_branches": r"merge/((\w+)*)_to"}, False),
+        pytest.param(
+            {
+                "issue_identifiers": [
+                    {"name": "bug", "label": 7, "pattern": r"(\w+\s?)+!"}
+                ]
+            },
+            False,
+        ),
+    ],
+)
+def test_validate_config_patterns(patterns: Dict[str, Any], is_valid_file: bool):
+    config_data = copy.deepcopy(_valid_config_data)
+    config_data["patterns"] = patterns
+    if not is_valid_file:
+        # Raised by the parser, which imports exceptions from the package
+        with pytest.raises(parser.exceptions.IncorrectConfigFormatError):
+            validate_config_file(config_data)
+    else:
+        validate_config_file(config_data)
+
+
 def test_app_config_valid_environment_variable():
     valid_config_data = copy.deepcopy(_valid_config_data)
     valid_config_data["connection"]["private_token"] = {"env": "PRIVATE_TOKEN"}  # type: ignore
@@ -328,3 +357,28 @@ def test_app_config_invalid_environment_variable():
         os.environ, {"PRIVATE_TOKEN": "some_token_from_env"}
     ), pytest.raises(NoEnvironmentVariableError):
         AppConfig(valid_config_data)
+
+
+@pytest.mark.parametrize(
+    "push_data,expected_from_labels,expected_to_label",
+    [
+        pytest.param(
+            None,
+            [_valid_config_data["labels"]["to_do"]],
+            _valid_config_data["labels"]["in_progress"],
+        ),
+        pytest.param({"from_labels": [1, "Backlog"]}, [1, "Backlog"], 2),
+        pytest.param({"to_label": "Doing"}, [1], "Doing"),
+    ],
+)
+def test_app_config_push(
+    push_data: Dict[str, Any],
+    expected_from_labels: List[Union[str, int]],
+    expected_to_label: Union[str, int],
+):
+    valid_config_data = copy.deepcopy(_valid_config_data)
+    if push_data is not None:
+        valid_config_data["push"] = push_data
+    app_config = AppConfig(valid_config_data)
+    assert app_config.push.from_labels == expected_from_labels
+    assert app_config.push.to_label == expected_to_label
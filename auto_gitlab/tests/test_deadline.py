@@ -0,0 +1,77 @@
+import logging
+import time
+
+import pytest
+
+from config.app_config import AppConfig
+from deadline import deadline, remaining_seconds, get_request_timeout, DeadlineExceeded
+from executor import run_event_handler
+from fake_gitlab import FakeGitlab
+from utils import handle_merge_request_merged
+
+
+def test_deadline():
+    assert remaining_seconds() is None
+    assert get_request_timeout(10) == 10
+
+    with deadline(5):
+        assert 4 < remaining_seconds() <= 5
+        assert get_request_timeout(10) <= 5
+        assert get_request_timeout(1) == 1
+        with deadline(60):
+            # Nested deadline can't extend the outer one
+            assert remaining_seconds() <= 5
+        with deadline(0.01):
+            time.sleep(0.02)
+            with pytest.raises(DeadlineExceeded):
+                get_request_timeout(10)
+        assert remaining_seconds() > 4
+
+    assert remaining_seconds() is None
+
+
+def test_event_deadline_stops_handler(
+    fake_app_config: AppConfig, fake_gitlab: FakeGitlab, gitlab_manager, caplog
+):
+    fake_app_config.connection.event_deadline = 0.5
+    fake_gitlab.add_issue(1, ["CR"])
+    fake_gitlab.add_branch("master", protected=True)
+    fake_gitlab.latency = 0.3
+
+    started = time.monotonic()
+    with caplog.at_level(logging.ERROR, logger="auto_gitlab.deadline"):
+        run_event_handler(
+            None,
+            handle_merge_request_merged,
+            description="Closes #1",
+            source_branch="merge/master_to_iteration",
+            target_branch="iteration",
+        )
+
+    # Retries don't continue after the deadline and the next steps are skipped
+    assert time.monotonic() - started < 1.5
+    assert "GitlabManager.find_protected_branch" in caplog.text
+    # Label changes made in time are sent at the end of the event, after the deadline
+    assert "GitlabManager.move_issues_to_merged" not in caplog.text
+    assert "GitlabManager.apply_labels_changes" not in caplog.text
+    assert fake_gitlab.issue_labels(1) == ["merged", "iteration branch"]
+
+
+def test_event_finished_before_deadline(
+    fake_app_config: AppConfig, fake_gitlab: FakeGitlab, gitlab_manager, caplog
+):
+    fake_app_config.connection.event_deadline = 5
+    fake_gitlab.add_issue(1, ["CR"])
+    fake_gitlab.latency = 0.01
+
+    with caplog.at_level(logging.ERROR, logger="auto_gitlab.deadline"):
+        run_event_handler(
+            None,
+            handle_merge_request_merged,
+            description="Closes #1",
+            source_branch="1-fix",
+            target_branch="master",
+        )
+
+    assert fake_gitlab.issue_labels(1) == ["merged", "master branch"]
+    assert caplog.text == ""
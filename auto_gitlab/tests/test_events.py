@@ -0,0 +1,263 @@
+import json
+import pickle
+from unittest.mock import patch, MagicMock
+
+import pytest
+from django.test import RequestFactory
+
+from config.app_config import AppConfig
+from enums import GitlabEvent, IssueAction, MergeRequestAction
+from fake_gitlab import FakeGitlab
+from gitlab_manager import GitlabManager
+from views import GitlabWebhookAPIView
+
+# Handlers are registered in the module used by the views
+EVENTS_MODULE = "auto_gitlab.events"
+
+
+def _post_event(event_type: str, data: dict):
+    request = RequestFactory().post(
+        "/handle_gitlab_events",
+        data=json.dumps(data),
+        content_type="application/json",
+        HTTP_X_GITLAB_EVENT=event_type,
+    )
+    return GitlabWebhookAPIView.as_view()(request)
+
+
+def test_issue_event_projection():
+    from auto_gitlab.events import IssueEvent
+
+    event = IssueEvent.from_payload(
+        {
+            "object_attributes": {
+                "action": IssueAction.UPDATED.value,
+                "iid": 1,
+                "title": "Something doesn't work",
+                "description": "Not used by the handlers",
+                "labels": [{"id": 5, "title": "bug", "color": "#ff0000"}],
+            },
+            "changes": {"labels": {"previous": [], "current": []}},
+            "user": {"username": "author"},
+        }
+    )
+
+    assert (event.iid, event.labels_ids, event.label_names) == (1, [5], ["bug"])
+    assert not hasattr(event, "__dict__")
+    assert not hasattr(event, "description")
+    # Events are sent to process pools of the executor as well
+    assert pickle.loads(pickle.dumps(event)).title == event.title
+
+
+def test_event_subclass_must_implement_parsing_and_keys():
+    from auto_gitlab.events import Event
+
+    class IncompleteEvent(Event):
+        @classmethod
+        def from_payload(cls, data: dict) -> "IncompleteEvent":
+            return cls()
+
+    with pytest.raises(TypeError):
+        IncompleteEvent.from_payload({})
+
+
+def test_merge_request_keys_of_project_references(fake_app_config: AppConfig):
+    from auto_gitlab.events import MergeRequestEvent
+
+    event = MergeRequestEvent.from_payload(
+        {
+            "object_attributes": {
+                "action": MergeRequestAction.CREATED.value,
+                "description": "Closes group/project#1, other/project#2 and #3",
+                "source_branch": "feature",
+                "target_branch": "master",
+            },
+            "project": {"path_with_namespace": "group/project"},
+        }
+    )
+
+    # The same issues are moved by the handlers
+    assert event.get_keys() == [(1, 1), (1, 3)]
+
+
+@pytest.mark.parametrize(
+    "action",
+    [
+        MergeRequestAction.CREATED,
+        MergeRequestAction.UPDATED,
+        MergeRequestAction.MERGED,
+    ],
+)
+def test_merge_request_handlers_read_project_path_from_payload(
+    fake_app_config: AppConfig, action: MergeRequestAction
+):
+    # The project wasn't loaded, so it can't be read from the manager
+    manager = MagicMock(
+        spec=[
+            "move_issues_to_cr",
+            "move_issues_to_merged",
+            "handle_merge_of_protected_branches",
+        ]
+    )
+
+    with patch("auto_gitlab.gitlab_instance._gitlab_manager", manager):
+        response = _post_event(
+            GitlabEvent.MERGE_REQUEST.value,
+            {
+                "object_attributes": {
+                    "action": action.value,
+                    "description": "Closes group/project#1 and other/project#2",
+                    "source_branch": "feature",
+                    "target_branch": "master",
+                    "state": "opened",
+                },
+                "changes": {"description": {"previous": ""}},
+                "project": {"path_with_namespace": "group/project"},
+            },
+        )
+
+    assert response.status_code == 200
+    if action in (MergeRequestAction.CREATED, MergeRequestAction.UPDATED):
+        manager.move_issues_to_cr.assert_called_once_with([1])
+    else:
+        manager.move_issues_to_merged.assert_called_once_with([1], "master")
+
+
+def test_registered_handler(fake_app_config: AppConfig, fake_gitlab: FakeGitlab):
+    from auto_gitlab.events import event_handler, unregister_event_handler
+
+    fake_gitlab.add_issue(1, [])
+    manager = GitlabManager(
+        url=fake_gitlab.url,
+        project_id=fake_gitlab.project_id,
+        session=fake_gitlab.session(),
+    )
+    handled = []
+
+    @event_handler(GitlabEvent.MERGE_REQUEST, "close")
+    def on_merge_request_closed(event):
+        handled.append((event.action, event.source_branch))
+
+    try:
+        with patch("auto_gitlab.gitlab_instance._gitlab_manager", manager):
+            response = _post_event(
+                GitlabEvent.MERGE_REQUEST.value,
+                {
+                    "object_attributes": {
+                        "action": "close",
+                        "description": "Closes #1",
+                        "source_branch": "1-fixes",
+                    }
+                },
+            )
+    finally:
+        unregister_event_handler(
+            GitlabEvent.MERGE_REQUEST, "close", on_merge_request_closed
+        )
+
+    assert response.status_code == 200
+    assert handled == [("close", "1-fixes")]
+    # Built-in handlers aren't registered for the action
+    assert fake_gitlab.issue_labels(1) == []
+
+
+@pytest.mark.parametrize(
+    "event_type,data",
+    [
+        (
+            GitlabEvent.MERGE_REQUEST.value,
+            {"object_attributes": {"action": "approved", "description": "#1"}},
+        ),
+        (GitlabEvent.ISSUE.value, {"object_attributes": {"action": "reopen"}}),
+    ],
+)
+def test_unregistered_event_is_dropped(
+    fake_app_config: AppConfig, event_type: str, data: dict
+):
+    event_class = MagicMock()
+    event_class.get_action.return_value = data["object_attributes"]["action"]
+    with patch.dict(f"{EVENTS_MODULE}.EVENT_CLASSES", {event_type: event_class}), patch(
+        "auto_gitlab.views.run_event_handler"
+    ) as run_event_handler_mock:
+        response = _post_event(event_type, data)
+
+    assert response.status_code == 200
+    # Dropped before the payload is parsed
+    event_class.from_payload.assert_not_called()
+    run_event_handler_mock.assert_not_called()
+
+
+def test_built_in_handlers(fake_app_config: AppConfig, fake_gitlab: FakeGitlab):
+    fake_gitlab.add_issue(1, ["To do"])
+    manager = GitlabManager(
+        url=fake_gitlab.url,
+        project_id=fake_gitlab.project_id,
+        session=fake_gitlab.session(),
+    )
+
+    with patch("auto_gitlab.gitlab_instance._gitlab_manager", manager):
+        response = _post_event(
+            GitlabEvent.MERGE_REQUEST.value,
+            {
+                "object_attributes": {
+                    "action": MergeRequestAction.CREATED.value,
+                    "description": "Closes #1",
+                    "source_branch": "1-fixes",
+                    "target_branch": "master",
+                },
+            },
+        )
+
+    assert response.status_code == 200
+    assert fake_gitlab.issue_labels(1) == ["CR"]
+
+
+def test_merge_request_description_update(
+    fake_app_config: AppConfig, fake_gitlab: FakeGitlab
+):
+    fake_gitlab.add_issue(1, ["CR"])
+    fake_gitlab.add_issue(2, ["In Progress", "backend"])
+    fake_gitlab.add_issue(3, ["CR"])
+    manager = GitlabManager(
+        url=fake_gitlab.url,
+        project_id=fake_gitlab.project_id,
+        session=fake_gitlab.session(),
+    )
+    object_attributes = {
+        "action": MergeRequestAction.UPDATED.value,
+        "state": "opened",
+        "description": "Closes #2 #3",
+        "source_branch": "1-fixes",
+    }
+
+    with patch("auto_gitlab.gitlab_instance._gitlab_manager", manager):
+        fake_gitlab.reset_calls()
+        # Other changes (e.g. of the title) don't move any issue
+        _post_event(
+            GitlabEvent.MERGE_REQUEST.value,
+            {
+                "object_attributes": object_attributes,
+                "changes": {"title": {"previous": "Fix", "current": "Fixes"}},
+            },
+        )
+        assert fake_gitlab.api_calls == 0
+
+        response = _post_event(
+            GitlabEvent.MERGE_REQUEST.value,
+            {
+                "object_attributes": object_attributes,
+                "changes": {
+                    "description": {
+                        "previous": "Closes #1 #3",
+                        "current": "Closes #2 #3",
+                    }
+                },
+            },
+        )
+
+    assert response.status_code == 200
+    assert fake_gitlab.issue_labels(1) == ["In Progress"]
+    assert fake_gitlab.issue_labels(2) == ["backend", "CR"]
+    assert fake_gitlab.issue_labels(3) == ["CR"]
+    # Only the added and the removed issue are updated
+    assert [method for method, _ in fake_gitlab.calls].count("PUT") == 2
@@ -0,0 +1,201 @@
+import random
+import threading
+import time
+from typing import List
+from unittest.mock import patch
+
+import pytest
+
+from enums import GitlabEvent, MergeRequestAction
+from executor import OrderedExecutor, BULK_KEY, yield_to_interactive_events
+from fake_gitlab import FakeGitlab
+from gitlab_manager import GitlabManager
+from views import GitlabWebhookAPIView
+
+
+@pytest.fixture
+def executor() -> OrderedExecutor:
+    executor = OrderedExecutor(max_workers=8)
+    yield executor
+    executor.shutdown()
+
+
+def _record(results: List[str], lock: threading.Lock, name: str, delay: float = 0):
+    time.sleep(delay)
+    with lock:
+        results.append(name)
+
+
+def test_same_key_tasks_run_in_order(executor: OrderedExecutor):
+    results = []
+    lock = threading.Lock()
+    for index in range(20):
+        # Earlier tasks are slower, so only ordering by key keeps them first
+        executor.submit(
+            [("project", 1)], _record, results, lock, f"a{index}", 0.01 / (index + 1)
+        )
+    executor.shutdown()
+    assert results == [f"a{index}" for index in range(20)]
+
+
+def test_different_keys_run_in_parallel(executor: OrderedExecutor):
+    results = []
+    lock = threading.Lock()
+    executor.submit([1], _record, results, lock, "slow", 0.2)
+    executor.submit([2], _record, results, lock, "fast")
+    executor.shutdown()
+    assert results == ["fast", "slow"]
+
+
+def test_barrier_waits_for_earlier_and_blocks_later_tasks(executor: OrderedExecutor):
+    results = []
+    lock = threading.Lock()
+    executor.submit([1], _record, results, lock, "before", 0.1)
+    executor.submit(None, _record, results, lock, "barrier")
+    executor.submit([2], _record, results, lock, "after")
+    executor.shutdown()
+    assert results == ["before", "barrier", "after"]
+
+
+def test_bulk_task_doesnt_block_later_tasks(executor: OrderedExecutor):
+    results = []
+    lock = threading.Lock()
+    executor.submit([1], _record, results, lock, "before", 0.1)
+    executor.submit([BULK_KEY, 3], _record, results, lock, "bulk", 0.2)
+    executor.submit([2], _record, results, lock, "other issue")
+    executor.submit([3], _record, results, lock, "same issue")
+    executor.submit([BULK_KEY], _record, results, lock, "next bulk")
+    executor.shutdown()
+    assert results == ["other issue", "before", "bulk", "same issue", "next bulk"]
+
+
+def test_bulk_task_yields_to_running_tasks(executor: OrderedExecutor):
+    results = []
+    lock = threading.Lock()
+    bulk_started = threading.Event()
+    interactive_started = threading.Event()
+
+    def sweep():
+        _record(results, lock, "first page")
+        bulk_started.set()
+        interactive_started.wait()
+        yield_to_interactive_events()
+        _record(results, lock, "second page")
+
+    def interactive():
+        interactive_started.set()
+        _record(results, lock, "interactive", 0.1)
+
+    executor.submit([BULK_KEY], sweep)
+    bulk_started.wait()
+    executor.submit([1], interactive)
+    executor.shutdown()
+    assert results == ["first page", "interactive", "second page"]
+
+
+def test_failed_task_doesnt_block_next_tasks(executor: OrderedExecutor):
+    def fail():
+        raise ValueError()
+
+    results = []
+    lock = threading.Lock()
+    failed = executor.submit([1], fail)
+    executor.submit([1], _record, results, lock, "next")
+    executor.shutdown()
+    assert isinstance(failed.exception(), ValueError)
+    assert results == ["next"]
+
+
+def test_interleaved_merge_request_events(fake_app_config, executor: OrderedExecutor):
+    """
+    Stress test: merge requests are opened and merged concurrently.
+    Every issue must end up merged, i.e. no label update can be lost
+    and no 'open' event can be applied after the 'merge' one.
+    """
+
+    fake_gitlab = FakeGitlab(url=fake_app_config.connection.url, latency=0.001)
+    issues_numbers = list(range(1, 41))
+    for number in issues_numbers:
+        fake_gitlab.add_issue(number, ["In Progress", "backend"])
+    manager = GitlabManager(
+        url=fake_gitlab.url, project_id=1, session=fake_gitlab.session()
+    )
+
+    events = []
+    random.seed(0)
+    pending = {number: ["open", "merge"] for number in issues_numbers}
+    while pending:
+        number = random.choice(list(pending))
+        action = pending[number].pop(0)
+        if not pending[number]:
+            del pending[number]
+        events.append(
+            {
+                "action": (
+                    MergeRequestAction.CREATED.value
+                    if action == "open"
+                    else MergeRequestAction.MERGED.value
+                ),
+                # Every merge request is related to two issues, so the events overlap
+                "description": f"Related to #{number} #{number % 40 + 1}",
+                "source_branch": f"{number}-fixes",
+                "target_branch": "master",
+            }
+        )
+
+    with patch("auto_gitlab.utils.import_string", return_value=manager):
+        for object_attributes in events:
+            executor.submit(
+                GitlabWebhookAPIView.get_event_keys(
+                    event_type=GitlabEvent.MERGE_REQUEST.value,
+                    object_attributes=object_attributes,
+                ),
+                GitlabWebhookAPIView.handle_event,
+                event_type=GitlabEvent.MERGE_REQUEST.value,
+                object_attributes=object_attributes,
+            )
+        executor.shutdown()
+
+    for number in issues_numbers:
+        labels = fake_gitlab.issue_labels(number)
+        assert "CR" not in labels and "In Progress" not in labels
+        assert {"backend", "merged", "master branch"} <= set(labels)
+
+
+def test_interleaved_issue_moves(fake_app_config, executor: OrderedExecutor):
+    fake_gitlab = FakeGitlab(url=fake_app_config.connection.url, latency=0.001)
+    issues_numbers = list(range(1, 31))
+    for number in issues_numbers:
+        fake_gitlab.add_issue(number, ["In Progress"])
+    manager = GitlabManager(
+        url=fake_gitlab.url, project_id=1, session=fake_gitlab.session()
+    )
+
+    for number in issues_numbers:
+        executor.submit([(1, number)], manager.move_issues_to_cr, [number])
+    for number in reversed(issues_numbers):
+        executor.submit(
+            [(1, number)], manager.move_issues_to_merged, [number], f"branch{number}"
+        )
+    executor.shutdown()
+
+    for number in issues_numbers:
+        assert fake_gitlab.issue_labels(number) == ["merged", f"branch{number} branch"]
+
+
+def test_sweep_yields_between_pages(fake_app_config):
+    fake_gitlab = FakeGitlab(url=fake_app_config.connection.url)
+    for number in range(1, 251):
+        fake_gitlab.add_issue(number, ["CR"])
+    manager = GitlabManager(
+        url=fake_gitlab.url, project_id=1, session=fake_gitlab.session()
+    )
+
+    with patch(
+        "gitlab_manager.yield_to_interactive_events"
+    ) as yield_to_interactive_events_mock:
+        manager.move_issues(["CR"], ["CR"], "merged")
+
+    # Three pages of issues
+    assert yield_to_interactive_events_mock.call_count == 3
+    assert fake_gitlab.issue_labels(250) == ["merged"]
@@ -1,13 +1,23 @@
-from typing import List, Dict, Union
+import json
+import time
+from typing import List, Dict, Union, Optional, Any
 from unittest.mock import Mock, patch, MagicMock
 
 import pytest
+import requests
 from django.urls import reverse
+from gitlab import (
+    GitlabHttpError,
+    GitlabGetError,
+    GitlabAuthenticationError,
+    GitlabError,
+)
 
 from rest_framework.test import APIClient
 
-from config.app_config import AppConfig
+from config.app_config import AppConfig, BranchesConfig
 from enums import GitlabEvent, IssueAction, MergeRequestAction
+from fake_gitlab import FakeGitlab
 
 backend_label = {"name": "backend"}
 frontend_label = {"name": "frontend"}
@@ -42,17 +52,47 @@ with patch("config.app_config_instance.get_app_config") as mock:
         extract_issues_numbers_from_description,
         extract_issues_numbers_from_branch,
         extract_protected_branch_name_from_source_branch,
+        extract_issues_numbers_from_commits,
+        tokenize_issues_references,
+        group_issues_references_by_project,
+        IssueReference,
+        handle_issue_created,
+        handle_issue_updated,
+        handle_issue_closed,
+        is_retryable_error,
     )
 
 
 @pytest.fixture
+@patch("gitlab_manager.GitlabManager._get_project")
 @patch("gitlab_manager.gitlab.Gitlab")
-def gitlab_manager(gitlab_mock: MagicMock) -> GitlabManager:
-    project = Mock()
-    gitlab_mock.return_value.projects.get.return_value = project
+def gitlab_manager(
+    gitlab_mock: MagicMock, get_project_mock: MagicMock
+) -> GitlabManager:
+    get_project_mock.return_value = Mock()
+    get_project_mock.return_value.issues.path = "/projects/1/issues"
+    get_project_mock.return_value.labels.path = "/projects/1/labels"
+    get_project_mock.return_value.branches.path = "/projects/1/repository/branches"
+    gitlab_mock.return_value.api_url = "https://www.example.com/api/v4"
+    gitlab_mock.return_value.headers = {}
+    gitlab_mock.return_value.private_token = "token"
+    gitlab_mock.return_value.timeout = None
+    gitlab_mock.return_value.session.merge_environment_settings.return_value = {}
+    gitlab_mock.return_value.session.send.return_value.status_code = 200
     return GitlabManager(url="https://www.example.com/", project_id=1)
 
 
+@pytest.fixture
+def fake_gitlab_manager(fake_gitlab: FakeGitlab) -> GitlabManager:
+    manager = GitlabManager(
+        url=fake_gitlab.url,
+        project_id=fake_gitlab.project_id,
+        session=fake_gitlab.session(),
+    )
+    fake_gitlab.reset_calls()
+    return manager
+
+
 @pytest.fixture
 def api_client():
     return APIClient()
@@ -67,6 +107,11 @@ def api_client():
         pytest.param("", []),
         pytest.param("#123 #321 #111 #222 #333", [123, 321, 111, 222, 333]),
         pytest.param("#123#321", [123, 321]),
+        pytest.param("Closes #123, fixes #123 and #321", [123, 321]),
+        pytest.param("Run `make #123`\n```\n#321\n```\n#111", [111]),
+        pytest.param("~~~python\n# 1\n#321\n~~~~\n", []),
+        pytest.param("See group/project#123 and #321", [321]),
+        pytest.param("https://www.example.com/group/project/-/issues/123", []),
     ],
 )
 def test_extract_issues_numbers_from_description(
@@ -75,6 +120,72 @@ def test_extract_issues_numbers_from_description(
     assert extract_issues_numbers_from_description(description) == expected_numbers
 
 
+def test_extract_issues_numbers_from_description_of_project():
+    description = (
+        "Closes group/project#1, other/project#2, "
+        "https://www.example.com/group/project/-/issues/3 and #4"
+    )
+
+    assert extract_issues_numbers_from_description(
+        description, project_path="group/project"
+    ) == [1, 3, 4]
+
+
+def test_tokenize_issues_references():
+    description = (
+        "Closes #1, #2 and group/project#3. Related to #4 and #1\n"
+        "Fixes: https://www.example.com/group/subgroup/project/issues/5\n"
+        "Implements #4"
+    )
+
+    references = tokenize_issues_references(description)
+
+    assert references == [
+        IssueReference(iid=1, closing=True),
+        IssueReference(iid=2, closing=True),
+        IssueReference(iid=3, project="group/project", closing=True),
+        IssueReference(iid=4, closing=True),
+        IssueReference(iid=5, project="group/subgroup/project", closing=True),
+    ]
+    assert group_issues_references_by_project(references) == {
+        None: [1, 2, 4],
+        "group/project": [3],
+        "group/subgroup/project": [5],
+    }
+
+
+def test_tokenize_issues_references_of_large_description():
+    # Release notes with many references and unclosed code must be handled quickly
+    description = "\n".join(
+        f"* group/project#{number} #{number % 10}" for number in range(20000)
+    )
+    description += "\n```\n" + "#1 " * 20000
+
+    references = tokenize_issues_references(description)
+
+    assert [r.iid for r in references if r.project is None] == list(range(10))
+    assert len(references) == 20010
+
+
+@pytest.mark.parametrize(
+    "messages,expected_numbers",
+    [
+        pytest.param(["Fix #123"], [123]),
+        pytest.param(["Fix #123", "Related to #321, #123"], [123, 321]),
+        pytest.param(["Text", "", None], []),
+        pytest.param([], []),
+        pytest.param(
+            [f"Step {number}, see #{number % 3}" for number in range(500)], [0, 1, 2]
+        ),
+    ],
+)
+def test_extract_issues_numbers_from_commits(
+    messages: List[str], expected_numbers: List[int]
+):
+    commits = [{"id": str(index), "message": m} for index, m in enumerate(messages)]
+    assert extract_issues_numbers_from_commits(iter(commits)) == expected_numbers
+
+
 @pytest.mark.parametrize(
     "branch_name,expected_numbers",
     [
@@ -110,17 +221,19 @@ def test_extract_protected_branch_name_from_source_branch(
 
 
 def test_find_protected_branch(gitlab_manager: GitlabManager):
-    not_protected_branch = Mock(protected=False)
-    protected_branch = Mock(protected=True)
+    not_protected_branch = {"name": "feature", "protected": False}
+    protected_branch = {"name": "master", "protected": True}
     branches = [
         not_protected_branch,
         not_protected_branch,
         protected_branch,
         not_protected_branch,
     ]
-    gitlab_manager.project.branches.list.return_value = branches
+    gitlab_manager.gitlab_instance.session.send.return_value.json.return_value = (
+        branches
+    )
     found_branch = gitlab_manager.find_protected_branch("")
-    assert found_branch == protected_branch
+    assert found_branch.asdict() == protected_branch
 
 
 @pytest.mark.parametrize(
@@ -160,7 +273,8 @@ def test_find_protected_branch(gitlab_manager: GitlabManager):
                 "labels_to_remove": ["Internal QA", "Internal QA approved"],
                 "label_to_add": "staging QA",
             },
-            ["frontend", "master branch", "staging QA"],
+            # The issue isn't labelled "CR", so it isn't searched
+            ["Internal QA", "frontend", "master branch"],
         ),
         pytest.param(
             ["Internal QA", "frontend", "master branch", "iteration branch"],
@@ -174,23 +288,39 @@ def test_find_protected_branch(gitlab_manager: GitlabManager):
     ],
 )
 def test_move_one_issue(
-    gitlab_manager: GitlabManager,
+    fake_gitlab: FakeGitlab,
+    fake_gitlab_manager: GitlabManager,
     issue_initial_labels: List[str],
     move_issues_arguments: Dict[str, Union[str, List[str]]],
     issue_final_labels: List[str],
 ):
-    issue = MagicMock()
-    issue.labels = issue_initial_labels
-    gitlab_manager.project.issues.list.return_value = [issue]
-    gitlab_manager.move_issues(**move_issues_arguments)
-
-    gitlab_manager.project.issues.list.assert_called_once_with(
-        labels=move_issues_arguments["search_by_labels"],
-        state="opened",
-        get_all=True,
-        iterator=True,
+    fake_gitlab.add_issue(1, issue_initial_labels)
+    fake_gitlab.add_issue(2, issue_initial_labels, state="closed")
+
+    fake_gitlab_manager.move_issues(**move_issues_arguments)
+
+    assert fake_gitlab.issue_labels(1) == issue_final_labels
+    assert fake_gitlab.issue_labels(2) == issue_initial_labels
+    # Issues are updated only if their labels change
+    expected_updates = int(issue_initial_labels != issue_final_labels)
+    assert _issues_updates(fake_gitlab) == expected_updates
+
+
+def test_move_issues_removing_searched_label(
+    fake_gitlab: FakeGitlab, fake_gitlab_manager: GitlabManager
+):
+    fake_gitlab.add_issue(1, ["Internal QA", "frontend", "master branch"])
+    fake_gitlab.add_issue(2, ["Internal QA approved", "backend"])
+
+    fake_gitlab_manager.move_issues(
+        search_by_labels=["Internal QA"],
+        labels_to_remove=["Internal QA", "Internal QA approved"],
+        label_to_add="staging QA",
     )
-    assert issue.labels == issue_final_labels
+
+    assert fake_gitlab.issue_labels(1) == ["frontend", "master branch", "staging QA"]
+    assert fake_gitlab.issue_labels(2) == ["Internal QA approved", "backend"]
+    assert _issues_updates(fake_gitlab) == 1
 
 
 @pytest.mark.parametrize(
@@ -203,7 +333,7 @@ def test_move_one_issue(
     ],
 )
 def test_get_label_dict_ids(gitlab_manager: GitlabManager, label: Dict[str, str]):
-    gitlab_manager.project.labels.get.return_value.asdict.return_value = label
+    gitlab_manager.gitlab_instance.session.send.return_value.json.return_value = label
     assert gitlab_manager._get_label_dict(label=1) == label
 
 
@@ -220,63 +350,303 @@ def test_get_label_dict_names(gitlab_manager: GitlabManager, label: Dict[str, st
     assert gitlab_manager._get_label_dict(label=label["name"]) == label
 
 
-def _create_issue_with_labels(labels: List[str]) -> MagicMock:
-    return MagicMock(labels=labels)
+@pytest.mark.parametrize(
+    "labels_to_add,labels_to_remove,expected_data",
+    [
+        pytest.param(["bug", "To do"], [], {"add_labels": "bug,To do"}),
+        pytest.param([], ["CR"], {"remove_labels": "CR"}),
+        pytest.param(
+            ["merged"],
+            ["CR", "To do"],
+            {"add_labels": "merged", "remove_labels": "CR,To do"},
+        ),
+    ],
+)
+def test_update_issue_labels(
+    gitlab_manager: GitlabManager,
+    labels_to_add: List[str],
+    labels_to_remove: List[str],
+    expected_data: Dict[str, str],
+):
+    gitlab_manager.update_issue_labels(
+        issue_iid=1234, labels_to_add=labels_to_add, labels_to_remove=labels_to_remove
+    )
+
+    send_mock = gitlab_manager.gitlab_instance.session.send
+    send_mock.assert_called_once()
+    request = send_mock.call_args.args[0]
+    assert (request.method, request.path_url) == (
+        "PUT",
+        "/api/v4/projects/1/issues/1234",
+    )
+    assert json.loads(request.body) == expected_data
+
+
+def test_update_issue_labels_without_changes(gitlab_manager: GitlabManager):
+    gitlab_manager.update_issue_labels(issue_iid=1234)
+    gitlab_manager.gitlab_instance.session.send.assert_not_called()
 
 
-@patch.object(GitlabManager, "_get_label_dict")
-def test_move_issues_to_cr(
-    get_label_dict_mock: MagicMock, gitlab_manager: GitlabManager
+@pytest.mark.parametrize(
+    "title,labels,expected_labels_to_add",
+    [
+        pytest.param(
+            "[BUG][BACKEND] Something doesn't work", [], ["bug", "backend", "To do"]
+        ),
+        pytest.param("[BUG] Something doesn't work", ["bug"], ["To do"]),
+        pytest.param("[FRONTEND] New view", ["In Progress"], ["frontend"]),
+        pytest.param("[BUG] Something doesn't work", ["bug", "To do"], None),
+    ],
+)
+@patch("utils.import_string")
+def test_handle_issue_created(
+    import_string_mock: MagicMock,
+    gitlab_manager: GitlabManager,
+    title: str,
+    labels: List[str],
+    expected_labels_to_add: Optional[List[str]],
 ):
-    get_label_dict_mock.side_effect = [
-        todo_label,
-        in_progress_label,
-        cr_label,
-    ]
+    import_string_mock.return_value = MagicMock()
+    handle_issue_created(iid=1234, title=title, labels_ids=[], label_names=labels)
 
-    first_issue = _create_issue_with_labels(["In Progress", "backend"])
-    second_issue = _create_issue_with_labels(["In Progress", "bug", "backend"])
-    third_issue = _create_issue_with_labels(["To do", "backend"])
+    update_issue_labels_mock = import_string_mock.return_value.update_issue_labels
+    if expected_labels_to_add is None:
+        update_issue_labels_mock.assert_not_called()
+    else:
+        update_issue_labels_mock.assert_called_once_with(
+            issue_iid=1234, labels_to_add=expected_labels_to_add
+        )
 
-    gitlab_manager.project.issues.list.return_value = [
-        first_issue,
-        second_issue,
-        third_issue,
-    ]
-    gitlab_manager.move_issues_to_cr(issues_numbers=[1000, 1012, 1018])
 
-    assert first_issue.labels == third_issue.labels == ["backend", "CR"]
-    assert second_issue.labels == ["bug", "backend", "CR"]
+@pytest.mark.parametrize(
+    "changes,labels,expected_labels_to_add,expected_labels_to_remove",
+    [
+        pytest.param({}, [], None, None),
+        pytest.param(
+            {"labels": {"previous": [], "current": [{"id": 1, "title": "CR"}]}},
+            ["CR"],
+            None,
+            None,
+        ),
+        pytest.param(
+            {"title": {"previous": "Something", "current": "[BUG] Something"}},
+            ["To do"],
+            ["bug"],
+            [],
+        ),
+        pytest.param(
+            {"title": {"previous": "[BUG] Something", "current": "Something"}},
+            ["To do", "bug"],
+            [],
+            ["bug"],
+        ),
+        pytest.param(
+            {"title": {"previous": "[BUG] Something", "current": "[BUG] Other"}},
+            ["To do", "bug"],
+            None,
+            None,
+        ),
+        pytest.param(
+            {"title": {"previous": "Something", "current": "[BUG] Something"}},
+            ["To do", "bug"],
+            None,
+            None,
+        ),
+    ],
+)
+@patch("utils.import_string")
+def test_handle_issue_updated(
+    import_string_mock: MagicMock,
+    changes: Dict[str, Any],
+    labels: List[str],
+    expected_labels_to_add: Optional[List[str]],
+    expected_labels_to_remove: Optional[List[str]],
+):
+    import_string_mock.return_value = MagicMock()
+    handle_issue_updated(iid=1234, changes=changes, labels_ids=[], label_names=labels)
+
+    update_issue_labels_mock = import_string_mock.return_value.update_issue_labels
+    if expected_labels_to_add is None:
+        update_issue_labels_mock.assert_not_called()
+    else:
+        update_issue_labels_mock.assert_called_once_with(
+            issue_iid=1234,
+            labels_to_add=expected_labels_to_add,
+            labels_to_remove=expected_labels_to_remove,
+        )
 
 
-@patch.object(GitlabManager, "_get_label_dict")
-def test_move_issues_to_merged(
-    get_label_dict_mock: MagicMock, gitlab_manager: GitlabManager
+@pytest.mark.parametrize(
+    "labels_ids,label_names,expected_labels_to_remove",
+    [
+        pytest.param([], [], None),
+        pytest.param([10, 11], ["merged", "backend"], None),
+        pytest.param([20, 11], ["CR", "backend"], ["CR"]),
+        pytest.param([21, 20], ["To do", "CR"], ["To do", "CR"]),
+    ],
+)
+@patch("utils.import_string")
+def test_handle_issue_closed(
+    import_string_mock: MagicMock,
+    labels_ids: List[int],
+    label_names: List[str],
+    expected_labels_to_remove: Optional[List[str]],
 ):
-    get_label_dict_mock.side_effect = [
-        cr_label,
-        merged_label,
-    ]
+    import_string_mock.return_value = MagicMock()
+    handle_issue_closed(iid=1234, labels_ids=labels_ids, label_names=label_names)
 
-    first_issue = _create_issue_with_labels(["backend", "CR"])
-    second_issue = _create_issue_with_labels(["bug", "backend", "CR"])
-    third_issue = _create_issue_with_labels(["backend", "CR"])
+    update_issue_labels_mock = import_string_mock.return_value.update_issue_labels
+    if expected_labels_to_remove is None:
+        update_issue_labels_mock.assert_not_called()
+    else:
+        update_issue_labels_mock.assert_called_once_with(
+            issue_iid=1234, labels_to_remove=expected_labels_to_remove
+        )
 
-    gitlab_manager.project.issues.list.return_value = [
-        first_issue,
-        second_issue,
-        third_issue,
-    ]
-    gitlab_manager.move_issues_to_merged(
+
+def test_gitlab_manager_project_not_found(
+    fake_gitlab: FakeGitlab, caplog: pytest.LogCaptureFixture
+):
+    gitlab_manager = GitlabManager(
+        url=fake_gitlab.url,
+        project_id=fake_gitlab.project_id + 1,
+        session=fake_gitlab.session(),
+    )
+
+    assert not hasattr(gitlab_manager, "project")
+    assert (
+        f"GitLab Project with id {fake_gitlab.project_id + 1} not found" in caplog.text
+    )
+
+
+def _issues_updates(fake_gitlab: FakeGitlab) -> int:
+    return sum(1 for method, _ in fake_gitlab.calls if method == "PUT")
+
+
+def _issues_lists(fake_gitlab: FakeGitlab) -> int:
+    return sum(
+        1
+        for method, path in fake_gitlab.calls
+        if method == "GET" and path.endswith("/issues")
+    )
+
+
+@pytest.mark.parametrize(
+    "search_by_labels,labels_to_remove",
+    [
+        pytest.param(["iteration branch"], [], id="labels kept"),
+        # Moved issues leave the searched list, offset pages mustn't skip any
+        pytest.param(["iteration branch"], ["iteration branch"], id="labels removed"),
+    ],
+)
+def test_move_issues_pages(
+    fake_gitlab: FakeGitlab,
+    fake_gitlab_manager: GitlabManager,
+    search_by_labels: List[str],
+    labels_to_remove: List[str],
+):
+    for iid in range(1, 251):
+        fake_gitlab.add_issue(iid, ["iteration branch"])
+
+    fake_gitlab_manager.move_issues(
+        search_by_labels=search_by_labels,
+        labels_to_remove=labels_to_remove,
+        label_to_add="master branch",
+    )
+
+    assert all(
+        "master branch" in fake_gitlab.issue_labels(iid) for iid in range(1, 251)
+    )
+    # Pages of the largest size allowed by GitLab, the first page is read again
+    # after its issues are moved until the searched list is empty
+    assert _issues_lists(fake_gitlab) == 4
+    assert _issues_updates(fake_gitlab) == 250
+
+
+def test_iter_pages_prefetches_next_page(
+    fake_gitlab: FakeGitlab, fake_gitlab_manager: GitlabManager
+):
+    for iid in range(1, 301):
+        fake_gitlab.add_issue(iid, ["To do"])
+    fake_gitlab.latency = 0.1
+
+    started = time.monotonic()
+    for _ in fake_gitlab_manager._iter_pages(
+        fake_gitlab_manager.project.issues.path, {"state": "opened"}
+    ):
+        # Processing of a page takes as long as fetching the next one
+        time.sleep(0.1)
+
+    # Without the prefetch it would take 0.6 s (3 fetches and 3 pages processed)
+    assert time.monotonic() - started < 0.5
+    assert _issues_lists(fake_gitlab) == 3
+
+
+def test_move_issues_to_cr(fake_gitlab: FakeGitlab, fake_gitlab_manager: GitlabManager):
+    fake_gitlab.add_issue(1000, ["In Progress", "backend"])
+    fake_gitlab.add_issue(1012, ["In Progress", "bug", "backend"])
+    fake_gitlab.add_issue(1018, ["To do", "backend"])
+    fake_gitlab.add_issue(1020, ["To do"], state="closed")
+    fake_gitlab.add_issue(1024, ["CR"])
+    fake_gitlab.add_issue(1030, ["To do"])
+
+    fake_gitlab_manager.move_issues_to_cr(issues_numbers=[1000, 1012, 1018, 1020, 1024])
+
+    assert (
+        fake_gitlab.issue_labels(1000)
+        == fake_gitlab.issue_labels(1018)
+        == [
+            "backend",
+            "CR",
+        ]
+    )
+    assert fake_gitlab.issue_labels(1012) == ["bug", "backend", "CR"]
+    assert fake_gitlab.issue_labels(1020) == ["To do"]
+    assert fake_gitlab.issue_labels(1024) == ["CR"]
+    assert fake_gitlab.issue_labels(1030) == ["To do"]
+    assert _issues_updates(fake_gitlab) == 3
+
+
+def test_move_issues_to_merged(
+    fake_gitlab: FakeGitlab, fake_gitlab_manager: GitlabManager
+):
+    fake_gitlab.add_issue(1000, ["backend", "CR"])
+    fake_gitlab.add_issue(1012, ["bug", "backend", "CR"])
+    fake_gitlab.add_issue(1018, ["backend", "CR"])
+
+    fake_gitlab_manager.move_issues_to_merged(
         issues_numbers=[1000, 1012, 1018], target_branch="master"
     )
 
     assert (
-        first_issue.labels
-        == third_issue.labels
+        fake_gitlab.issue_labels(1000)
+        == fake_gitlab.issue_labels(1018)
         == ["backend", "merged", "master branch"]
     )
-    assert second_issue.labels == ["bug", "backend", "merged", "master branch"]
+    assert fake_gitlab.issue_labels(1012) == [
+        "bug",
+        "backend",
+        "merged",
+        "master branch",
+    ]
+
+
+def test_transition_issues(fake_gitlab: FakeGitlab, fake_gitlab_manager: GitlabManager):
+    fake_gitlab.add_issue(1000, ["To do", "backend"])
+    fake_gitlab.add_issue(1012, ["CR", "bug"])
+    fake_gitlab.add_issue(1018, ["Backlog"])
+
+    fake_gitlab_manager.transition_issues(
+        issues_numbers=[1000, 1012, 1018],
+        from_labels=["To do", "Backlog"],
+        to_label="In Progress",
+    )
+
+    assert fake_gitlab.issue_labels(1000) == ["backend", "In Progress"]
+    assert fake_gitlab.issue_labels(1012) == ["CR", "bug"]
+    assert fake_gitlab.issue_labels(1018) == ["In Progress"]
+    # One request listing the issues and one per moved issue
+    assert fake_gitlab.api_calls == 3
 
 
 @pytest.mark.parametrize(
@@ -284,57 +654,57 @@ def test_move_issues_to_merged(
     [
         pytest.param(
             [
-                MagicMock(protected=True),
-                MagicMock(protected=True),
+                {"protected": True},
+                {"protected": True},
             ],
             "master",
             ["master branch", "iteration branch"],
         ),
         pytest.param(
             [
-                MagicMock(protected=False),
-                MagicMock(protected=True),
-                MagicMock(protected=True),
+                {"protected": False},
+                {"protected": True},
+                {"protected": True},
             ],
             "merge/master_to_iteration_01.08",
             ["master branch", "iteration branch"],
         ),
         pytest.param(
             [
-                MagicMock(protected=False),
-                MagicMock(protected=True),
-                MagicMock(protected=False),
+                {"protected": False},
+                {"protected": True},
+                {"protected": False},
             ],
             "merge/branch_to_another_branch",
             ["master branch"],
         ),
         pytest.param(
             [
-                MagicMock(protected=False),
-                MagicMock(protected=True),
+                {"protected": False},
+                {"protected": True},
             ],
             "1000-backend-fixes",
             ["master branch"],
         ),
     ],
 )
-@patch.object(GitlabManager, "find_protected_branch")
+@patch.object(GitlabManager, "find_protected_branch_attributes")
 def test_handle_merge_of_protected_branches(
     protected_branch_mock: MagicMock,
-    branches: List[MagicMock],
+    branches: List[Dict[str, bool]],
     source_branch_name: str,
     expected_labels: List[str],
-    gitlab_manager: GitlabManager,
+    fake_gitlab: FakeGitlab,
+    fake_gitlab_manager: GitlabManager,
 ):
     protected_branch_mock.side_effect = branches
-    issue = _create_issue_with_labels(["master branch"])
-    gitlab_manager.project.issues.list.return_value = [issue]
+    fake_gitlab.add_issue(1, ["master branch"])
 
-    gitlab_manager.handle_merge_of_protected_branches(
+    fake_gitlab_manager.handle_merge_of_protected_branches(
         source_branch=source_branch_name, target_branch="iteration"
     )
 
-    assert issue.labels == expected_labels
+    assert fake_gitlab.issue_labels(1) == expected_labels
 
 
 @patch("gitlab_manager.GitlabManager")
@@ -355,9 +725,6 @@ def test_handle_issues_events(
         backend_label,
         todo_label,
     ]
-    issue = MagicMock()
-    issue.labels = []
-    gitlab_manager.project.issues.get.return_value = issue
 
     headers = {
         "HTTP_X-Gitlab-Event": GitlabEvent.ISSUE.value,
@@ -375,7 +742,11 @@ def test_handle_issues_events(
     response = api_client.post(url, data=data, format="json")
     assert response.status_code == 200
 
-    assert issue.labels == ["bug", "backend", "To do"]
+    send_mock = gitlab_manager.gitlab_instance.session.send
+    send_mock.assert_called_once()
+    assert json.loads(send_mock.call_args.args[0].body) == {
+        "add_labels": "bug,backend,To do"
+    }
 
 
 @patch("gitlab_manager.GitlabManager")
@@ -425,3 +796,164 @@ def test_handle_merge_request_events(
         source_branch=data["object_attributes"]["source_branch"],
         target_branch=data["object_attributes"]["target_branch"],
     )
+
+
+@pytest.mark.parametrize(
+    "source_branch,target_branch,expected_updates",
+    [
+        pytest.param("develop", "staging", 1),
+        pytest.param("merge/develop_to_main_1.01", "main", 2),
+    ],
+)
+def test_handle_merge_of_promoted_branches(
+    fake_app_config: AppConfig,
+    fake_gitlab: FakeGitlab,
+    fake_gitlab_manager: GitlabManager,
+    source_branch: str,
+    target_branch: str,
+    expected_updates: int,
+):
+    fake_app_config.branches = BranchesConfig(
+        promotion={"develop": "staging", "staging": ["main"]}
+    )
+    fake_gitlab.add_issue(1, ["develop branch"])
+    fake_gitlab.add_issue(2, ["develop branch", "staging branch"])
+    fake_gitlab.add_issue(3, ["develop branch", "staging branch", "main branch"])
+    fake_gitlab.add_issue(4, ["staging branch"])
+
+    fake_gitlab_manager.handle_merge_of_protected_branches(
+        source_branch=source_branch, target_branch=target_branch
+    )
+
+    for iid in (1, 2, 3):
+        assert target_branch + " branch" in fake_gitlab.issue_labels(iid)
+        # Branches between the promoted and the target branches are added as well
+        assert "staging branch" in fake_gitlab.issue_labels(iid)
+    assert fake_gitlab.issue_labels(4) == ["staging branch"]
+    # Protected branches aren't checked for promotions from the config
+    assert not any("branches" in path for _, path in fake_gitlab.calls)
+    # Issues that already have the target branch label aren't changed
+    assert _issues_updates(fake_gitlab) == expected_updates
+
+
+def test_app_config_branches_promotion():
+    branches = BranchesConfig(
+        promotion={"feature": "develop", "develop": ["staging"], "staging": ["main"]}
+    )
+
+    assert branches.promotion["feature"] == ["develop"]
+    assert branches.is_promotion("feature", "develop")
+    assert branches.is_promotion("develop", "main")
+    assert not branches.is_promotion("main", "develop")
+    assert not branches.is_promotion("hotfix", "main")
+    assert branches.get_promoted_branches("develop", "staging") == ["staging"]
+    assert branches.get_promoted_branches("feature", "main") == [
+        "develop",
+        "staging",
+        "main",
+    ]
+    assert branches.get_promoted_branches("main", "develop") == []
+
+
+@pytest.mark.parametrize(
+    "exception,expected_retryable",
+    [
+        pytest.param(requests.ReadTimeout(), True),
+        pytest.param(requests.ConnectionError(), True),
+        pytest.param(GitlabHttpError(response_code=502), True),
+        pytest.param(GitlabHttpError(response_code=429), True),
+        pytest.param(GitlabGetError(response_code=404), False),
+        pytest.param(GitlabHttpError(response_code=403), False),
+        pytest.param(GitlabHttpError(response_code=400), False),
+        pytest.param(GitlabAuthenticationError(response_code=401), False),
+        pytest.param(KeyError("iid"), False),
+    ],
+)
+def test_is_retryable_error(exception: Exception, expected_retryable: bool):
+    assert is_retryable_error(exception) == expected_retryable
+
+
+def test_missing_label_is_not_retried(
+    fake_app_config: AppConfig, fake_gitlab: FakeGitlab, fake_gitlab_manager, caplog
+):
+    fake_app_config.labels.in_review = 999
+    fake_gitlab.add_issue(1, ["To do"])
+
+    with patch.dict("auto_gitlab.cache._missing", clear=True):
+        started = time.monotonic()
+        fake_gitlab_manager.move_issues_to_cr([1])
+        assert time.monotonic() - started < 1
+        assert fake_gitlab.calls == [("GET", "/api/v4/projects/1/labels/999")]
+        assert "won't be retried" in caplog.text
+
+        fake_gitlab.reset_calls()
+        fake_gitlab_manager.move_issues_to_cr([1])
+        # The missing label is remembered
+        assert fake_gitlab.api_calls == 0
+    assert fake_gitlab.issue_labels(1) == ["To do"]
+
+
+def test_missing_issue_is_skipped(
+    fake_app_config: AppConfig, fake_gitlab: FakeGitlab, fake_gitlab_manager
+):
+    fake_gitlab.add_issue(1, ["To do"])
+
+    with patch.dict("auto_gitlab.cache._missing", clear=True):
+        fake_gitlab_manager.update_issue_labels(99999, labels_to_add=["bug"])
+        fake_gitlab_manager.update_issue_labels(1, labels_to_add=["bug"])
+        assert fake_gitlab.api_calls == 2
+
+        fake_gitlab.reset_calls()
+        fake_gitlab_manager.update_issue_labels(99999, labels_to_add=["bug"])
+        fake_gitlab_manager.move_issues_to_cr([99999])
+        assert fake_gitlab.api_calls == 0
+    assert fake_gitlab.issue_labels(1) == ["To do", "bug"]
+
+
+@pytest.mark.parametrize(
+    "response_code,expected_requests",
+    [
+        pytest.param(404, 1, id="missing"),
+        pytest.param(403, 2, id="forbidden"),
+    ],
+)
+def test_only_missing_issue_update_is_remembered(
+    fake_app_config: AppConfig,
+    fake_gitlab_manager: GitlabManager,
+    response_code: int,
+    expected_requests: int,
+):
+    with patch.dict("auto_gitlab.cache._missing", clear=True), patch.object(
+        fake_gitlab_manager,
+        "_raw_request",
+        side_effect=GitlabHttpError(response_code=response_code),
+    ) as raw_request_mock:
+        fake_gitlab_manager._update_labels(1, ["bug"], [])
+        fake_gitlab_manager._update_labels(1, ["bug"], [])
+
+    assert raw_request_mock.call_count == expected_requests
+
+
+@pytest.mark.parametrize(
+    "response_code,expected_requests",
+    [
+        pytest.param(404, 1, id="missing"),
+        pytest.param(403, 2, id="forbidden"),
+    ],
+)
+def test_only_missing_label_is_remembered(
+    fake_app_config: AppConfig,
+    fake_gitlab_manager: GitlabManager,
+    response_code: int,
+    expected_requests: int,
+):
+    with patch.dict("auto_gitlab.cache._missing", clear=True), patch.object(
+        fake_gitlab_manager,
+        "_raw_request",
+        side_effect=GitlabHttpError(response_code=response_code),
+    ) as raw_request_mock:
+        for _ in range(2):
+            with pytest.raises(GitlabError):
+                fake_gitlab_manager._fetch_label_dict(999, None)
+
+    assert raw_request_mock.call_count == expected_requests
@@ -0,0 +1,151 @@
+from typing import List, Type
+
+import pytest
+
+from config.app_config import AppConfig
+from fake_gitlab import FakeGitlab
+from graphql_manager import GraphQLGitlabManager
+
+
+@pytest.fixture
+def gitlab_manager_class() -> Type[GraphQLGitlabManager]:
+    return GraphQLGitlabManager
+
+
+def _graphql_calls(fake_gitlab: FakeGitlab) -> List[str]:
+    return [path for _, path in fake_gitlab.calls if path == "/api/graphql"]
+
+
+def test_move_issues_to_cr(fake_gitlab: FakeGitlab, gitlab_manager):
+    fake_gitlab.add_issue(1000, ["In Progress", "backend"])
+    fake_gitlab.add_issue(1012, ["In Progress", "bug", "backend"])
+    fake_gitlab.add_issue(1018, ["To do", "backend"])
+    fake_gitlab.add_issue(1020, ["To do"], state="closed")
+    fake_gitlab.add_issue(1030, ["To do"])
+    fake_gitlab.add_label("CR")
+
+    gitlab_manager.move_issues_to_cr(issues_numbers=[1000, 1012, 1018, 1020])
+
+    assert fake_gitlab.issue_labels(1000) == ["backend", "CR"]
+    assert fake_gitlab.issue_labels(1012) == ["bug", "backend", "CR"]
+    assert fake_gitlab.issue_labels(1018) == ["backend", "CR"]
+    assert fake_gitlab.issue_labels(1020) == ["To do"]
+    assert fake_gitlab.issue_labels(1030) == ["To do"]
+    # One query and one batch of mutations
+    assert len(_graphql_calls(fake_gitlab)) == fake_gitlab.api_calls == 2
+
+
+def test_move_issues_to_merged_creates_missing_labels(
+    fake_gitlab: FakeGitlab, gitlab_manager
+):
+    fake_gitlab.add_issue(1000, ["backend", "CR"])
+    fake_gitlab.add_issue(1012, ["bug", "CR"])
+
+    gitlab_manager.move_issues_to_merged(
+        issues_numbers=[1000, 1012], target_branch="master"
+    )
+
+    assert fake_gitlab.issue_labels(1000) == ["backend", "merged", "master branch"]
+    assert fake_gitlab.issue_labels(1012) == ["bug", "merged", "master branch"]
+    # Query, labels creation and one batch of mutations
+    assert fake_gitlab.api_calls == 3
+
+
+def test_mutations_are_batched(
+    fake_gitlab: FakeGitlab, gitlab_manager, fake_app_config: AppConfig
+):
+    fake_app_config.connection.graphql_batch_size = 40
+    issues_numbers = list(range(1, 151))
+    for number in issues_numbers:
+        fake_gitlab.add_issue(number, ["In Progress"])
+    fake_gitlab.add_label("CR")
+
+    gitlab_manager.move_issues_to_cr(issues_numbers=issues_numbers)
+
+    assert all(fake_gitlab.issue_labels(number) == ["CR"] for number in issues_numbers)
+    # Two pages of issues and batches of mutations sent after every page (100 + 50)
+    # instead of 150 requests
+    assert fake_gitlab.api_calls == 2 + 3 + 2
+
+
+def test_move_issues(fake_gitlab: FakeGitlab, gitlab_manager):
+    fake_gitlab.add_issue(1, ["merged", "iteration branch"])
+    fake_gitlab.add_issue(2, ["merged", "master branch", "iteration branch"])
+    fake_gitlab.add_issue(3, ["merged"])
+
+    gitlab_manager.move_issues(
+        search_by_labels=["iteration branch"],
+        labels_to_remove=[],
+        label_to_add="master branch",
+    )
+
+    assert fake_gitlab.issue_labels(1) == [
+        "merged",
+        "iteration branch",
+        "master branch",
+    ]
+    assert fake_gitlab.issue_labels(2) == [
+        "merged",
+        "master branch",
+        "iteration branch",
+    ]
+    assert fake_gitlab.issue_labels(3) == ["merged"]
+
+
+def test_transition_issues(fake_gitlab: FakeGitlab, gitlab_manager):
+    fake_gitlab.add_issue(1, ["To do", "backend"])
+    fake_gitlab.add_issue(2, ["CR"])
+
+    gitlab_manager.transition_issues(
+        issues_numbers=[1, 2], from_labels=["To do"], to_label="In Progress"
+    )
+
+    assert fake_gitlab.issue_labels(1) == ["backend", "In Progress"]
+    assert fake_gitlab.issue_labels(2) == ["CR"]
+
+
+def test_apply_labels_changes_reads_only_labels(
+    fake_gitlab: FakeGitlab, gitlab_manager
+):
+    fake_gitlab.add_issue(1, ["CR", "backend"])
+    fake_gitlab.add_issue(2, ["CR"])
+    fake_gitlab.add_label("merged")
+
+    gitlab_manager.apply_labels_changes({1: (["merged"], ["CR"]), 2: (["merged"], [])})
+
+    assert fake_gitlab.issue_labels(1) == ["backend", "merged"]
+    assert fake_gitlab.issue_labels(2) == ["CR", "merged"]
+    # Label ids are resolved without reading the issues
+    assert fake_gitlab.graphql_operations == ["LabelsIds", "UpdateIssuesLabels"]
+
+
+def test_sweep_is_sent_page_by_page(fake_gitlab: FakeGitlab, gitlab_manager):
+    from auto_gitlab.batch import unit_of_work
+
+    for number in range(1, 251):
+        fake_gitlab.add_issue(number, ["develop branch"])
+    fake_gitlab.add_label("staging branch")
+
+    with unit_of_work():
+        gitlab_manager.move_issues(
+            search_by_labels=["develop branch"],
+            labels_to_remove=["develop branch"],
+            label_to_add="staging branch",
+        )
+
+    assert all(
+        fake_gitlab.issue_labels(number) == ["staging branch"]
+        for number in range(1, 251)
+    )
+    # Changes of every page are sent before the next page is read
+    reads = [
+        index
+        for index, operation in enumerate(fake_gitlab.graphql_operations)
+        if operation == "IssuesLabels"
+    ]
+    assert len(reads) == 3
+    for previous_read, next_read in zip(reads, reads[1:]):
+        assert (
+            "UpdateIssuesLabels"
+            in fake_gitlab.graphql_operations[previous_read:next_read]
+        )
@@ -0,0 +1,120 @@
+import time
+from typing import Iterator, Optional
+from unittest.mock import patch
+
+import pytest
+from django.test import RequestFactory
+
+from config.app_config import AppConfig
+from fake_gitlab import FakeGitlab
+from gitlab_manager import GitlabManager
+from views import GitlabHealthAPIView
+
+# The warm-up state is read by the health view from the package module
+from auto_gitlab.warm_up import warm_up, get_warm_up_labels
+
+
+@pytest.fixture
+def gitlab_manager(gitlab_manager: GitlabManager) -> Iterator[GitlabManager]:
+    with patch("auto_gitlab.health._last_check", None), patch(
+        "auto_gitlab.warm_up._warmed_up_at", None
+    ):
+        yield gitlab_manager
+
+
+def _get_health(secret_token: Optional[str] = None):
+    headers = {} if secret_token is None else {"X-Gitlab-Token": secret_token}
+    request = RequestFactory().get("/health", headers=headers)
+    return GitlabHealthAPIView.as_view()(request)
+
+
+def test_warm_up(cache_config: AppConfig, fake_gitlab: FakeGitlab, gitlab_manager):
+    cr_label_id = fake_gitlab.add_label("CR")
+    cache_config.labels.in_review = cr_label_id
+    fake_gitlab.add_branch("master", protected=True)
+    fake_gitlab.add_branch("iteration", protected=True)
+    fake_gitlab.add_branch("feature")
+
+    assert get_warm_up_labels() == [
+        "To do",
+        "In Progress",
+        cr_label_id,
+        "merged",
+        "backend",
+        "frontend",
+        "bug",
+    ]
+    warm_up()
+    fake_gitlab.reset_calls()
+
+    assert gitlab_manager._get_label_dict(cr_label_id)["name"] == "CR"
+    assert gitlab_manager.find_protected_branch("master").name == "master"
+    assert gitlab_manager.find_protected_branch("iteration").name == "iteration"
+    assert fake_gitlab.api_calls == 0
+
+
+def test_health(cache_config: AppConfig, fake_gitlab: FakeGitlab, gitlab_manager):
+    warm_up()
+    fake_gitlab.reset_calls()
+
+    responses = [_get_health() for _ in range(3)]
+
+    assert [response.status_code for response in responses] == [200] * 3
+    # GitLab is checked only by the first probe
+    assert fake_gitlab.api_calls == 1
+    health = responses[-1].data
+    assert health["gitlab"]["connected"] is True
+    assert health["cache"]["enabled"] is True
+    assert health["cache"]["fresh"] is True
+    assert health["queue"] == {
+        "workers": 0,
+        "bulk_workers": 1,
+        "pending": 0,
+        "bulk_pending": 0,
+    }
+
+
+def test_health_without_connection(
+    fake_app_config: AppConfig, fake_gitlab: FakeGitlab, gitlab_manager
+):
+    fake_gitlab.project_id = 2
+
+    response = _get_health()
+
+    assert response.status_code == 503
+    assert response.data["gitlab"]["connected"] is False
+    assert response.data["gitlab"]["error"] == "GitlabHttpError"
+    assert response.data["cache"]["fresh"] is False
+
+
+def test_health_without_secret_token(
+    fake_app_config: AppConfig, fake_gitlab: FakeGitlab, gitlab_manager
+):
+    fake_app_config.secret_token = "secret"
+
+    assert _get_health().data == {"status": "ok"}
+    assert _get_health("wrong").data == {"status": "ok"}
+    assert "queue" in _get_health("secret").data
+
+    fake_gitlab.project_id = 2
+    with patch("auto_gitlab.health._last_check", None):
+        response = _get_health()
+
+    assert response.status_code == 503
+    assert response.data == {"status": "unavailable"}
+
+
+def test_health_while_gitlab_is_checked(
+    fake_app_config: AppConfig, fake_gitlab: FakeGitlab, gitlab_manager
+):
+    last_check = {"connected": True, "error": None, "checked_at": time.time() - 60}
+
+    with patch("auto_gitlab.health._last_check", last_check), patch(
+        "auto_gitlab.health._checking", True
+    ):
+        response = _get_health()
+
+    # Another probe is checking GitLab, the last result is returned at once
+    assert response.status_code == 200
+    assert response.data["gitlab"]["checked_at"] == last_check["checked_at"]
+    assert fake_gitlab.api_calls == 0
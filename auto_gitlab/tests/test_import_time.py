@@ -0,0 +1,107 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, Tuple, List
+
+import pytest
+
+PACKAGE_ROOT = Path(__file__).resolve().parents[2]
+
+# Own import time of auto_gitlab modules (without Django and rest_framework)
+IMPORT_TIME_BUDGET_MICROSECONDS = 100_000
+
+# Modules which must be loaded only when an event is handled or the config is read
+LAZY_MODULES = [
+    "gitlab",
+    "retrying",
+    "cerberus",
+    "auto_gitlab.config.parser",
+    "auto_gitlab.gitlab_manager",
+    "auto_gitlab.gitlab_instance",
+]
+
+# Apps are imported by Django with importlib, which is not reported by -X importtime,
+# so auto_gitlab is imported explicitly. Loaded modules are printed at the end.
+SETUP_SCRIPT = """
+import json
+import sys
+
+import django
+from django.conf import settings
+
+settings.configure(
+    INSTALLED_APPS=[
+        "django.contrib.contenttypes",
+        "django.contrib.auth",
+        "rest_framework",
+        "auto_gitlab",
+    ],
+    ROOT_URLCONF="auto_gitlab.urls",
+    SECRET_KEY="import-time",
+)
+import auto_gitlab.apps
+
+django.setup()
+{imports}
+print(json.dumps(sorted(sys.modules)))
+"""
+
+
+def _import_times(imports: str = "") -> Tuple[Dict[str, int], List[str]]:
+    """
+    Run ``django.setup()`` and the given imports in a fresh interpreter.
+
+    :return: Own import time in microseconds of every module imported with
+        the import statement and names of all loaded modules.
+    """
+
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            SETUP_SCRIPT.format(imports=imports),
+        ],
+        cwd=PACKAGE_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    import_times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_time, _, module = line[len("import time:") :].split("|")
+        import_times[module.strip()] = int(self_time)
+    return import_times, json.loads(result.stdout)
+
+
+def _auto_gitlab_import_time(import_times: Dict[str, int]) -> int:
+    return sum(
+        self_time
+        for module, self_time in import_times.items()
+        if module == "auto_gitlab" or module.startswith("auto_gitlab.")
+    )
+
+
+def test_django_setup_import_time():
+    import_times, modules = _import_times()
+
+    assert "auto_gitlab.apps" in import_times
+    assert "auto_gitlab.config.app_config_instance" not in modules
+    for module in LAZY_MODULES:
+        assert module not in modules
+    assert _auto_gitlab_import_time(import_times) < IMPORT_TIME_BUDGET_MICROSECONDS
+
+
+@pytest.mark.parametrize(
+    "imports", ["import auto_gitlab.urls", "import auto_gitlab.utils"]
+)
+def test_webhook_modules_import_time(imports):
+    import_times, modules = _import_times(imports)
+
+    for module in LAZY_MODULES:
+        assert module not in modules
+    assert _auto_gitlab_import_time(import_times) < IMPORT_TIME_BUDGET_MICROSECONDS
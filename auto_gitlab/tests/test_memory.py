@@ -0,0 +1,154 @@
+import json
+import os
+import re
+import tracemalloc
+from contextlib import nullcontext
+from typing import Callable, ContextManager
+from unittest.mock import patch
+from urllib.parse import urlsplit, parse_qs
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+from auto_gitlab.batch import unit_of_work
+
+from config.app_config import AppConfig, BranchesConfig
+from gitlab_manager import GitlabManager
+
+PAGE_SIZE = 100
+# Fields GitLab returns for every issue, which aren't needed to move it
+ISSUE_PAYLOAD = {
+    "description": "Steps to reproduce:\n" + "- step\n" * 10,
+    "author": {"id": 1, "username": "author", "web_url": "https://gitlab.example.com"},
+    "assignees": [{"id": 2, "username": "assignee"}],
+    "milestone": None,
+    "time_stats": {"time_estimate": 0, "total_time_spent": 0},
+    "references": {"short": "#1", "relative": "#1", "full": "group/project#1"},
+}
+# Issues are generated from a serialized template, so the adapter is cheap
+ISSUE_JSON = (
+    '{{"iid": {iid}, "title": "Issue {iid}", "state": "opened", '
+    '"labels": ["develop branch", "backend"], "updated_at": "2023-01-01T00:00:00.000Z", '
+    + json.dumps(ISSUE_PAYLOAD)[1:-1].replace("{", "{{").replace("}", "}}")
+    + "}}"
+)
+
+
+class IssuesPagesAdapter(BaseAdapter):
+    """
+    Serves the project and pages of generated opened issues of the develop branch.
+    Pages are created on demand, so only the memory used by ``GitlabManager`` grows
+    with the issues count. Issues are moved in order, so updated issues leave the list.
+    """
+
+    def __init__(self, issues_count: int):
+        super().__init__()
+        self.issues_count = issues_count
+        self.moved_count = 0
+
+    def send(self, request, **kwargs) -> requests.Response:
+        parts = urlsplit(request.url)
+        headers = {"Content-Type": "application/json"}
+        if re.fullmatch(r"/api/v4/projects/1", parts.path):
+            body = json.dumps({"id": 1, "path_with_namespace": "group/project"})
+        elif request.method == "PUT":
+            self.moved_count += 1
+            iid = int(parts.path.rsplit("/", 1)[1])
+            body = ISSUE_JSON.format(iid=iid)
+        else:
+            page = int(parse_qs(parts.query).get("page", ["1"])[0])
+            first_iid = self.moved_count + (page - 1) * PAGE_SIZE + 1
+            last_iid = min(first_iid + PAGE_SIZE - 1, self.issues_count)
+            body = "[{}]".format(
+                ",".join(
+                    ISSUE_JSON.format(iid=iid) for iid in range(first_iid, last_iid + 1)
+                )
+            )
+            if last_iid < self.issues_count:
+                next_url = (
+                    f"{parts.scheme}://{parts.netloc}{parts.path}?page={page + 1}"
+                )
+                headers["Link"] = f'<{next_url}>; rel="next"'
+
+        response = requests.Response()
+        response.status_code = 200
+        response.headers.update(headers)
+        response._content = body.encode()
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+def _sweep_peak_memory(issues_count: int, context: Callable[[], ContextManager]) -> int:
+    session = requests.Session()
+    session.trust_env = False
+    adapter = IssuesPagesAdapter(issues_count)
+    session.mount("https://gitlab.example.com", adapter)
+    gitlab_manager = GitlabManager(
+        url="https://gitlab.example.com", project_id=1, session=session
+    )
+
+    tracemalloc.start()
+    try:
+        with patch(
+            "auto_gitlab.gitlab_instance._gitlab_manager", gitlab_manager
+        ), context():
+            gitlab_manager.handle_merge_of_protected_branches(
+                source_branch="develop", target_branch="master"
+            )
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert adapter.moved_count == issues_count
+    return peak
+
+
+def _assert_flat_memory(
+    small_count: int, large_count: int, context: Callable[[], ContextManager]
+):
+    small_sweep_peak = _sweep_peak_memory(small_count, context)
+    large_sweep_peak = _sweep_peak_memory(large_count, context)
+
+    # Only one page of issues is kept in memory, whatever the number of issues
+    assert large_sweep_peak < small_sweep_peak * 1.5
+    assert large_sweep_peak < 10 * 1024 * 1024
+
+
+contexts = pytest.mark.parametrize(
+    "context",
+    [
+        pytest.param(nullcontext, id="sent at once"),
+        # Queued changes are sent page by page
+        pytest.param(unit_of_work, id="unit of work"),
+    ],
+)
+
+
+@contexts
+def test_move_issues_memory_is_flat(
+    fake_app_config: AppConfig, context: Callable[[], ContextManager]
+):
+    """
+    Ten times more issues are enough to show that the memory doesn't grow
+    with the sweep, and keep the suite fast.
+    """
+
+    fake_app_config.branches = BranchesConfig(promotion={"develop": "master"})
+    _assert_flat_memory(1_000, 10_000, context)
+
+
+@pytest.mark.skipif(
+    not os.environ.get("AUTO_GITLAB_BENCHMARKS"),
+    reason="Benchmarks run only with the AUTO_GITLAB_BENCHMARKS environment variable",
+)
+@contexts
+def test_move_issues_memory_benchmark(
+    fake_app_config: AppConfig, context: Callable[[], ContextManager]
+):
+    fake_app_config.branches = BranchesConfig(promotion={"develop": "master"})
+    _assert_flat_memory(5_000, 50_000, context)
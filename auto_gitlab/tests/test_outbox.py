@@ -0,0 +1,191 @@
+from datetime import timedelta
+from typing import Iterator, Optional
+from unittest.mock import patch, call
+
+import pytest
+from django.utils import timezone
+
+from config.app_config import AppConfig
+from deadline import deadline
+from fake_gitlab import FakeGitlab
+from gitlab_manager import GitlabManager
+from outbox import drain_outbox, get_pending_count
+
+# The outbox state and the model are used from the package modules
+OUTBOX_MODULE = "auto_gitlab.outbox"
+
+
+@pytest.fixture
+def outbox_config(fake_app_config: AppConfig) -> Iterator[AppConfig]:
+    """
+    App config with the outbox enabled. The outbox is drained only by the test.
+    """
+
+    fake_app_config.outbox.enabled = True
+    fake_app_config.outbox.rate = 0
+    with patch(f"{OUTBOX_MODULE}._pending", None), patch(
+        f"{OUTBOX_MODULE}.start_drainer"
+    ):
+        yield fake_app_config
+
+
+@pytest.mark.django_db
+def test_outage_writes_are_stored_and_drained(
+    outbox_config: AppConfig, fake_gitlab: FakeGitlab, gitlab_manager: GitlabManager
+):
+    fake_gitlab.add_issue(1, ["To do"])
+    fake_gitlab.add_issue(2, ["In Progress", "backend"])
+
+    fake_gitlab.down = True
+    # Retries are given up quickly at the deadline
+    with deadline(0.2):
+        gitlab_manager.move_issues_to_cr([1, 2])
+    # Sent to the outbox at once, after the earlier changes
+    gitlab_manager.update_issue_labels(1, labels_to_remove=["CR"])
+    gitlab_manager.move_issues_to_merged([1, 2], "master")
+
+    assert get_pending_count() == 5
+    assert fake_gitlab.issue_labels(1) == ["To do"]
+
+    fake_gitlab.down = False
+    fake_gitlab.reset_calls()
+    assert drain_outbox() == 5
+
+    assert get_pending_count() == 0
+    assert fake_gitlab.issue_labels(1) == ["merged", "master branch"]
+    assert fake_gitlab.issue_labels(2) == ["backend", "merged", "master branch"]
+    # Changes of every issue are merged into one update
+    assert [method for method, _ in fake_gitlab.calls].count("PUT") == 2
+
+
+@pytest.mark.django_db
+def test_drain_keeps_entries_while_gitlab_is_down(
+    outbox_config: AppConfig, fake_gitlab: FakeGitlab, gitlab_manager: GitlabManager
+):
+    fake_gitlab.add_issue(1, ["In Progress"])
+    fake_gitlab.down = True
+    with deadline(0.2):
+        gitlab_manager.transition_issues([1], ["In Progress"], "CR")
+        gitlab_manager.move_issues(["CR"], ["CR"], "merged")
+
+    with deadline(0.2), pytest.raises(Exception):
+        drain_outbox()
+    assert get_pending_count() == 2
+
+    fake_gitlab.down = False
+    assert drain_outbox() == 2
+    # The issue was found by the sweep after the transition was applied
+    assert fake_gitlab.issue_labels(1) == ["merged"]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "claimed_for,expected_drained",
+    [
+        pytest.param(60, None, id="claimed"),
+        # The process which claimed the entry died
+        pytest.param(-60, 2, id="claim expired"),
+    ],
+)
+def test_drain_leaves_entries_claimed_by_another_process(
+    outbox_config: AppConfig,
+    fake_gitlab: FakeGitlab,
+    gitlab_manager: GitlabManager,
+    claimed_for: int,
+    expected_drained: Optional[int],
+):
+    from auto_gitlab.models import OutboxEntry
+
+    fake_gitlab.add_issue(1, ["To do"])
+    fake_gitlab.down = True
+    with deadline(0.2):
+        gitlab_manager.move_issues_to_cr([1])
+        gitlab_manager.move_issues_to_merged([1], "master")
+    fake_gitlab.down = False
+    fake_gitlab.reset_calls()
+    oldest_id = OutboxEntry.objects.order_by("id").first().id
+    OutboxEntry.objects.filter(id=oldest_id).update(
+        claimed_until=timezone.now() + timedelta(seconds=claimed_for)
+    )
+
+    # Later changes of the issue mustn't be applied before the claimed entry
+    assert drain_outbox() == expected_drained
+
+    if expected_drained is None:
+        assert get_pending_count() == 2
+        assert fake_gitlab.calls == []
+    else:
+        assert get_pending_count() == 0
+        assert fake_gitlab.issue_labels(1) == ["merged", "master branch"]
+
+
+@pytest.mark.django_db
+def test_drain_calls_gitlab_outside_transaction(
+    outbox_config: AppConfig, fake_gitlab: FakeGitlab, gitlab_manager: GitlabManager
+):
+    from django.db import connection
+
+    from auto_gitlab.models import OutboxEntry
+
+    for iid in range(1, 251):
+        fake_gitlab.add_issue(iid, ["iteration branch"])
+    fake_gitlab.down = True
+    with deadline(0.2):
+        gitlab_manager.move_issues(["iteration branch"], [], "master branch")
+    fake_gitlab.down = False
+    fake_gitlab.reset_calls()
+
+    # The test itself runs in a transaction
+    atomic_blocks = len(connection.atomic_blocks)
+    handle = fake_gitlab.handle
+
+    def update_outside_transaction(method: str, url: str, body: Optional[bytes]):
+        # Issues are updated by the draining thread
+        if method == "PUT":
+            assert len(connection.atomic_blocks) == atomic_blocks
+            # Entries stay claimed while they are sent
+            assert OutboxEntry.objects.filter(claimed_until__isnull=False).exists()
+        return handle(method, url, body)
+
+    with patch.object(fake_gitlab, "handle", side_effect=update_outside_transaction):
+        assert drain_outbox() == 1
+
+    assert all(
+        "master branch" in fake_gitlab.issue_labels(iid) for iid in range(1, 251)
+    )
+    # The sweep is sent page by page
+    methods = [method for method, _ in fake_gitlab.calls if method != "HEAD"]
+    first_update = methods.index("PUT")
+    assert first_update < len(methods) - methods[::-1].index("GET") - 1
+
+
+def test_drainer_waits_with_zero_retry_interval(outbox_config: AppConfig):
+    from auto_gitlab.outbox import _drain_until_empty
+
+    outbox_config.outbox.retry_interval = 0
+
+    with patch(
+        f"{OUTBOX_MODULE}.drain_outbox",
+        side_effect=[RuntimeError("GitLab is down"), None, 0],
+    ), patch(f"{OUTBOX_MODULE}.time.sleep") as sleep_mock, patch(
+        "django.db.close_old_connections"
+    ):
+        _drain_until_empty()
+
+    assert sleep_mock.call_args_list == [call(1), call(1)]
+
+
+def test_outbox_disabled(fake_app_config: AppConfig, fake_gitlab: FakeGitlab):
+    fake_gitlab.add_issue(1, ["To do"])
+    gitlab_manager = GitlabManager(
+        url=fake_gitlab.url,
+        project_id=fake_gitlab.project_id,
+        session=fake_gitlab.session(),
+    )
+    fake_gitlab.down = True
+
+    with deadline(0.2):
+        gitlab_manager.move_issues_to_cr([1])
+
+    # The change is lost, without touching the database
+    assert get_pending_count() is None
@@ -0,0 +1,66 @@
+import re
+
+import pytest
+
+from patterns import (
+    check_pattern,
+    match_budget,
+    search_pattern,
+    findall_pattern,
+    get_patterns_stats,
+    MAX_MATCHED_TEXT_LENGTH,
+)
+
+
+@pytest.mark.parametrize(
+    "pattern,is_safe",
+    [
+        pytest.param(r"(\d+)", True),
+        pytest.param(r"merge/(.+?)_to", True),
+        pytest.param(r"\[BUG\]", True),
+        pytest.param(r"(\d+,)+", True),
+        pytest.param(r"(?:[a-z]+-)+x", True),
+        pytest.param(r"(a+)++b", True),
+        pytest.param(r"(?>a+)+b", True),
+        pytest.param(r"(a|b)+c", True),
+        pytest.param(r"(\d{1,3}\.){3}\d{1,3}", True),
+        pytest.param(r"(a+)+b", False),
+        pytest.param(r"(a*)*b", False),
+        pytest.param(r"(\w+\s?)+$", False),
+        pytest.param(r"^(([a-z])+.)+[A-Z]([a-z])+$", False),
+        pytest.param(r"(ab|ab)+c", False),
+        pytest.param(r"(x+x+)+y", False),
+        pytest.param(r"(a|aa)+$", False),
+        pytest.param(r"(?:a|b|ab)+c", False),
+        pytest.param(r"(a{2,}|b)+c", False),
+        pytest.param(r"(\s*,\s*)+$", False),
+        pytest.param(r"(?>(a+)+b)", False),
+        pytest.param(r"(?=(a+)+b)", False),
+        pytest.param(r"[", False),
+    ],
+)
+def test_check_pattern(pattern: str, is_safe: bool):
+    assert (check_pattern(pattern) is None) == is_safe
+
+
+def test_matched_text_is_cut():
+    text = "a" * MAX_MATCHED_TEXT_LENGTH + "[BUG]"
+
+    assert search_pattern(r"\[BUG\]", text) is None
+    assert findall_pattern(r"\d+", "12-" + text + "-34") == ["12"]
+
+
+def test_match_budget():
+    stats = get_patterns_stats()
+
+    with match_budget(0.001):
+        # A slow match uses up the budget, so the next one is skipped.
+        # check_pattern rejects the pattern, but it's still matched if it's used.
+        assert search_pattern(r"(a|aa)*c", "a" * 28) is None
+        assert search_pattern(r"\[BUG\]", "[bug] Fix", re.IGNORECASE) is None
+    assert search_pattern(r"\[BUG\]", "[bug] Fix", re.IGNORECASE) is not None
+
+    new_stats = get_patterns_stats()
+    assert new_stats["slow_matches"] == stats["slow_matches"] + 1
+    assert new_stats["skipped_matches"] == stats["skipped_matches"] + 1
+    assert new_stats["matches"] == stats["matches"] + 2
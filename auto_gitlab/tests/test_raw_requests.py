@@ -0,0 +1,135 @@
+import os
+import time
+from typing import Callable, Any, Dict
+from unittest.mock import patch
+
+import pytest
+import requests
+from gitlab import GitlabHttpError
+
+# The deadline state is used from the package module
+from auto_gitlab.deadline import deadline
+from config.app_config import AppConfig
+from fake_gitlab import FakeGitlab
+from gitlab_manager import GitlabManager
+
+# Calls of every operation in one measurement, the best of REPEATS is compared
+ROUNDS = 200
+REPEATS = 5
+
+
+def _best_time(operation: Callable[[], Any]) -> float:
+    times = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        for _ in range(ROUNDS):
+            operation()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+@pytest.fixture(autouse=True)
+def project_data(fake_gitlab: FakeGitlab) -> None:
+    fake_gitlab.add_label("CR")
+    fake_gitlab.add_branch("feature")
+    fake_gitlab.add_branch("master", protected=True)
+    fake_gitlab.add_issue(1, ["To do"])
+
+
+def test_raw_requests_results(gitlab_manager: GitlabManager):
+    project = gitlab_manager.project
+
+    assert (
+        gitlab_manager._get_conditionally(f"{project.labels.path}/1", None)[0]
+        == project.labels.get(id=1).asdict()
+    )
+    assert (
+        gitlab_manager._search_protected_branch("master", None)[0]
+        == project.branches.list(search="^master")[0].asdict()
+    )
+    assert gitlab_manager._search_protected_branch("feature", None)[0] is None
+
+
+def _rate_limited(headers: Dict[str, str]) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 429
+    response.headers.update(headers)
+    response._content = b'{"message": "429 Too Many Requests"}'
+    return response
+
+
+@pytest.mark.parametrize(
+    "headers,expected_wait_time",
+    [
+        pytest.param({"Retry-After": "3"}, 3, id="Retry-After"),
+        pytest.param({}, 0.1, id="backoff"),
+    ],
+)
+def test_raw_request_waits_for_rate_limit(
+    gitlab_manager: GitlabManager, headers: Dict[str, str], expected_wait_time: float
+):
+    session = gitlab_manager.gitlab_instance.session
+    responses = [_rate_limited(headers)]
+    send = session.send
+
+    with patch.object(
+        session,
+        "send",
+        side_effect=lambda request, **kwargs: (
+            responses.pop() if responses else send(request, **kwargs)
+        ),
+    ), patch("gitlab_manager.time.sleep") as sleep_mock:
+        branch, _ = gitlab_manager._search_protected_branch("master", None)
+
+    assert branch["name"] == "master"
+    sleep_mock.assert_called_once_with(expected_wait_time)
+
+
+def test_raw_request_rate_limit_after_deadline(gitlab_manager: GitlabManager):
+    session = gitlab_manager.gitlab_instance.session
+
+    with patch.object(
+        session, "send", return_value=_rate_limited({"Retry-After": "60"})
+    ), patch("gitlab_manager.time.sleep") as sleep_mock, deadline(5):
+        with pytest.raises(GitlabHttpError) as exc_info:
+            gitlab_manager._search_protected_branch("master", None)
+
+    # Left to the retries of the caller, which stop at the deadline
+    assert exc_info.value.response_code == 429
+    sleep_mock.assert_not_called()
+
+
+@pytest.mark.skipif(
+    not os.environ.get("AUTO_GITLAB_BENCHMARKS"),
+    reason="Benchmarks run only with the AUTO_GITLAB_BENCHMARKS environment variable",
+)
+def test_raw_requests_benchmark(
+    fake_app_config: AppConfig, fake_gitlab: FakeGitlab, gitlab_manager: GitlabManager
+):
+    """
+    Micro-benchmark of the hot operations sent with python-gitlab objects and
+    as raw requests. The fake server is local, so only the client overhead differs.
+    """
+
+    project = gitlab_manager.project
+    operations = {
+        "label lookup": (
+            lambda: project.labels.get(id=1).asdict(),
+            lambda: gitlab_manager._get_conditionally(f"{project.labels.path}/1", None),
+        ),
+        "protected branch check": (
+            lambda: [
+                branch
+                for branch in project.branches.list(search="^master")
+                if branch.protected
+            ],
+            lambda: gitlab_manager._search_protected_branch("master", None),
+        ),
+        "labels delta": (
+            lambda: project.issues.update(1, {"add_labels": "CR"}),
+            lambda: gitlab_manager._update_labels(1, ["CR"], []),
+        ),
+    }
+
+    for name, (python_gitlab_operation, raw_operation) in operations.items():
+        assert _best_time(raw_operation) < _best_time(python_gitlab_operation), name
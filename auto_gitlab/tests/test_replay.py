@@ -0,0 +1,122 @@
+import json
+from typing import List
+
+from django.test import RequestFactory
+
+from config.app_config import AppConfig
+from enums import GitlabEvent, IssueAction, MergeRequestAction
+from recording import Delivery, record_delivery, read_deliveries
+from replay import create_fake_gitlab, replay
+from views import GitlabWebhookAPIView
+
+
+def _deliveries() -> List[Delivery]:
+    events = [
+        (
+            GitlabEvent.ISSUE.value,
+            {
+                "object_attributes": {
+                    "action": IssueAction.CREATED.value,
+                    "iid": 1,
+                    "title": "[BUG] Something doesn't work",
+                }
+            },
+        ),
+        (
+            GitlabEvent.PUSH_EVENT.value,
+            {"commits": [{"message": "Fix #1"}, {"message": "Fix #2 and #1"}]},
+        ),
+        (
+            GitlabEvent.MERGE_REQUEST.value,
+            {
+                "object_attributes": {
+                    "action": MergeRequestAction.CREATED.value,
+                    "description": "Closes #1, #2",
+                    "source_branch": "1-fixes",
+                    "target_branch": "master",
+                }
+            },
+        ),
+        (
+            GitlabEvent.MERGE_REQUEST.value,
+            {
+                "object_attributes": {
+                    "action": MergeRequestAction.MERGED.value,
+                    "description": "Closes #1, #2",
+                    "source_branch": "1-fixes",
+                    "target_branch": "master",
+                }
+            },
+        ),
+    ]
+    return [
+        Delivery(event_type=event_type, body=json.dumps(data).encode())
+        for event_type, data in events
+    ]
+
+
+def test_record_and_read_deliveries(tmp_path):
+    file_name = str(tmp_path / "deliveries.jsonl.gz")
+    deliveries = _deliveries()
+    for delivery in deliveries:
+        record_delivery(file_name, delivery.event_type, delivery.body)
+
+    read = list(read_deliveries(file_name))
+    assert [(d.event_type, d.body) for d in read] == [
+        (d.event_type, d.body) for d in deliveries
+    ]
+    assert all(delivery.timestamp > 0 for delivery in read)
+
+
+def test_view_records_deliveries(fake_app_config: AppConfig, tmp_path, settings):
+    settings.BASE_DIR = str(tmp_path)
+    fake_app_config.record_file = "deliveries.jsonl.gz"
+    body = json.dumps({"object_attributes": {"action": "close"}})
+
+    request = RequestFactory().post(
+        "/handle_gitlab_events",
+        data=body,
+        content_type="application/json",
+        HTTP_X_GITLAB_EVENT=GitlabEvent.MERGE_REQUEST.value,
+        HTTP_X_GITLAB_EVENT_UUID="13792a34-cac6-4fda-95a8-c58e00a3954e",
+        HTTP_X_GITLAB_TOKEN="secret",
+    )
+    response = GitlabWebhookAPIView.as_view()(request)
+
+    assert response.status_code == 200
+    (delivery,) = read_deliveries(str(tmp_path / "deliveries.jsonl.gz"))
+    assert delivery.event_type == GitlabEvent.MERGE_REQUEST.value
+    assert delivery.body == body.encode()
+    # The secret token isn't recorded
+    assert delivery.headers == {
+        "X-Gitlab-Event": GitlabEvent.MERGE_REQUEST.value,
+        "X-Gitlab-Event-Uuid": "13792a34-cac6-4fda-95a8-c58e00a3954e",
+    }
+
+
+def test_replay(fake_app_config: AppConfig):
+    deliveries = _deliveries()
+    fake_gitlab = create_fake_gitlab(deliveries)
+    assert sorted(fake_gitlab.issues) == [1, 2]
+
+    report = replay(deliveries, fake_gitlab, concurrency=1)
+
+    assert report.events == len(report.latencies) == 4
+    assert report.errors == 0
+    assert report.api_calls == fake_gitlab.api_calls > 0
+    assert report.api_calls_per_event == report.api_calls / 4
+    assert report.throughput > 0
+    assert report.latency_percentile(50) <= report.latency_percentile(99)
+    assert fake_gitlab.issue_labels(1) == ["bug", "merged", "master branch"]
+    assert fake_gitlab.issue_labels(2) == ["merged", "master branch"]
+
+
+def test_replay_doesnt_use_outbox(fake_app_config: AppConfig):
+    # The database isn't available to the test, so the outbox would fail every event
+    fake_app_config.outbox.enabled = True
+    deliveries = _deliveries()
+
+    report = replay(deliveries, create_fake_gitlab(deliveries), concurrency=1)
+
+    assert report.errors == 0
+    assert fake_app_config.outbox.enabled
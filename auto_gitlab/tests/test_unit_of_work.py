@@ -0,0 +1,93 @@
+from typing import List, Tuple
+
+from config.app_config import AppConfig, BranchesConfig
+from deadline import run_with_event_deadline
+from fake_gitlab import FakeGitlab
+from utils import handle_merge_request_merged, handle_push
+
+
+def _calls_by_method(calls: List[Tuple[str, str]]) -> Tuple[int, int]:
+    methods = [method for method, _ in calls]
+    return methods.count("GET"), methods.count("PUT")
+
+
+def test_merge_of_protected_branches_api_calls(
+    fake_app_config: AppConfig, fake_gitlab: FakeGitlab, gitlab_manager
+):
+    fake_gitlab.add_branch("develop", protected=True)
+    fake_gitlab.add_branch("main", protected=True)
+    fake_gitlab.add_issue(1, ["CR", "develop branch"])
+    fake_gitlab.add_issue(2, ["merged", "develop branch"])
+
+    run_with_event_deadline(
+        handle_merge_request_merged,
+        description="Closes #1",
+        source_branch="merge/develop_to_main",
+        target_branch="main",
+    )
+
+    assert fake_gitlab.issue_labels(1) == [
+        "develop branch",
+        "merged",
+        "main branch",
+    ]
+    assert fake_gitlab.issue_labels(2) == ["merged", "develop branch", "main branch"]
+    # Reads: issue 1, three protected branches and issues of the develop branch.
+    # Issue 1 gets the main branch label at the end, so it's found again on the first
+    # page of the sweep and the second page is read.
+    # Issue 1 is moved by both steps, but it's updated once.
+    assert _calls_by_method(fake_gitlab.calls) == (7, 2)
+
+
+def test_promotion_of_queued_issue_api_calls(
+    fake_app_config: AppConfig, fake_gitlab: FakeGitlab, gitlab_manager
+):
+    fake_app_config.branches = BranchesConfig(promotion={"develop": "staging"})
+    fake_gitlab.add_issue(1, ["CR"])
+
+    # The batch state is kept by the package module used by GitlabManager
+    from auto_gitlab.batch import run_events_batch
+
+    run_events_batch(
+        [
+            (
+                handle_merge_request_merged,
+                {
+                    "description": "Closes #1",
+                    "source_branch": "1-fixes",
+                    "target_branch": "develop",
+                },
+            ),
+            (
+                handle_merge_request_merged,
+                {
+                    "description": "",
+                    "source_branch": "develop",
+                    "target_branch": "staging",
+                },
+            ),
+        ]
+    )
+
+    # 'develop branch' is only queued when issues of the develop branch are searched
+    assert fake_gitlab.issue_labels(1) == ["merged", "develop branch", "staging branch"]
+    # Reads: issue 1, protected branches for the first merge, issues of the develop
+    # branch and issue 1 which enters them with the queued label
+    assert _calls_by_method(fake_gitlab.calls) == (5, 1)
+
+
+def test_push_api_calls(
+    fake_app_config: AppConfig, fake_gitlab: FakeGitlab, gitlab_manager
+):
+    fake_gitlab.add_issue(1, ["To do"])
+    fake_gitlab.add_issue(2, ["CR"])
+
+    run_with_event_deadline(
+        handle_push,
+        commits=[{"message": "Fix #1"}, {"message": "Fix #2 and #1"}],
+    )
+
+    assert fake_gitlab.issue_labels(1) == ["In Progress"]
+    assert fake_gitlab.issue_labels(2) == ["CR"]
+    # One read of both issues and one update of the issue that needs it
+    assert _calls_by_method(fake_gitlab.calls) == (1, 1)
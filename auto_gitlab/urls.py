@@ -1,6 +1,10 @@
 from django.urls import path
 
-from auto_gitlab.views import GitlabWebhookAPIView
+from auto_gitlab.views import (
+    GitlabWebhookAPIView,
+    GitlabWebhookBatchAPIView,
+    GitlabHealthAPIView,
+)
 
 urlpatterns = [
     path(
@@ -8,4 +12,10 @@ urlpatterns = [
         GitlabWebhookAPIView.as_view(),
         name="handle-gitlab-events",
     ),
+    path(
+        "handle_gitlab_events/batch",
+        GitlabWebhookBatchAPIView.as_view(),
+        name="handle-gitlab-events-batch",
+    ),
+    path("health", GitlabHealthAPIView.as_view(), name="gitlab-health"),
 ]
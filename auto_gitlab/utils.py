@@ -1,12 +1,19 @@
 import logging
 import re
+from dataclasses import dataclass
 from functools import wraps
-from typing import List, Optional
+from itertools import islice
+from typing import List, Optional, Union, Iterable, Dict, Any
 
 from django.utils.module_loading import import_string
-from retrying import retry, RetryError
 
 from auto_gitlab.config.app_config_instance import get_app_config
+from auto_gitlab.deadline import (
+    is_deadline_exceeded,
+    report_unfinished_step,
+    DeadlineExceeded,
+)
+from auto_gitlab.patterns import search_pattern, findall_pattern
 
 logger = logging.getLogger(__name__)
 
@@ -25,40 +32,235 @@ def log_connectivity_problems():
     )
 
 
+# Responses worth retrying: timeout, too many requests and server errors
+RETRYABLE_STATUS_CODES = {408, 429}
+
+
+def is_retryable_error(exception: BaseException) -> bool:
+    """
+    Check if the request may succeed when it's sent again. Timeouts, connection errors,
+    GitLab 5xx and 429 responses are retryable. Other responses (e.g. 404, 403 or 400)
+    are permanent, as well as errors that aren't related to the connection.
+    """
+
+    # Imported here, so importing this module doesn't load python-gitlab
+    import requests
+    from gitlab import GitlabError
+
+    if isinstance(exception, GitlabError):
+        response_code = exception.response_code
+        return (
+            response_code is None
+            or response_code >= 500
+            or response_code in RETRYABLE_STATUS_CODES
+        )
+    return isinstance(exception, requests.RequestException)
+
+
+def log_permanent_error(step: str, exception: BaseException):
+    logger.error(
+        f"GitLab request of {step} failed and won't be retried: {exception!r}",
+        exc_info=exception,
+    )
+
+
+def _has_pending_writes() -> bool:
+    # Imported here, as the outbox needs Django models
+    from auto_gitlab.outbox import has_pending_writes
+
+    return has_pending_writes()
+
+
 def gitlab_connection_retry(*args, **kwargs):
     """
-    The decorator will recall the function if GitlabGetError was raised.
-    After all unsuccessful retries it logs an error.
+    The decorator will recall the function if a retryable error (check
+    ``is_retryable_error``) was raised. After all unsuccessful retries it logs an error.
+    Permanent errors are logged at once.
+
+    Retries stop at the deadline of the handled event as well. Calls made after the
+    deadline are skipped and reported as unfinished, like calls stopped by it.
+
+    ``defer`` is called with the arguments of the function instead of it when the
+    call is given up (but not when it failed permanently), or at once while earlier
+    calls wait in the outbox (check ``auto_gitlab.outbox``). It returns whether the call
+    was stored to be made later.
 
     Inspired from https://stackoverflow.com/questions/54097502/how-to-have-retry-decorator-indicate-used-all-retries
     """
 
+    defer = kwargs.pop("defer", None)
+
     def decorator(f):
-        decorated = retry(*args, **kwargs)(f)
+        # Imported here, so importing this module doesn't load retrying
+        from retrying import retry, Retrying, RetryError
+
+        stop = Retrying(*args, **kwargs).stop
+        kwargs.setdefault("retry_on_exception", is_retryable_error)
+        decorated = retry(
+            *args,
+            stop_func=lambda attempts, delay: stop(attempts, delay)
+            or is_deadline_exceeded(),
+            **kwargs,
+        )(f)
 
         @wraps(decorated)
         def wrapper(*args, **kwargs):
+            if defer is not None and _has_pending_writes() and defer(*args, **kwargs):
+                # Sent after the earlier calls, so changes are applied in order
+                return None
+            if is_deadline_exceeded():
+                if defer is None or not defer(*args, **kwargs):
+                    report_unfinished_step(f.__qualname__)
+                return None
             try:
                 return decorated(*args, **kwargs)
-            except RetryError:
-                # All retries have been used up
-                log_connectivity_problems()
+            except (RetryError, DeadlineExceeded) as e:
+                if is_deadline_exceeded():
+                    if defer is None or not defer(*args, **kwargs):
+                        report_unfinished_step(f.__qualname__)
+                elif (
+                    isinstance(e, RetryError)
+                    and e.last_attempt.has_exception
+                    and not is_retryable_error(e.last_attempt.value[1])
+                ):
+                    log_permanent_error(f.__qualname__, e.last_attempt.value[1])
+                else:
+                    # All retries have been used up
+                    log_connectivity_problems()
+                    if defer is not None and defer(*args, **kwargs):
+                        logger.warning(
+                            f"{f.__qualname__} was stored in the outbox "
+                            f"and will be sent when GitLab is reachable."
+                        )
 
         return wrapper
 
     if len(args) == 1 and callable(args[0]):
-        return decorator(args[0])
+        return gitlab_connection_retry()(args[0])
     return decorator
 
 
 def extract_issues_numbers_from_string(string: str, pattern: str) -> List[int]:
-    issues_numbers = re.findall(pattern, string)
+    issues_numbers = findall_pattern(pattern, string)
     return [int(issue_number) for issue_number in issues_numbers]
 
 
-def extract_issues_numbers_from_description(description: str) -> List[int]:
-    pattern = r"#(\d+)"
-    return extract_issues_numbers_from_string(description, pattern)
+# GitLab closing keywords, e.g. "Closes #1" or "Fixes: group/project#2"
+CLOSING_KEYWORD_PATTERN = (
+    r"\b(?:clos(?:e[sd]?|ing)|fix(?:e[sd]|ing)?|resolv(?:e[sd]?|ing)"
+    r"|implement(?:s|ed|ing)?)\b:?"
+)
+PROJECT_PATH_PATTERN = r"[\w.-]+(?:/[\w.-]+)+"
+
+# All tokens are matched by one pattern in one pass over the text. Code blocks and
+# inline code are matched as well, so references inside them are skipped.
+ISSUE_REFERENCE_TOKEN_PATTERN = re.compile(
+    r"(?P<fenced_code>^[ \t]*(?P<fence>`{3,}|~{3,})[^\n]*"
+    r"(?:\n.*?^[ \t]*(?P=fence)[ \t]*$|.*\Z))"
+    r"|(?P<inline_code>`[^`\n]*`)"
+    rf"|(?P<closing_keyword>{CLOSING_KEYWORD_PATTERN})"
+    rf"|https?://[^\s/]+/(?P<url_project>{PROJECT_PATH_PATTERN}?)/(?:-/)?issues/(?P<url_iid>\d+)"
+    rf"|(?<![\w/.-])(?P<project>{PROJECT_PATH_PATTERN})#(?P<project_iid>\d+)"
+    r"|#(?P<iid>\d+)",
+    re.IGNORECASE | re.MULTILINE | re.DOTALL,
+)
+# Text allowed between references closed by one keyword, e.g. "Closes #1, #2 and #3"
+REFERENCES_SEPARATOR_PATTERN = re.compile(r"\s*(?:,|&|\band\b)?\s*", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class IssueReference:
+    """
+    Issue referenced in a text. ``project`` is the path of the project
+    for cross-project references and None for references to the current one.
+    ``closing`` is True if the reference follows a GitLab closing keyword.
+    """
+
+    iid: int
+    project: Optional[str] = None
+    closing: bool = False
+
+
+def tokenize_issues_references(text: str) -> List[IssueReference]:
+    """
+    Find references to issues (``#1``, ``group/project#1`` and issues URLs) in the text
+    in linear time. References in code are skipped. Every issue is returned once,
+    in the order of its first appearance, as closing if any of its references is.
+    """
+
+    references: Dict[tuple, IssueReference] = {}
+    closing = False
+    previous_end = 0
+    for match in ISSUE_REFERENCE_TOKEN_PATTERN.finditer(text):
+        if match.group("fenced_code") is not None:
+            closing = False
+        elif match.group("inline_code") is not None:
+            closing = False
+        elif match.group("closing_keyword") is not None:
+            closing = True
+        else:
+            if match.group("url_iid") is not None:
+                project, iid = match.group("url_project"), match.group("url_iid")
+            elif match.group("project_iid") is not None:
+                project, iid = match.group("project"), match.group("project_iid")
+            else:
+                project, iid = None, match.group("iid")
+            closing = closing and bool(
+                REFERENCES_SEPARATOR_PATTERN.fullmatch(
+                    text, previous_end, match.start()
+                )
+            )
+            key = (project, int(iid))
+            if key not in references or closing and not references[key].closing:
+                references[key] = IssueReference(
+                    iid=int(iid), project=project, closing=closing
+                )
+        previous_end = match.end()
+    return list(references.values())
+
+
+def group_issues_references_by_project(
+    references: Iterable[IssueReference],
+) -> Dict[Optional[str], List[int]]:
+    """
+    Group issues numbers by the project path. References to the current project
+    are under the None key.
+    """
+
+    grouped_references = {}
+    for reference in references:
+        grouped_references.setdefault(reference.project, []).append(reference.iid)
+    return grouped_references
+
+
+def extract_issues_numbers_from_description(
+    description: str, project_path: Optional[str] = None
+) -> List[int]:
+    """
+    Extract numbers of the current project issues referenced in the description.
+    References to other projects are skipped, unless the project path is
+    ``project_path`` - the path of the current project.
+    """
+
+    issues_numbers = {}
+    for reference in tokenize_issues_references(description):
+        if reference.project is None or reference.project == project_path:
+            issues_numbers.setdefault(reference.iid, None)
+    return list(issues_numbers)
+
+
+def extract_issues_numbers_from_commits(commits: Iterable[Dict[str, Any]]) -> List[int]:
+    """
+    Extract numbers of the current project issues referenced in the commits messages.
+    Every issue number is returned once, in the order of its first appearance.
+    """
+
+    issues_numbers = {}
+    for commit in commits:
+        for reference in tokenize_issues_references(commit.get("message") or ""):
+            if reference.project is None:
+                issues_numbers.setdefault(reference.iid, None)
+    return list(issues_numbers)
 
 
 def extract_issues_numbers_from_branch(branch_name: str):
@@ -70,7 +272,7 @@ def extract_protected_branch_name_from_source_branch(
     source_branch: str,
 ) -> Optional[str]:
     pattern = get_app_config().patterns.merge_protected_branches
-    match = re.search(pattern, source_branch)
+    match = search_pattern(pattern, source_branch)
     return match.group(1) if match else None
 
 
@@ -78,23 +280,78 @@ def remove_issue_labels(labels: List[str], labels_to_remove: List[str]) -> List[
     return [label for label in labels if label not in labels_to_remove]
 
 
-def handle_merge_request_created(description: str, source_branch: str) -> None:
+def split_into_chunks(items: Iterable[Any], size: int) -> Iterable[List[Any]]:
+    items = iter(items)
+    while chunk := list(islice(items, size)):
+        yield chunk
+
+
+def handle_merge_request_created(
+    description: str, source_branch: str, project_path: Optional[str] = None
+) -> None:
     gitlab_manager = import_string("auto_gitlab.gitlab_instance.gitlab_manager")
 
     issues_numbers = extract_issues_numbers_from_description(
-        description
+        description, project_path=project_path
     ) or extract_issues_numbers_from_branch(source_branch)
     if issues_numbers:
         gitlab_manager.move_issues_to_cr(issues_numbers)
 
 
+def handle_merge_request_updated(
+    description: str,
+    previous_description: Optional[str],
+    source_branch: str,
+    state: Optional[str] = None,
+    project_path: Optional[str] = None,
+) -> None:
+    """
+    Move only the issues whose references were added to or removed from the description
+    of an open merge request. Newly referenced issues are moved to 'CR', like when the
+    merge request is created, and issues which are no longer referenced are moved back
+    from 'CR' to 'In Progress'. Nothing is fetched if the description wasn't changed.
+    """
+
+    if previous_description is None or state not in (None, "opened"):
+        return
+
+    gitlab_manager = import_string("auto_gitlab.gitlab_instance.gitlab_manager")
+    branch_issues_numbers = extract_issues_numbers_from_branch(source_branch)
+    previous_issues_numbers = (
+        extract_issues_numbers_from_description(previous_description, project_path)
+        or branch_issues_numbers
+    )
+    issues_numbers = (
+        extract_issues_numbers_from_description(description, project_path)
+        or branch_issues_numbers
+    )
+
+    added_issues_numbers = [
+        number for number in issues_numbers if number not in previous_issues_numbers
+    ]
+    removed_issues_numbers = [
+        number for number in previous_issues_numbers if number not in issues_numbers
+    ]
+    if added_issues_numbers:
+        gitlab_manager.move_issues_to_cr(added_issues_numbers)
+    if removed_issues_numbers:
+        gitlab_manager.transition_issues(
+            removed_issues_numbers,
+            from_labels=[get_app_config().labels.in_review],
+            to_label=get_app_config().labels.in_progress,
+        )
+
+
 def handle_merge_request_merged(
-    description: str, source_branch: str, target_branch: str
+    description: str,
+    source_branch: str,
+    target_branch: str,
+    project_path: Optional[str] = None,
 ) -> None:
     gitlab_manager = import_string("auto_gitlab.gitlab_instance.gitlab_manager")
 
     issues_numbers = extract_issues_numbers_from_description(
-        description
+        description, project_path=project_path
     ) or extract_issues_numbers_from_branch(source_branch)
     if issues_numbers:
         gitlab_manager.move_issues_to_merged(issues_numbers, target_branch)
@@ -103,25 +360,132 @@ def handle_merge_request_merged(
     )
 
 
+def handle_push(commits: List[Dict[str, Any]]) -> None:
+    gitlab_manager = import_string("auto_gitlab.gitlab_instance.gitlab_manager")
+
+    issues_numbers = extract_issues_numbers_from_commits(commits)
+    if issues_numbers:
+        gitlab_manager.transition_issues(
+            issues_numbers,
+            from_labels=get_app_config().push.from_labels,
+            to_label=get_app_config().push.to_label,
+        )
+
+
+def is_label_in_labels(
+    label: Optional[Union[str, int]], labels_ids: List[int], label_names: List[str]
+) -> bool:
+    return label in labels_ids or label in label_names
+
+
 def handle_issue_created(
     iid: int, title: str, labels_ids: List[int], label_names: List[str]
 ) -> None:
     gitlab_manager = import_string("auto_gitlab.gitlab_instance.gitlab_manager")
 
+    # Labels already present in the payload are skipped,
+    # so the issue doesn't have to be fetched before it is updated.
+    labels_to_add = []
     for identifier in get_app_config().patterns.issue_identifiers:
-        match = re.search(identifier.pattern, title, re.IGNORECASE)
-        if match and (
-            identifier.label not in labels_ids or identifier.label not in label_names
+        match = search_pattern(identifier.pattern, title, re.IGNORECASE)
+        if (
+            match
+            and identifier.label not in labels_to_add
+            and not is_label_in_labels(identifier.label, labels_ids, label_names)
         ):
-            gitlab_manager.add_label_to_issue(label=identifier.label, issue_iid=iid)
-
-    if (
-        get_app_config().labels.to_do not in labels_ids
-        or get_app_config().labels.to_do not in label_names
-    ) and (
-        get_app_config().labels.in_progress not in labels_ids
-        or get_app_config().labels.in_progress not in label_names
+            labels_to_add.append(identifier.label)
+
+    if not is_label_in_labels(
+        get_app_config().labels.to_do, labels_ids, label_names
+    ) and not is_label_in_labels(
+        get_app_config().labels.in_progress, labels_ids, label_names
     ):
-        gitlab_manager.add_label_to_issue(
-            label=get_app_config().labels.to_do, issue_iid=iid
+        labels_to_add.append(get_app_config().labels.to_do)
+
+    if labels_to_add:
+        gitlab_manager.update_issue_labels(issue_iid=iid, labels_to_add=labels_to_add)
+
+
+def get_label_name_from_labels(
+    label: Union[str, int], labels_ids: List[int], label_names: List[str]
+) -> Union[str, int]:
+    """
+    Return the name of the label if the label is given by id and is present in the payload.
+    Otherwise, return the label unchanged.
+    """
+
+    if isinstance(label, int) and label in labels_ids:
+        return label_names[labels_ids.index(label)]
+    return label
+
+
+def handle_issue_updated(
+    iid: int,
+    changes: Dict[str, Any],
+    labels_ids: List[int],
+    label_names: List[str],
+) -> None:
+    """
+    Update the issue labels if its title was changed. Labels of identifiers that
+    match only the new title are added and labels of identifiers that matched
+    only the previous title are removed. The labels are taken from the payload
+    so the issue is never fetched.
+    """
+
+    title_changes = changes.get("title")
+    if not title_changes:
+        return
+
+    previous_title = title_changes.get("previous") or ""
+    current_title = title_changes.get("current") or ""
+
+    labels_to_add = []
+    labels_to_remove = []
+    for identifier in get_app_config().patterns.issue_identifiers:
+        matched_previous = search_pattern(
+            identifier.pattern, previous_title, re.IGNORECASE
+        )
+        matched_current = search_pattern(
+            identifier.pattern, current_title, re.IGNORECASE
+        )
+        is_present = is_label_in_labels(identifier.label, labels_ids, label_names)
+        if matched_current and not matched_previous and not is_present:
+            labels_to_add.append(identifier.label)
+        elif matched_previous and not matched_current and is_present:
+            labels_to_remove.append(
+                get_label_name_from_labels(identifier.label, labels_ids, label_names)
+            )
+
+    if labels_to_add or labels_to_remove:
+        gitlab_manager = import_string("auto_gitlab.gitlab_instance.gitlab_manager")
+        gitlab_manager.update_issue_labels(
+            issue_iid=iid,
+            labels_to_add=labels_to_add,
+            labels_to_remove=labels_to_remove,
+        )
+
+
+def handle_issue_closed(
+    iid: int, labels_ids: List[int], label_names: List[str]
+) -> None:
+    """
+    Remove the 'To do', 'In progress' and 'CR' labels from the closed issue.
+    Only labels present in the payload are removed, so nothing is sent
+    if the closed issue doesn't have any of them.
+    """
+
+    labels_to_remove = [
+        get_label_name_from_labels(label, labels_ids, label_names)
+        for label in (
+            get_app_config().labels.to_do,
+            get_app_config().labels.in_progress,
+            get_app_config().labels.in_review,
+        )
+        if is_label_in_labels(label, labels_ids, label_names)
+    ]
+
+    if labels_to_remove:
+        gitlab_manager = import_string("auto_gitlab.gitlab_instance.gitlab_manager")
+        gitlab_manager.update_issue_labels(
+            issue_iid=iid, labels_to_remove=labels_to_remove
         )
@@ -1,7 +1,8 @@
 import json
 import logging
-from typing import List, Dict
+from typing import List, Dict, Optional, Hashable, Tuple, Callable, Any
 
+from django.core.exceptions import RequestDataTooBig
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework import status
@@ -9,20 +10,39 @@ from rest_framework.response import Response
 
 from rest_framework.views import APIView
 
-from auto_gitlab.enums import GitlabEvent, MergeRequestAction, IssueAction
-from auto_gitlab.permissions import IsGitlabInstancePermission
-from auto_gitlab.utils import (
-    handle_merge_request_created,
-    handle_merge_request_merged,
-    handle_issue_created,
+from auto_gitlab.batch import run_events_batch
+from auto_gitlab.config.app_config_instance import get_app_config
+from auto_gitlab.enums import GitlabEvent
+from auto_gitlab.events import (
+    InvalidGitlabEvent,
+    EVENT_CLASSES,
+    dispatch_event,
+    get_event_handlers,
+    run_event_handlers,
 )
+from auto_gitlab.executor import run_event_handler, run_in_events_executor
+from auto_gitlab.health import get_health, get_gitlab_connection
+from auto_gitlab.permissions import IsGitlabInstancePermission
+from auto_gitlab.recording import get_record_file_path, record_delivery
 
 logger = logging.getLogger(__name__)
 
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+# Types of the events by ``object_kind`` of their payloads
+OBJECT_KIND_EVENTS = {
+    "merge_request": GitlabEvent.MERGE_REQUEST.value,
+    "issue": GitlabEvent.ISSUE.value,
+    "push": GitlabEvent.PUSH_EVENT.value,
+}
+
 
 @method_decorator(csrf_exempt, name="dispatch")
 class GitlabWebhookAPIView(APIView):
-    event_types: List[str] = [GitlabEvent.MERGE_REQUEST.value, GitlabEvent.ISSUE.value]
+    event_types: List[str] = [
+        GitlabEvent.MERGE_REQUEST.value,
+        GitlabEvent.ISSUE.value,
+        GitlabEvent.PUSH_EVENT.value,
+    ]
 
     permission_classes = [IsGitlabInstancePermission]
 
@@ -35,46 +55,210 @@ class GitlabWebhookAPIView(APIView):
             )
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
-        data = json.loads(request.body)
-        object_attributes = data.get("object_attributes", None)
-        if not object_attributes:
-            logger.log(msg="No 'object_attributes' in sent data.", level=logging.INFO)
+        record_file = get_record_file_path()
+        if record_file:
+            record_delivery(
+                record_file,
+                request.headers.get("X-Gitlab-Event"),
+                request.body,
+                request.headers,
+            )
+
+        try:
+            event_handler = self.get_event_handler(
+                event_type=request.headers.get("X-Gitlab-Event"),
+                data=json.loads(request.body),
+            )
+        except InvalidGitlabEvent as e:
+            logger.log(msg=str(e), level=logging.INFO)
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
-        self.handle_event(
-            event_type=request.headers.get("X-Gitlab-Event"),
-            object_attributes=object_attributes,
-        )
+        if event_handler is not None:
+            keys, handler, handler_kwargs = event_handler
+            run_event_handler(keys, handler, **handler_kwargs)
         return Response(status=status.HTTP_200_OK)
 
+    @classmethod
+    def get_event_handler(
+        cls, event_type: str, data: Dict[str, any]
+    ) -> Optional[Tuple[Optional[List[Hashable]], Callable[..., Any], Dict[str, Any]]]:
+        """
+        Return keys of the issues the event may change, its handler and the handler
+        arguments or None if there are no handlers of the event (check ``auto_gitlab.events``).
+        """
+
+        return dispatch_event(event_type=event_type, data=data)
+
     @staticmethod
-    def handle_event(event_type: str, object_attributes: Dict[str, any]) -> None:
-        action = object_attributes.get("action", None)
-        if event_type == GitlabEvent.MERGE_REQUEST.value:
-            if action == MergeRequestAction.CREATED.value:
-                handle_merge_request_created(
-                    description=object_attributes.get("description", ""),
-                    source_branch=object_attributes.get("source_branch", ""),
-                )
-            elif action == MergeRequestAction.MERGED.value:
-                handle_merge_request_merged(
-                    description=object_attributes.get("description", ""),
-                    source_branch=object_attributes.get("source_branch", ""),
-                    target_branch=object_attributes.get("target_branch", ""),
+    def get_event_keys(
+        event_type: str, object_attributes: Dict[str, any]
+    ) -> Optional[List[Hashable]]:
+        """
+        Return keys of the issues the event may change. Events changing the same issue
+        are handled in order. ``BULK_KEY`` means that the event may change issues found
+        by labels as well and None that it may change any issue.
+        """
+
+        return (
+            EVENT_CLASSES[event_type]
+            .from_payload({"object_attributes": object_attributes})
+            .get_keys()
+        )
+
+    @staticmethod
+    def handle_event(
+        event_type: str,
+        object_attributes: Dict[str, any],
+        changes: Optional[Dict[str, any]] = None,
+    ) -> None:
+        handlers = get_event_handlers(event_type, object_attributes.get("action", None))
+        if handlers:
+            event = EVENT_CLASSES[event_type].from_payload(
+                {"object_attributes": object_attributes, "changes": changes}
+            )
+            run_event_handlers(event, handlers)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class GitlabWebhookBatchAPIView(APIView):
+    """
+    Handle many GitLab events sent in one request as a JSON array or as NDJSON
+    (one event per line), e.g. to catch up after an outage. Every event is either
+    a webhook payload, whose type is given by its ``object_kind``, or a recorded
+    delivery with ``event`` and ``body`` keys.
+
+    Valid events are handled in order as one task and label changes of every issue
+    are merged, so each issue is updated once. Events may be handled after the response
+    is sent, so it only tells which events were accepted. Batches with more events
+    or a larger body than configured are refused.
+    """
+
+    permission_classes = [IsGitlabInstancePermission]
+
+    def post(self, request, *args, **kwargs):
+        batch_config = get_app_config().batch
+        if self.get_content_length(request) > batch_config.max_body_size:
+            return self.too_large("Events batch body is too large.")
+        try:
+            body = request.body
+        except RequestDataTooBig:
+            return self.too_large("Events batch body is too large.")
+        if len(body) > batch_config.max_body_size:
+            return self.too_large("Events batch body is too large.")
+
+        try:
+            if request.content_type == NDJSON_CONTENT_TYPE:
+                lines = [line for line in body.splitlines() if line.strip()]
+                if len(lines) > batch_config.max_events:
+                    return self.too_large("Too many events in the batch.")
+                events = [self.parse_line(line) for line in lines]
+            else:
+                events = json.loads(body)
+        except ValueError:
+            logger.log(msg="Invalid JSON of the events batch.", level=logging.INFO)
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(events, list):
+            logger.log(msg="Events batch must be a list.", level=logging.INFO)
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        if len(events) > batch_config.max_events:
+            return self.too_large("Too many events in the batch.")
+
+        record_file = get_record_file_path()
+        results = []
+        handlers = []
+        keys = set()
+        for event in events:
+            try:
+                event_type, data = self.get_event_type_and_data(event)
+                event_handler = GitlabWebhookAPIView.get_event_handler(
+                    event_type=event_type, data=data
                 )
-        elif (
-            event_type == GitlabEvent.ISSUE.value
-            and action == IssueAction.CREATED.value
-        ):
-            labels_ids = [
-                label.get("id") for label in object_attributes.get("labels", [])
-            ]
-            label_names = [
-                label.get("title") for label in object_attributes.get("labels", [])
-            ]
-            handle_issue_created(
-                iid=object_attributes.get("iid", None),
-                title=object_attributes.get("title", ""),
-                labels_ids=labels_ids,
-                label_names=label_names,
+            except InvalidGitlabEvent as e:
+                results.append({"accepted": False, "error": str(e)})
+                continue
+
+            if record_file:
+                record_delivery(record_file, event_type, json.dumps(data).encode())
+            results.append({"accepted": True})
+            if event_handler is None:
+                continue
+            event_keys, handler, handler_kwargs = event_handler
+            handlers.append((handler, handler_kwargs))
+            # Events that may change any issue make the whole batch a barrier
+            keys = (
+                None if keys is None or event_keys is None else keys | set(event_keys)
             )
+
+        if handlers:
+            run_in_events_executor(keys, run_events_batch, handlers)
+        return Response({"events": results}, status=status.HTTP_202_ACCEPTED)
+
+    @staticmethod
+    def get_content_length(request) -> int:
+        try:
+            return int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            # Checked again when the body is read
+            return 0
+
+    @staticmethod
+    def too_large(message: str) -> Response:
+        logger.log(msg=message, level=logging.INFO)
+        return Response(status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    @staticmethod
+    def parse_line(line: bytes) -> Any:
+        try:
+            return json.loads(line)
+        except ValueError:
+            # Reported in the results, other lines are still handled
+            return None
+
+    @staticmethod
+    def get_event_type_and_data(event: Any) -> Tuple[str, Dict[str, Any]]:
+        if not isinstance(event, dict):
+            raise InvalidGitlabEvent("Event must be a JSON object.")
+        if "event" in event:
+            event_type = event["event"]
+            data = event.get("body")
+            if isinstance(data, str):
+                try:
+                    data = json.loads(data)
+                except ValueError:
+                    raise InvalidGitlabEvent("Invalid JSON of the event body.")
+        else:
+            event_type = OBJECT_KIND_EVENTS.get(event.get("object_kind"))
+            data = event
+        if event_type not in GitlabWebhookAPIView.event_types:
+            raise InvalidGitlabEvent(
+                f"Invalid gitlab event. Expected: {GitlabWebhookAPIView.event_types}, "
+                f"Given: {event_type}"
+            )
+        if not isinstance(data, dict):
+            raise InvalidGitlabEvent("Event body must be a JSON object.")
+        return event_type, data
+
+
+class GitlabHealthAPIView(APIView):
+    """
+    Report the GitLab connection, warm-up and events queue state.
+    GitLab is asked at most once per ``HEALTH_CHECK_INTERVAL_SECONDS``, so the view
+    can be used by frequent health probes. Responds with 503 if GitLab isn't reachable.
+    Requests without the secret token get only the status.
+    """
+
+    permission_classes = []
+
+    def get(self, request, *args, **kwargs):
+        if IsGitlabInstancePermission().has_permission(request, self):
+            health = get_health()
+            connected = health["gitlab"]["connected"]
+        else:
+            connected = get_gitlab_connection()["connected"]
+            health = {"status": "ok" if connected else "unavailable"}
+        return Response(
+            health,
+            status=(
+                status.HTTP_200_OK if connected else status.HTTP_503_SERVICE_UNAVAILABLE
+            ),
+        )
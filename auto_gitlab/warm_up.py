@@ -0,0 +1,102 @@
+import logging
+import os
+import threading
+import time
+from dataclasses import astuple
+from typing import Optional, List, Union
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+WARM_UP_SETTING = "AUTO_GITLAB_WARM_UP"
+
+# Time (from time.time) of the last finished warm-up
+_warmed_up_at: Optional[float] = None
+_fork_hook_registered = False
+
+
+def is_warm_up_enabled() -> bool:
+    return bool(getattr(settings, WARM_UP_SETTING, False))
+
+
+def get_warmed_up_at() -> Optional[float]:
+    return _warmed_up_at
+
+
+def get_warm_up_labels() -> List[Union[str, int]]:
+    """
+    Return all labels from the config file: the workflow labels,
+    labels of the issue identifiers and labels of the push transition.
+    """
+
+    from auto_gitlab.config.app_config_instance import get_app_config
+
+    app_config = get_app_config()
+    labels = [
+        *astuple(app_config.labels),
+        *(identifier.label for identifier in app_config.patterns.issue_identifiers),
+        *app_config.push.from_labels,
+        app_config.push.to_label,
+    ]
+    return [label for label in dict.fromkeys(labels) if label is not None]
+
+
+def warm_up() -> None:
+    """
+    Connect to GitLab and load the project, the configured labels
+    and the protected branches, so the first events are handled quickly.
+    Labels and branches are kept only if the cache is enabled.
+    """
+
+    from auto_gitlab.gitlab_instance import get_gitlab_manager
+
+    global _warmed_up_at
+    started = time.monotonic()
+    get_gitlab_manager().warm_up(get_warm_up_labels())
+    _warmed_up_at = time.time()
+    logger.info(f"GitLab data loaded in {time.monotonic() - started:.2f} s.")
+
+
+def _warm_up_safely() -> None:
+    try:
+        warm_up()
+    except Exception:
+        logger.exception("Loading GitLab data failed.")
+
+
+def start_warm_up() -> threading.Thread:
+    """
+    Warm up in a background thread, so the application starts without waiting for GitLab.
+    """
+
+    thread = threading.Thread(
+        target=_warm_up_safely, name="auto-gitlab-warm-up", daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def _after_fork_in_child() -> None:
+    from auto_gitlab.gitlab_instance import set_gitlab_manager
+
+    global _warmed_up_at
+    # Connections of the parent process must not be shared, e.g. with gunicorn --preload
+    set_gitlab_manager(None)
+    _warmed_up_at = None
+    start_warm_up()
+
+
+def setup_warm_up() -> None:
+    """
+    Start the warm-up if it's enabled with the ``AUTO_GITLAB_WARM_UP`` Django setting
+    and repeat it in every process forked later (e.g. gunicorn workers).
+    """
+
+    global _fork_hook_registered
+    if not is_warm_up_enabled():
+        return
+    start_warm_up()
+    if not _fork_hook_registered and hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_after_fork_in_child)
+        _fork_hook_registered = True